@@ -0,0 +1,356 @@
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List
+
+logger = logging.getLogger(__name__)
+
+# Migrasi schema berurutan; versi yang sudah diterapkan disimpan di
+# PRAGMA user_version. Migrasi baru selalu ditambahkan di akhir list.
+MIGRATIONS: List[str] = [
+    # 1: schema awal
+    '''
+    CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        alert_type TEXT NOT NULL,
+        condition_type TEXT NOT NULL,
+        target_price REAL,
+        current_price REAL,
+        percentage_change REAL,
+        volume_threshold REAL,
+        is_active BOOLEAN DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        triggered_at TIMESTAMP,
+        message TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS alert_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        alert_id INTEGER,
+        triggered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        price_at_trigger REAL,
+        message TEXT,
+        FOREIGN KEY (alert_id) REFERENCES alerts (id)
+    );
+    ''',
+    # 2: index untuk scan monitor, daftar alert user, dan history per alert
+    '''
+    CREATE INDEX IF NOT EXISTS idx_alerts_active
+        ON alerts (id) WHERE is_active = 1;
+    CREATE INDEX IF NOT EXISTS idx_alerts_symbol_active
+        ON alerts (symbol, is_active);
+    CREATE INDEX IF NOT EXISTS idx_alerts_user_created
+        ON alerts (user_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_alert_history_alert
+        ON alert_history (alert_id);
+    ''',
+    # 3: alert INDICATOR (timeframe per alert) dan state indikator bersama
+    '''
+    ALTER TABLE alerts ADD COLUMN timeframe TEXT;
+
+    CREATE TABLE IF NOT EXISTS indicator_state (
+        symbol TEXT NOT NULL,
+        timeframe TEXT NOT NULL,
+        state TEXT NOT NULL,
+        last_candle_ts INTEGER,
+        updated_at TIMESTAMP,
+        PRIMARY KEY (symbol, timeframe)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_alerts_type_active
+        ON alerts (alert_type) WHERE is_active = 1;
+    ''',
+    # 4: alert EXPRESSION (ekspresi komposit)
+    '''
+    ALTER TABLE alerts ADD COLUMN expression TEXT;
+    ''',
+    # 5: outbox notifikasi Telegram (persisten lintas restart)
+    '''
+    CREATE TABLE IF NOT EXISTS notifications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id TEXT NOT NULL,
+        text TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL,
+        created_at REAL NOT NULL,
+        sent_at REAL,
+        last_error TEXT
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_notifications_pending
+        ON notifications (next_attempt_at) WHERE status = 'pending';
+    ''',
+    # 6: alert berulang (cooldown + re-arm hysteresis)
+    '''
+    ALTER TABLE alerts ADD COLUMN recurring INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE alerts ADD COLUMN cooldown_seconds REAL;
+    ALTER TABLE alerts ADD COLUMN rearm_pct REAL;
+    ALTER TABLE alerts ADD COLUMN armed INTEGER NOT NULL DEFAULT 1;
+    ALTER TABLE alerts ADD COLUMN cooldown_until REAL;
+    ALTER TABLE alerts ADD COLUMN trigger_count INTEGER NOT NULL DEFAULT 0;
+
+    CREATE INDEX IF NOT EXISTS idx_alerts_rearm
+        ON alerts (cooldown_until) WHERE is_active = 1 AND armed = 0;
+    ''',
+    # 7: log perubahan alert (diisi trigger) dan anggota shard evaluasi alert
+    '''
+    CREATE TABLE IF NOT EXISTS alert_changes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        alert_id INTEGER NOT NULL,
+        changed_at REAL NOT NULL
+    );
+
+    CREATE TRIGGER IF NOT EXISTS alerts_log_insert AFTER INSERT ON alerts
+    BEGIN
+        INSERT INTO alert_changes (alert_id, changed_at)
+        VALUES (NEW.id, (julianday('now') - 2440587.5) * 86400.0);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS alerts_log_update AFTER UPDATE ON alerts
+    BEGIN
+        INSERT INTO alert_changes (alert_id, changed_at)
+        VALUES (NEW.id, (julianday('now') - 2440587.5) * 86400.0);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS alerts_log_delete AFTER DELETE ON alerts
+    BEGIN
+        INSERT INTO alert_changes (alert_id, changed_at)
+        VALUES (OLD.id, (julianday('now') - 2440587.5) * 86400.0);
+    END;
+
+    CREATE TABLE IF NOT EXISTS alert_shard_members (
+        worker_id TEXT PRIMARY KEY,
+        pid INTEGER,
+        started_at REAL NOT NULL,
+        heartbeat_at REAL NOT NULL
+    );
+    ''',
+    # 8: history per user (keyset pagination), agregat harian hasil kompaksi
+    '''
+    ALTER TABLE alert_history ADD COLUMN user_id TEXT;
+    ALTER TABLE alert_history ADD COLUMN symbol TEXT;
+
+    UPDATE alert_history SET
+        user_id = (SELECT user_id FROM alerts WHERE alerts.id = alert_history.alert_id),
+        symbol = (SELECT symbol FROM alerts WHERE alerts.id = alert_history.alert_id);
+
+    CREATE INDEX IF NOT EXISTS idx_alert_history_user
+        ON alert_history (user_id, id);
+    CREATE INDEX IF NOT EXISTS idx_alert_history_triggered
+        ON alert_history (triggered_at);
+
+    DROP INDEX IF EXISTS idx_alerts_user_created;
+    CREATE INDEX IF NOT EXISTS idx_alerts_user_id
+        ON alerts (user_id, id);
+
+    CREATE TABLE IF NOT EXISTS alert_history_daily (
+        alert_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        user_id TEXT,
+        symbol TEXT,
+        trigger_count INTEGER NOT NULL,
+        first_triggered_at TEXT,
+        last_triggered_at TEXT,
+        min_price REAL,
+        max_price REAL,
+        PRIMARY KEY (alert_id, day)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_alert_history_daily_user
+        ON alert_history_daily (user_id, day, alert_id);
+    ''',
+    # 9: log event sinyal (MACD crossover dst.) per symbol
+    '''
+    CREATE TABLE IF NOT EXISTS signal_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        symbol TEXT NOT NULL,
+        timeframe TEXT NOT NULL DEFAULT '',
+        event_type TEXT NOT NULL,
+        candle_time TEXT NOT NULL DEFAULT '',
+        created_at REAL NOT NULL,
+        payload TEXT NOT NULL,
+        UNIQUE (symbol, timeframe, event_type, candle_time)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_signal_events_symbol_id
+        ON signal_events (symbol, id);
+    CREATE INDEX IF NOT EXISTS idx_signal_events_symbol_time
+        ON signal_events (symbol, created_at);
+    CREATE INDEX IF NOT EXISTS idx_signal_events_time
+        ON signal_events (created_at);
+    ''',
+    # 10: baseline volume rolling per symbol (alert VOLUME ZSCORE, /volume)
+    '''
+    CREATE TABLE IF NOT EXISTS volume_baseline (
+        symbol TEXT NOT NULL,
+        timeframe TEXT NOT NULL,
+        state TEXT NOT NULL,
+        last_candle_ts INTEGER,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (symbol, timeframe)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_volume_baseline_updated
+        ON volume_baseline (updated_at);
+    ''',
+    # 11: watchlist user untuk digest berkala
+    '''
+    CREATE TABLE IF NOT EXISTS watchlist (
+        user_id TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        timeframe TEXT NOT NULL,
+        interval_hours INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_sent_at REAL,
+        next_due_at REAL NOT NULL,
+        PRIMARY KEY (user_id, symbol, timeframe)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_watchlist_due
+        ON watchlist (next_due_at);
+    ''',
+]
+
+
+def split_statements(script: str) -> List[str]:
+    """Pecah script SQL per statement (aman untuk body trigger yang berisi ';')"""
+    statements, buffer = [], ""
+    for piece in script.split(';'):
+        buffer += piece + ';'
+        if sqlite3.complete_statement(buffer):
+            if buffer.strip(' \n;'):
+                statements.append(buffer.strip())
+            buffer = ""
+    return statements
+
+
+class AlertDatabase:
+    """Lapisan SQLite untuk alert store.
+
+    Satu koneksi per thread yang dibuka sekali (bukan connect per query),
+    mode WAL supaya thread web bisa membaca selagi monitor menulis, pragma
+    cache/synchronous yang di-tuning, dan statement cache sqlite3 yang besar
+    sehingga query berulang tidak di-compile ulang.
+    """
+
+    def __init__(self, db_path: str = "alerts.db", cache_size_kb: int = 20000,
+                 mmap_size: int = 256 * 1024 * 1024):
+        self.db_path = db_path
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.local = threading.local()
+        self.migrate()
+
+    def connection(self) -> sqlite3.Connection:
+        """Koneksi milik thread saat ini, dibuat saat pertama kali dipakai"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10,
+                                   cached_statements=256)
+            # Hanya berlaku untuk database baru (harus sebelum WAL dan tabel
+            # pertama); database lama dikonversi lewat enable_incremental_vacuum
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            self.local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """Satu transaksi write singkat; commit saat sukses, rollback saat error"""
+        conn = self.connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        """Query baca di koneksi thread ini"""
+        return self.connection().execute(sql, params)
+
+    def incremental_vacuum_enabled(self) -> bool:
+        return self.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    def enable_incremental_vacuum(self):
+        """Konversi database lama ke auto_vacuum=INCREMENTAL.
+
+        Butuh VACUUM penuh yang mengunci dan menulis ulang seluruh file, jadi
+        hanya dijalankan sebagai langkah maintenance eksplisit
+        (`python alert_db.py --enable-incremental-vacuum`), bukan otomatis.
+        """
+        conn = self.connection()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return
+        logger.info("Switching alert DB to incremental auto_vacuum (full VACUUM)")
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+    def incremental_vacuum(self, pages: int) -> int:
+        """Kembalikan paling banyak `pages` halaman kosong ke filesystem.
+
+        No-op (return 0) bila database belum memakai auto_vacuum incremental.
+        """
+        if not self.incremental_vacuum_enabled():
+            return 0
+        conn = self.connection()
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+        return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def migrate(self):
+        """Terapkan migrasi yang belum tercatat di user_version.
+
+        Versi dibaca di dalam transaksi IMMEDIATE, jadi bila beberapa proses
+        start bersamaan setiap migrasi tetap hanya dijalankan sekali.
+        """
+        while True:
+            with self.transaction() as cursor:
+                version = cursor.execute("PRAGMA user_version").fetchone()[0]
+                if version >= len(MIGRATIONS):
+                    return
+
+                logger.info(f"Applying alert DB migration {version + 1}")
+                for statement in split_statements(MIGRATIONS[version]):
+                    cursor.execute(statement)
+                cursor.execute(f"PRAGMA user_version = {version + 1}")
+
+    def close(self):
+        """Tutup koneksi milik thread saat ini"""
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintenance database alert")
+    parser.add_argument('--db', default='alerts.db')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='Konversi ke auto_vacuum=INCREMENTAL (VACUUM penuh; '
+                             'jalankan saat service berhenti)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = AlertDatabase(args.db)
+    if args.enable_incremental_vacuum:
+        db.enable_incremental_vacuum()
+    print(f"auto_vacuum incremental: {db.incremental_vacuum_enabled()}")
+
+
+if __name__ == '__main__':
+    main()
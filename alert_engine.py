@@ -0,0 +1,119 @@
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AlertEngine:
+    """Evaluasi alert event-driven di atas feed harga.
+
+    Setiap tick dari feed hanya mengevaluasi alert milik symbol itu lewat
+    `check_symbol` (threshold index), jadi alert terpicu dalam hitungan
+    milidetik setelah harga bergerak, bukan menunggu siklus 60 detik. Bila
+    feed tidak tersedia atau putus, engine kembali ke polling lalu mencoba
+    menyambung lagi. Polling memakai `scheduler` (AdaptivePollScheduler)
+    bila ada, kalau tidak `check_alerts` setiap `poll_interval` detik.
+    """
+
+    def __init__(self, alert_system, on_triggered: Callable[[List[Dict]], None],
+                 feed=None, scheduler=None, poll_interval: float = 60,
+                 reconnect_interval: float = 30, latency_samples: int = 1000):
+        self.alert_system = alert_system
+        self.on_triggered = on_triggered
+        self.feed = feed
+        self.scheduler = scheduler
+        self.poll_interval = poll_interval
+        self.reconnect_interval = reconnect_interval
+        self.latencies = deque(maxlen=latency_samples)
+        self.ticks = 0
+        self.mode = 'idle'
+        self.running = False
+
+    def start(self) -> threading.Thread:
+        self.running = True
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.running = False
+        if self.feed is not None:
+            self.feed.stop()
+
+    def run(self):
+        while self.running:
+            if self.feed is None:
+                self.run_polling()
+                return
+
+            try:
+                self.mode = 'stream'
+                logger.info("Alert engine: listening to price stream")
+                self.feed.run(self.on_tick)
+                # Feed selesai normal (di-stop atau replay habis)
+                self.mode = 'idle'
+                return
+            except Exception as e:
+                logger.error(f"Price stream failed, falling back to polling: {e}")
+
+            # Polling sementara sampai stream dicoba lagi
+            self.run_polling(until=time.monotonic() + self.reconnect_interval)
+
+    def run_polling(self, until: Optional[float] = None):
+        """Loop polling periodik (mode lama), opsional sampai waktu `until`"""
+        self.mode = 'polling'
+        while self.running and (until is None or time.monotonic() < until):
+            self.poll_once()
+
+            delay = (self.scheduler.seconds_until_due()
+                     if self.scheduler else self.poll_interval)
+            if until is not None:
+                delay = min(delay, until - time.monotonic())
+            time.sleep(max(0, delay))
+
+    def poll_once(self):
+        try:
+            if self.scheduler:
+                triggered_alerts = self.scheduler.run_due()
+            else:
+                triggered_alerts = self.alert_system.check_alerts()
+            if triggered_alerts:
+                self.on_triggered(triggered_alerts)
+        except Exception as e:
+            logger.error(f"Error in alert monitoring: {e}")
+
+    def on_tick(self, symbol: str, ticker: Dict):
+        """Handler feed: evaluasi alert symbol yang tick"""
+        self.ticks += 1
+        try:
+            triggered_alerts = self.alert_system.check_symbol(symbol, ticker)
+        except Exception as e:
+            logger.error(f"Error checking alerts for {symbol}: {e}")
+            return
+
+        if not triggered_alerts:
+            return
+
+        if ticker.get('timestamp'):
+            self.latencies.append(time.time() - ticker['timestamp'] / 1000)
+
+        try:
+            self.on_triggered(triggered_alerts)
+        except Exception as e:
+            logger.error(f"Error dispatching triggered alerts: {e}")
+
+    def stats(self) -> Dict:
+        """Ringkasan mode dan latency trigger (detik sejak tick exchange)"""
+        latencies = sorted(self.latencies)
+        return {
+            'mode': self.mode,
+            'ticks': self.ticks,
+            'triggers_sampled': len(latencies),
+            'latency_median': statistics.median(latencies) if latencies else None,
+            'latency_p95': (latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+                            if latencies else None)
+        }
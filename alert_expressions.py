@@ -0,0 +1,383 @@
+import operator
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from alert_index import ALERT_ID, ARMED, EXPRESSION, SYMBOL, TIMEFRAME
+from lazy_imports import LazyModule
+
+np = LazyModule('numpy')
+
+# Feature yang bisa dipakai di ekspresi: sumber ticker (real-time) atau
+# snapshot indikator per timeframe alert (diperbarui per candle closed)
+TICKER_FEATURES = {
+    'price': 'last',
+    'volume_24h': 'quoteVolume',
+    'change_24h': 'percentage',
+}
+INDICATOR_FEATURES = {
+    'close': 'close',
+    'rsi_14': 'rsi',
+    'macd': 'macd',
+    'macd_signal': 'macd_signal',
+    'bb_upper': 'bb_upper',
+    'bb_lower': 'bb_lower',
+    'cloud_top': 'cloud_top',
+    'cloud_bottom': 'cloud_bottom',
+    'volume_ratio': 'volume_ratio',
+}
+# Nama alternatif dinormalkan supaya tetap berbagi subekspresi
+FEATURE_ALIASES = {
+    'rsi': 'rsi_14',
+    'volume': 'volume_24h',
+}
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+# Untuk menormalkan `70000 < price` menjadi `price > 70000`
+FLIPPED = {'>': '<', '>=': '<=', '<': '>', '<=': '>=', '==': '==', '!=': '!='}
+
+MAX_EXPRESSION_LENGTH = 500
+
+TOKEN_PATTERN = re.compile(r'''
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+      | (?P<op>>=|<=|==|!=|>|<)
+      | (?P<paren>[()])
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )''', re.VERBOSE)
+
+
+class ExpressionError(ValueError):
+    """Ekspresi alert tidak valid"""
+
+
+def tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens, position = [], 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if not match:
+            raise ExpressionError(f"Karakter tidak dikenal di posisi {position}: "
+                                  f"{text[position:position + 10]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'name' and value.upper() in ('AND', 'OR', 'NOT'):
+            kind, value = 'keyword', value.upper()
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class Parser:
+    """Recursive-descent parser: OR < AND < NOT < perbandingan / kurung"""
+
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, kind: str, value: str = None) -> str:
+        token = self.peek()
+        if token is None or token[0] != kind or (value and token[1] != value):
+            expected = value or kind
+            found = token[1] if token else 'akhir ekspresi'
+            raise ExpressionError(f"Diharapkan {expected}, ditemukan {found}")
+        self.position += 1
+        return token[1]
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise ExpressionError(f"Token tidak terduga: {self.peek()[1]}")
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == ('keyword', 'OR'):
+            self.position += 1
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else ('or', children)
+
+    def parse_and(self):
+        children = [self.parse_not()]
+        while self.peek() == ('keyword', 'AND'):
+            self.position += 1
+            children.append(self.parse_not())
+        return children[0] if len(children) == 1 else ('and', children)
+
+    def parse_not(self):
+        if self.peek() == ('keyword', 'NOT'):
+            self.position += 1
+            return ('not', self.parse_not())
+        if self.peek() == ('paren', '('):
+            self.position += 1
+            node = self.parse_or()
+            self.take('paren', ')')
+            return node
+        return self.parse_comparison()
+
+    def parse_operand(self):
+        token = self.peek()
+        if token and token[0] == 'number':
+            self.position += 1
+            return ('num', float(token[1]))
+        name = self.take('name').lower()
+        name = FEATURE_ALIASES.get(name, name)
+        if name not in TICKER_FEATURES and name not in INDICATOR_FEATURES:
+            known = ', '.join(sorted(set(TICKER_FEATURES) | set(INDICATOR_FEATURES)))
+            raise ExpressionError(f"Feature tidak dikenal: {name} (tersedia: {known})")
+        return ('feat', name)
+
+    def parse_comparison(self):
+        left = self.parse_operand()
+        op = self.take('op')
+        right = self.parse_operand()
+
+        if left[0] == 'num' and right[0] == 'num':
+            raise ExpressionError("Perbandingan harus memakai minimal satu feature")
+        if left[0] == 'num':
+            left, right, op = right, left, FLIPPED[op]
+        return ('cmp', left[1], op, right)
+
+
+def canonical(node):
+    """Bentuk kanonik supaya subekspresi yang sama punya key yang sama.
+
+    AND/OR bersifat komutatif: anak diratakan, diurutkan dan diduplikasi,
+    jadi `a AND b` dan `b AND a` menjadi node yang sama.
+    """
+    kind = node[0]
+    if kind == 'cmp':
+        return node
+    if kind == 'not':
+        return ('not', canonical(node[1]))
+
+    children = []
+    for child in node[1]:
+        child = canonical(child)
+        children.extend(child[1] if child[0] == kind else [child])
+    children = sorted(set(children), key=repr)
+    return children[0] if len(children) == 1 else (kind, tuple(children))
+
+
+def compile_expression(text: str):
+    """Parse dan validasi ekspresi; return AST kanonik"""
+    if not text or not text.strip():
+        raise ExpressionError("Ekspresi kosong")
+    if len(text) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError(f"Ekspresi terlalu panjang (maks {MAX_EXPRESSION_LENGTH})")
+    return canonical(Parser(tokenize(text)).parse())
+
+
+def indicator_features(node) -> bool:
+    """True bila ekspresi memakai feature indikator"""
+    if node[0] == 'cmp':
+        return node[1] in INDICATOR_FEATURES or (node[3][0] == 'feat' and
+                                                 node[3][1] in INDICATOR_FEATURES)
+    if node[0] == 'not':
+        return indicator_features(node[1])
+    return any(indicator_features(child) for child in node[1])
+
+
+class ExpressionPlan:
+    """Rencana evaluasi semua ekspresi satu symbol.
+
+    Setiap subekspresi unik (lintas user) menjadi satu node. Perbandingan
+    feature-vs-konstanta dikelompokkan per (feature, operator) dan dievaluasi
+    sekaligus dengan numpy; node AND/OR/NOT dievaluasi sekali dalam urutan
+    topologis. Biaya evaluasi sebanding dengan jumlah subekspresi unik,
+    bukan jumlah user.
+    """
+
+    def __init__(self, alerts: Dict[int, Tuple[tuple, tuple]]):
+        self.node_ids: Dict[tuple, int] = {}
+        self.compound: List[Tuple[int, str, List[int]]] = []
+        self.feature_pairs: List[Tuple[int, str, str, str]] = []
+        atom_groups: Dict[Tuple[str, str], Tuple[List[float], List[int]]] = {}
+        self.features = set()
+
+        self.alert_rows = []
+        roots = []
+        for alert, ast in alerts.values():
+            timeframe = alert[TIMEFRAME] or '1h'
+            roots.append(self._intern(ast, timeframe, atom_groups))
+            self.alert_rows.append(alert)
+
+        self.size = len(self.node_ids)
+        self.roots = np.array(roots, dtype=np.int64)
+        self.atom_groups = [
+            (feature, OPERATORS[op], np.array(consts, dtype=np.float64),
+             np.array(ids, dtype=np.int64))
+            for (feature, op), (consts, ids) in atom_groups.items()
+        ]
+
+    @staticmethod
+    def feature_key(name: str, timeframe: str) -> str:
+        return f"{name}@{timeframe}" if name in INDICATOR_FEATURES else name
+
+    def _intern(self, node, timeframe: str, atom_groups) -> int:
+        kind = node[0]
+        if kind == 'cmp':
+            feature = self.feature_key(node[1], timeframe)
+            key = ('cmp', feature, node[2], node[3] if node[3][0] == 'num' else
+                   ('feat', self.feature_key(node[3][1], timeframe)))
+        elif kind == 'not':
+            key = ('not', self._intern(node[1], timeframe, atom_groups))
+        else:
+            key = (kind, tuple(self._intern(child, timeframe, atom_groups)
+                               for child in node[1]))
+
+        if key in self.node_ids:
+            return self.node_ids[key]
+
+        node_id = len(self.node_ids)
+        self.node_ids[key] = node_id
+
+        if kind == 'cmp':
+            self.features.add(key[1])
+            if key[3][0] == 'num':
+                consts, ids = atom_groups.setdefault((key[1], key[2]), ([], []))
+                consts.append(key[3][1])
+                ids.append(node_id)
+            else:
+                self.features.add(key[3][1])
+                self.feature_pairs.append((node_id, key[1], key[2], key[3][1]))
+        elif kind == 'not':
+            self.compound.append((node_id, 'not', [key[1]]))
+        else:
+            self.compound.append((node_id, kind, list(key[1])))
+        return node_id
+
+    def evaluate(self, values: Dict[str, Optional[float]]) -> List[tuple]:
+        """Alert yang ekspresinya bernilai True untuk nilai feature ini.
+
+        Logika tiga nilai (Kleene): perbandingan dengan feature yang belum
+        tersedia (None) bernilai unknown dan merambat ke atas, jadi
+        `NOT (rsi > 70)` tanpa data RSI tetap unknown, sedangkan
+        `price > 1 OR rsi > 70` tetap True bila price memenuhi. Root yang
+        unknown tidak pernah memicu alert.
+        """
+        result = np.zeros(self.size, dtype=bool)
+        known = np.zeros(self.size, dtype=bool)
+
+        for feature, op, consts, ids in self.atom_groups:
+            value = values.get(feature)
+            if value is not None:
+                result[ids] = op(value, consts)
+                known[ids] = True
+
+        for node_id, feature, op, other in self.feature_pairs:
+            left, right = values.get(feature), values.get(other)
+            if left is not None and right is not None:
+                result[node_id] = OPERATORS[op](left, right)
+                known[node_id] = True
+
+        for node_id, kind, children in self.compound:
+            if kind == 'not':
+                result[node_id] = not result[children[0]]
+                known[node_id] = known[children[0]]
+                continue
+
+            # AND: satu anak False (pasti) cukup; OR: satu anak True (pasti) cukup
+            decisive = kind != 'and'
+            if any(known[child] and result[child] == decisive for child in children):
+                result[node_id], known[node_id] = decisive, True
+            elif all(known[child] for child in children):
+                result[node_id], known[node_id] = not decisive, True
+
+        matched = np.flatnonzero(result[self.roots] & known[self.roots])
+        return [self.alert_rows[i] for i in matched]
+
+
+class ExpressionIndex:
+    """Ekspresi alert aktif per symbol, dengan plan yang dibangun ulang saat berubah"""
+
+    def __init__(self):
+        self.alerts: Dict[str, Dict[int, Tuple[tuple, tuple]]] = {}
+        self.symbols_by_alert: Dict[int, str] = {}
+        self.plans: Dict[str, ExpressionPlan] = {}
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.symbols_by_alert)
+
+    def add(self, alert: tuple) -> bool:
+        try:
+            ast = compile_expression(alert[EXPRESSION])
+        except ExpressionError:
+            return False
+
+        with self.lock:
+            self.remove(alert[ALERT_ID])
+            symbol = alert[SYMBOL]
+            self.alerts.setdefault(symbol, {})[alert[ALERT_ID]] = (alert, ast)
+            self.symbols_by_alert[alert[ALERT_ID]] = symbol
+            self.plans.pop(symbol, None)
+            return True
+
+    def remove(self, alert_id: int):
+        with self.lock:
+            symbol = self.symbols_by_alert.pop(alert_id, None)
+            if symbol is None:
+                return
+            del self.alerts[symbol][alert_id]
+            if not self.alerts[symbol]:
+                del self.alerts[symbol]
+            self.plans.pop(symbol, None)
+
+    def load(self, alerts: List[tuple]):
+        with self.lock:
+            self.alerts.clear()
+            self.symbols_by_alert.clear()
+            self.plans.clear()
+            for alert in alerts:
+                self.add(alert)
+
+    def symbols(self) -> List[str]:
+        with self.lock:
+            return list(self.alerts)
+
+    def has_symbol(self, symbol: str) -> bool:
+        with self.lock:
+            return symbol in self.alerts
+
+    def disarmed(self, symbol: str) -> List[tuple]:
+        """Alert berulang symbol ini yang sedang menunggu re-arm"""
+        with self.lock:
+            return [alert for alert, _ in self.alerts.get(symbol, {}).values()
+                    if not alert[ARMED]]
+
+    def plan(self, symbol: str) -> Optional[ExpressionPlan]:
+        with self.lock:
+            if symbol not in self.alerts:
+                return None
+            if symbol not in self.plans:
+                self.plans[symbol] = ExpressionPlan(self.alerts[symbol])
+            return self.plans[symbol]
+
+    def match(self, symbol: str, ticker: Dict,
+              indicator_snapshot: Callable[[str, str], Optional[Dict]]) -> List[tuple]:
+        """Evaluasi semua ekspresi symbol dengan ticker terbaru"""
+        plan = self.plan(symbol)
+        if plan is None:
+            return []
+
+        values = {}
+        for feature in plan.features:
+            if '@' in feature:
+                name, timeframe = feature.split('@')
+                snapshot = indicator_snapshot(symbol, timeframe) or {}
+                values[feature] = snapshot.get(INDICATOR_FEATURES[name])
+            else:
+                values[feature] = ticker.get(TICKER_FEATURES[feature])
+
+        return plan.evaluate(values)
@@ -0,0 +1,223 @@
+import bisect
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Urutan kolom tabel alerts (SELECT *)
+ALERT_ID, USER_ID, SYMBOL, ALERT_TYPE, CONDITION_TYPE, TARGET_PRICE, \
+    CURRENT_PRICE, PERCENTAGE_CHANGE, VOLUME_THRESHOLD, IS_ACTIVE, \
+    CREATED_AT, TRIGGERED_AT, MESSAGE, TIMEFRAME, EXPRESSION, RECURRING, \
+    COOLDOWN_SECONDS, REARM_PCT, ARMED, COOLDOWN_UNTIL, TRIGGER_COUNT = range(21)
+
+# Sisi kebalikan untuk level re-arm alert berulang (hysteresis)
+REARM_SIDES = {'ABOVE': 'BELOW', 'BELOW': 'ABOVE', 'VOLUME': 'VOLUME_BELOW'}
+
+
+# Level volume untuk alert VOLUME ZSCORE: (symbol, z-score) -> volume quote
+VolumeLevel = Callable[[str, float], Optional[float]]
+
+
+def trigger_level(alert: tuple,
+                  volume_level: Optional[VolumeLevel] = None) -> Optional[Tuple[str, float]]:
+    """Ubah alert menjadi (sisi, level absolut) untuk index.
+
+    PRICE ABOVE/BELOW memakai target_price langsung; PERCENTAGE GAIN/LOSS
+    dikonversi ke harga absolut dari current_price saat alert dibuat;
+    VOLUME memakai volume_threshold; VOLUME ZSCORE (volume_threshold berisi
+    z-score) dikonversi ke volume absolut lewat `volume_level` dari baseline
+    rolling symbol. Return None bila alert tidak bisa di-index (mis.
+    current_price 0 atau baseline belum ada).
+
+    Alert berulang yang sedang tidak armed di-index pada level re-arm:
+    sisi kebalikan, `rearm_pct` persen menjauh dari threshold. Tanpa
+    `rearm_pct` alert di-arm ulang hanya berdasarkan cooldown (None).
+    """
+    level = threshold_level(alert, volume_level)
+    if level is None or alert[ARMED]:
+        return level
+
+    rearm_pct = alert[REARM_PCT]
+    if rearm_pct is None:
+        return None
+
+    side, value = level
+    if side == 'BELOW':
+        return REARM_SIDES[side], value * (1 + rearm_pct / 100)
+    return REARM_SIDES[side], value * (1 - rearm_pct / 100)
+
+
+def threshold_level(alert: tuple,
+                    volume_level: Optional[VolumeLevel] = None) -> Optional[Tuple[str, float]]:
+    """Level trigger alert (tanpa memperhitungkan status armed)"""
+    alert_type = alert[ALERT_TYPE]
+    condition_type = alert[CONDITION_TYPE]
+
+    if alert_type == 'PRICE' and alert[TARGET_PRICE] is not None:
+        if condition_type in ('ABOVE', 'BELOW'):
+            return condition_type, alert[TARGET_PRICE]
+
+    elif alert_type == 'PERCENTAGE':
+        base = alert[CURRENT_PRICE]
+        pct = alert[PERCENTAGE_CHANGE]
+        if base and base > 0 and pct is not None:
+            if condition_type == 'GAIN':
+                return 'ABOVE', base * (1 + pct / 100)
+            if condition_type == 'LOSS':
+                return 'BELOW', base * (1 - pct / 100)
+
+    elif alert_type == 'VOLUME' and alert[VOLUME_THRESHOLD] is not None:
+        if condition_type != 'ZSCORE':
+            return 'VOLUME', alert[VOLUME_THRESHOLD]
+        if volume_level is not None:
+            value = volume_level(alert[SYMBOL], alert[VOLUME_THRESHOLD])
+            if value is not None:
+                return 'VOLUME', value
+
+    return None
+
+
+class AlertThresholdIndex:
+    """Index threshold alert per symbol di memory.
+
+    Per symbol disimpan list terurut (level, alert_id) untuk sisi ABOVE,
+    BELOW, VOLUME dan VOLUME_BELOW (re-arm volume). Satu update harga cukup
+    dicek dengan binary search: alert ABOVE yang kena adalah prefix dengan level <= harga, alert BELOW
+    adalah suffix dengan level >= harga, jadi biayanya O(log n + k).
+    """
+
+    def __init__(self, volume_level: Optional[VolumeLevel] = None):
+        self.volume_level = volume_level
+        self.sides: Dict[str, Dict[str, List[Tuple[float, int]]]] = {}
+        self.alerts: Dict[int, tuple] = {}
+        self.levels: Dict[int, Tuple[str, float]] = {}
+        # Alert aktif yang tidak punya level (tetap dihitung untuk sinkronisasi)
+        self.unindexed = set()
+        self.max_id = 0
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.alerts)
+
+    @property
+    def tracked_count(self) -> int:
+        """Jumlah alert aktif yang diketahui index, termasuk yang tidak ter-index"""
+        return len(self.alerts) + len(self.unindexed)
+
+    def clear(self):
+        with self.lock:
+            self.sides.clear()
+            self.alerts.clear()
+            self.levels.clear()
+            self.unindexed.clear()
+            self.max_id = 0
+
+    def add(self, alert: tuple) -> bool:
+        """Tambah satu baris alert; return False bila tidak bisa di-index"""
+        alert_id = alert[ALERT_ID]
+        with self.lock:
+            self.max_id = max(self.max_id, alert_id)
+            self.remove(alert_id)
+
+            level = trigger_level(alert, self.volume_level)
+            if level is None:
+                self.unindexed.add(alert_id)
+                return False
+
+            side, value = level
+            symbol_sides = self.sides.setdefault(alert[SYMBOL], {
+                'ABOVE': [],
+                'BELOW': [],
+                'VOLUME': [],
+                'VOLUME_BELOW': []
+            })
+            bisect.insort(symbol_sides[side], (value, alert_id))
+            self.alerts[alert_id] = alert
+            self.levels[alert_id] = level
+            return True
+
+    def remove(self, alert_id: int) -> Optional[tuple]:
+        """Hapus alert dari index; return barisnya bila ada"""
+        with self.lock:
+            self.unindexed.discard(alert_id)
+            alert = self.alerts.pop(alert_id, None)
+            if alert is None:
+                return None
+
+            side, value = self.levels.pop(alert_id)
+            symbol = alert[SYMBOL]
+            entries = self.sides[symbol][side]
+            position = bisect.bisect_left(entries, (value, alert_id))
+            if position < len(entries) and entries[position] == (value, alert_id):
+                del entries[position]
+
+            if not any(self.sides[symbol].values()):
+                del self.sides[symbol]
+            return alert
+
+    def load(self, alerts: List[tuple]):
+        """Bangun ulang index dari semua alert aktif"""
+        with self.lock:
+            self.clear()
+            for alert in alerts:
+                self.add(alert)
+
+    def symbols(self) -> List[str]:
+        with self.lock:
+            return list(self.sides)
+
+    def match(self, symbol: str, price: Optional[float],
+              volume: Optional[float] = None) -> List[tuple]:
+        """Alert yang kondisinya terpenuhi oleh harga/volume terbaru.
+
+        Untuk alert yang tidak armed artinya level re-arm-nya tercapai.
+        """
+        with self.lock:
+            symbol_sides = self.sides.get(symbol)
+            if not symbol_sides:
+                return []
+
+            matched = []
+            if price is not None:
+                above = symbol_sides['ABOVE']
+                end = bisect.bisect_right(above, (price, float('inf')))
+                matched.extend(above[:end])
+
+                below = symbol_sides['BELOW']
+                start = bisect.bisect_left(below, (price, float('-inf')))
+                matched.extend(below[start:])
+
+            if volume is not None:
+                volumes = symbol_sides['VOLUME']
+                end = bisect.bisect_right(volumes, (volume, float('inf')))
+                matched.extend(volumes[:end])
+
+                volumes_below = symbol_sides['VOLUME_BELOW']
+                start = bisect.bisect_left(volumes_below, (volume, float('-inf')))
+                matched.extend(volumes_below[start:])
+
+            return [self.alerts[alert_id] for _, alert_id in matched]
+
+    def nearest_distance(self, symbol: str, price: float) -> Optional[float]:
+        """Jarak absolut harga ke threshold ABOVE/BELOW terdekat"""
+        with self.lock:
+            symbol_sides = self.sides.get(symbol)
+            if not symbol_sides:
+                return None
+
+            distances = []
+            above = symbol_sides['ABOVE']
+            position = bisect.bisect_right(above, (price, float('inf')))
+            if position < len(above):
+                distances.append(above[position][0] - price)
+
+            below = symbol_sides['BELOW']
+            position = bisect.bisect_left(below, (price, float('-inf')))
+            if position > 0:
+                distances.append(price - below[position - 1][0])
+
+            return min(distances) if distances else None
+
+    def has_volume_alerts(self, symbol: str) -> bool:
+        with self.lock:
+            symbol_sides = self.sides.get(symbol)
+            return bool(symbol_sides and (symbol_sides['VOLUME'] or
+                                          symbol_sides['VOLUME_BELOW']))
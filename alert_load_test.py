@@ -0,0 +1,217 @@
+"""Load generator offline untuk alert engine.
+
+Membuat populasi alert sintetis (PRICE/PERCENTAGE/VOLUME/EXPRESSION, sebagian
+berulang) di database sementara, lalu menjalankan jalur harga dari
+FakeExchange dan melaporkan waktu siklus cek, distribusi latency trigger dan
+pertumbuhan database. Tidak ada request ke exchange sungguhan.
+
+Contoh:
+    python alert_load_test.py --alerts 100000 --symbols 200 --steps 300
+    python alert_load_test.py --mode event --latency 0.02 --error-rate 0.01
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+from alert_system import AdvancedAlertSystem
+from fake_exchange import FakeExchange
+
+
+def percentile(values: List[float], pct: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def distribution(values: List[float]) -> Dict:
+    """Ringkasan dalam milidetik"""
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'median_ms': round(statistics.median(values) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(max(values) * 1000, 3),
+    }
+
+
+def db_size(db_path: str) -> int:
+    return sum(os.path.getsize(path) for path in (db_path, db_path + '-wal')
+               if os.path.exists(path))
+
+
+def table_counts(alert_system: AdvancedAlertSystem) -> Dict[str, int]:
+    return {table: alert_system.db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            for table in ('alerts', 'alert_history', 'alert_changes')}
+
+
+def synthetic_alerts(exchange: FakeExchange, symbols: List[str], count: int,
+                     recurring_ratio: float, rng: random.Random) -> List[Dict]:
+    """Baris alert sintetis di sekitar harga saat ini (sebagian akan terpicu)"""
+    prices = {symbol: exchange.price_at(symbol, exchange.current_step())
+              for symbol in symbols}
+    rows = []
+    for number in range(count):
+        symbol = rng.choice(symbols)
+        price = prices[symbol]
+        user_id = str(100000 + number // 5)
+        cooldown = rng.choice([60, 300, 3600]) if rng.random() < recurring_ratio else None
+        row = dict(user_id=user_id, symbol=symbol, current_price=price,
+                   recurring=int(cooldown is not None), cooldown_seconds=cooldown,
+                   rearm_pct=None)
+
+        kind = rng.random()
+        if kind < 0.5:
+            distance = rng.uniform(0.001, 0.05)
+            condition = rng.choice(['ABOVE', 'BELOW'])
+            target = price * (1 + distance if condition == 'ABOVE' else 1 - distance)
+            row.update(alert_type='PRICE', condition_type=condition, target_price=target,
+                       message=f"{symbol} price alert")
+            if cooldown is not None:
+                row['rearm_pct'] = rng.choice([0.5, 1, 2])
+        elif kind < 0.7:
+            row.update(alert_type='PERCENTAGE', condition_type=rng.choice(['GAIN', 'LOSS']),
+                       percentage_change=rng.uniform(0.2, 5),
+                       message=f"{symbol} percentage alert")
+        elif kind < 0.85:
+            row.update(alert_type='VOLUME', condition_type='SPIKE',
+                       volume_threshold=1e6 * rng.uniform(1, 4),
+                       message=f"{symbol} volume spike alert")
+        else:
+            level = price * (1 + rng.uniform(0.001, 0.03))
+            row.update(alert_type='EXPRESSION', condition_type='MATCH',
+                       expression=f"price > {level:.6g} AND change_24h < {rng.randint(1, 20)}",
+                       message=f"{symbol} expression alert")
+        rows.append(row)
+    return rows
+
+
+def insert_alerts(alert_system: AdvancedAlertSystem, rows: List[Dict]):
+    """Bulk insert langsung (jalur create per alert terlalu lambat untuk 100k)"""
+    columns = ['user_id', 'symbol', 'alert_type', 'condition_type', 'target_price',
+               'current_price', 'percentage_change', 'volume_threshold', 'message',
+               'expression', 'recurring', 'cooldown_seconds', 'rearm_pct']
+    with alert_system.db.transaction() as cursor:
+        cursor.executemany(f'''
+            INSERT INTO alerts ({', '.join(columns)})
+            VALUES ({', '.join('?' for _ in columns)})
+        ''', [tuple(row.get(column) for column in columns) for row in rows])
+
+
+def run(args) -> Dict:
+    rng = random.Random(args.seed)
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='alert-load-'), 'alerts.db')
+    symbols = [f"SYN{number}/USDT" for number in range(args.symbols)]
+    exchange = FakeExchange(seed=args.seed, symbols=symbols, latency=args.latency,
+                            jitter=args.jitter, error_rate=args.error_rate,
+                            rate_limit=args.rate_limit, tick_interval=None,
+                            volatility=args.volatility)
+
+    alert_system = AdvancedAlertSystem(db_path)
+    alert_system._exchange = exchange
+    size_before = db_size(db_path)
+
+    started = time.perf_counter()
+    insert_alerts(alert_system, synthetic_alerts(exchange, symbols, args.alerts,
+                                                 args.recurring, rng))
+    insert_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    alert_system.load_index()
+    load_seconds = time.perf_counter() - started
+    indexed = len(alert_system.index) + len(alert_system.expressions)
+    size_loaded = db_size(db_path)
+
+    cycles, latencies, errors, triggered = [], [], 0, 0
+    for _ in range(args.steps):
+        exchange.advance()
+        started = time.perf_counter()
+        try:
+            if args.mode == 'event':
+                # Satu tick per symbol, seperti stream; latency dihitung per tick
+                tickers = exchange.fetch_tickers(symbols)
+                for symbol, ticker in tickers.items():
+                    fired = alert_system.check_symbol(symbol, ticker)
+                    if fired:
+                        triggered += len(fired)
+                        latencies.extend([time.time() - ticker['timestamp'] / 1000] * len(fired))
+            else:
+                fetched_at = time.time()
+                fired = alert_system.check_alerts()
+                triggered += len(fired)
+                latencies.extend([time.time() - fetched_at] * len(fired))
+        except Exception as e:
+            errors += 1
+            logging.getLogger(__name__).debug(f"Cycle failed: {e}")
+        cycles.append(time.perf_counter() - started)
+
+    return {
+        'db_path': db_path,
+        'mode': args.mode,
+        'alerts': args.alerts,
+        'symbols': args.symbols,
+        'steps': args.steps,
+        'insert_seconds': round(insert_seconds, 3),
+        'index_load_seconds': round(load_seconds, 3),
+        'indexed': indexed,
+        'check_cycle': distribution(cycles),
+        'trigger_latency': distribution(latencies),
+        'triggered': triggered,
+        'failed_cycles': errors,
+        'exchange_requests': exchange.requests,
+        'db_bytes': {'before': size_before, 'after_load': size_loaded,
+                     'after_run': db_size(db_path)},
+        'rows': table_counts(alert_system),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline alert engine load test")
+    parser.add_argument('--alerts', type=int, default=100000)
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--steps', type=int, default=300)
+    parser.add_argument('--mode', choices=['cycle', 'event'], default='cycle',
+                        help="cycle: check_alerts per langkah; event: check_symbol per tick")
+    parser.add_argument('--recurring', type=float, default=0.2,
+                        help="proporsi alert berulang")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--volatility', type=float, default=0.002)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="latency simulasi exchange per request (detik)")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=None,
+                        help="request/detik sebelum RateLimitExceeded")
+    parser.add_argument('--db', help="path database (default: direktori sementara)")
+    parser.add_argument('--json', action='store_true', help="output JSON saja")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run(args)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Alerts: {report['alerts']} on {report['symbols']} symbols "
+          f"({report['indexed']} indexed), {report['steps']} steps, mode {report['mode']}")
+    print(f"Insert: {report['insert_seconds']}s, index load: {report['index_load_seconds']}s")
+    print(f"Check cycle: {report['check_cycle']}")
+    print(f"Trigger latency: {report['trigger_latency']}")
+    print(f"Triggered: {report['triggered']}, failed cycles: {report['failed_cycles']}, "
+          f"exchange requests: {report['exchange_requests']}")
+    print(f"DB bytes: {report['db_bytes']}")
+    print(f"Rows: {report['rows']}")
+    print(f"Database: {report['db_path']}")
+
+
+if __name__ == '__main__':
+    main()
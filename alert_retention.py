@@ -0,0 +1,143 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from alert_db import AlertDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class AlertHistoryCompactor:
+    """Job retensi untuk alert_history.
+
+    Trigger yang lebih tua dari `retention_days` diringkas ke
+    alert_history_daily (jumlah trigger, waktu pertama/terakhir dan rentang
+    harga per alert per hari) lalu dihapus, per batch kecil supaya lock
+    tulis tetap singkat. Alert nonaktif yang terpicu (atau, bila tidak
+    pernah terpicu, dibuat) sebelum batas retensi ikut dibuang. Halaman
+    kosong dikembalikan ke filesystem dengan incremental vacuum, sedikit
+    demi sedikit per putaran, bila database memakai auto_vacuum incremental
+    (database lama: lihat AlertDatabase.enable_incremental_vacuum).
+    """
+
+    def __init__(self, db: AlertDatabase, retention_days: float = 90,
+                 batch_size: int = 5000, vacuum_pages: int = 2000,
+                 interval: float = 3600, batch_pause: float = 0.05):
+        self.db = db
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.interval = interval
+        self.batch_pause = batch_pause
+        self.running = False
+        self.last_run: Optional[Dict] = None
+
+    def cutoff(self) -> str:
+        return (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+
+    def compact_batch(self, cutoff: str) -> int:
+        """Ringkas dan hapus satu batch history lama; return jumlah baris"""
+        with self.db.transaction() as cursor:
+            ids = [row[0] for row in cursor.execute('''
+                SELECT id FROM alert_history
+                WHERE triggered_at < ? ORDER BY triggered_at LIMIT ?
+            ''', (cutoff, self.batch_size)).fetchall()]
+            if not ids:
+                return 0
+
+            batch = json.dumps(ids)
+            cursor.execute('''
+                INSERT INTO alert_history_daily
+                    (alert_id, day, user_id, symbol, trigger_count,
+                     first_triggered_at, last_triggered_at, min_price, max_price)
+                SELECT alert_id, substr(triggered_at, 1, 10), MAX(user_id), MAX(symbol),
+                       COUNT(*), MIN(triggered_at), MAX(triggered_at),
+                       MIN(price_at_trigger), MAX(price_at_trigger)
+                FROM alert_history
+                WHERE id IN (SELECT value FROM json_each(?))
+                GROUP BY alert_id, substr(triggered_at, 1, 10)
+                ON CONFLICT (alert_id, day) DO UPDATE SET
+                    trigger_count = trigger_count + excluded.trigger_count,
+                    first_triggered_at = MIN(first_triggered_at, excluded.first_triggered_at),
+                    last_triggered_at = MAX(last_triggered_at, excluded.last_triggered_at),
+                    min_price = MIN(COALESCE(min_price, excluded.min_price),
+                                    COALESCE(excluded.min_price, min_price)),
+                    max_price = MAX(COALESCE(max_price, excluded.max_price),
+                                    COALESCE(excluded.max_price, max_price))
+            ''', (batch, ))
+            cursor.execute('''
+                DELETE FROM alert_history WHERE id IN (SELECT value FROM json_each(?))
+            ''', (batch, ))
+            return len(ids)
+
+    def purge_batch(self, cutoff: str) -> int:
+        """Hapus satu batch alert nonaktif yang lebih tua dari batas retensi.
+
+        triggered_at berformat isoformat waktu lokal, created_at diisi
+        CURRENT_TIMESTAMP SQLite (UTC) sehingga dibandingkan dengan datetime('now').
+        """
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                DELETE FROM alerts WHERE id IN (
+                    SELECT id FROM alerts
+                    WHERE is_active = 0 AND (
+                        triggered_at < ? OR
+                        (triggered_at IS NULL AND created_at < datetime('now', ?)))
+                    LIMIT ?)
+            ''', (cutoff, f"-{self.retention_days} days", self.batch_size))
+            return cursor.rowcount
+
+    def drain(self, step, cutoff: str) -> int:
+        """Jalankan `step` per batch sampai habis"""
+        total = 0
+        while True:
+            count = step(cutoff)
+            total += count
+            if count < self.batch_size:
+                return total
+            # Beri kesempatan writer lain (alert engine) di antara batch
+            time.sleep(self.batch_pause)
+
+    def run_once(self) -> Dict:
+        started = time.monotonic()
+        cutoff = self.cutoff()
+
+        compacted = self.drain(self.compact_batch, cutoff)
+        purged = self.drain(self.purge_batch, cutoff)
+        freed_pages = self.db.incremental_vacuum(self.vacuum_pages)
+
+        self.last_run = {
+            'cutoff': cutoff,
+            'compacted': compacted,
+            'purged': purged,
+            'freed_pages': freed_pages,
+            'seconds': round(time.monotonic() - started, 3),
+            'finished_at': datetime.now().isoformat()
+        }
+        if compacted or purged or freed_pages:
+            logger.info(f"Alert history compaction: {self.last_run}")
+        return self.last_run
+
+    def start(self) -> threading.Thread:
+        self.running = True
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        if not self.db.incremental_vacuum_enabled():
+            logger.info("Alert DB auto_vacuum is not incremental; run "
+                        "`python alert_db.py --enable-incremental-vacuum` during maintenance")
+
+        while self.running:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error compacting alert history: {e}")
+            time.sleep(self.interval)
@@ -0,0 +1,142 @@
+import heapq
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptivePollScheduler:
+    """Jadwal polling alert per symbol berdasarkan jarak ke threshold dan ATR.
+
+    Symbol yang threshold terdekatnya jauh (diukur dalam kelipatan ATR) dicek
+    jarang, symbol yang tinggal beberapa tick dari trigger dicek sering.
+    Dengan asumsi harga bergerak seperti random walk, waktu untuk menempuh
+    k ATR kira-kira k^2 candle, jadi interval = safety * k^2 * durasi candle,
+    dibatasi `min_interval`..`max_interval`. Total cek dijaga di bawah
+    `budget_per_minute`; bila permintaan melebihi budget semua interval
+    diregangkan dengan faktor yang sama. Antrian memakai heap (waktu cek
+    berikutnya, symbol).
+    """
+
+    def __init__(self, alert_system, fetch_atr: Callable[[str], Optional[float]],
+                 budget_per_minute: int = 60, min_interval: float = 5,
+                 max_interval: float = 300, volume_interval: float = 60,
+                 atr_timeframe_seconds: int = 3600, atr_ttl: float = 900,
+                 safety: float = 0.1, fallback_atr_pct: float = 0.02):
+        self.alert_system = alert_system
+        self.fetch_atr = fetch_atr
+        self.budget_per_minute = budget_per_minute
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.volume_interval = volume_interval
+        self.atr_timeframe_seconds = atr_timeframe_seconds
+        self.atr_ttl = atr_ttl
+        self.safety = safety
+        self.fallback_atr_pct = fallback_atr_pct
+
+        self.heap: List[tuple] = []
+        self.next_check: Dict[str, float] = {}
+        self.intervals: Dict[str, float] = {}
+        self.atr_cache: Dict[str, tuple] = {}
+
+    def sync_symbols(self, now: float):
+        """Symbol alert baru langsung dijadwalkan, symbol tanpa alert dibuang"""
+        self.alert_system.sync_index()
+        symbols = set(self.alert_system.watched_symbols())
+
+        for symbol in symbols - set(self.next_check):
+            self.schedule(symbol, now)
+
+        for symbol in set(self.next_check) - symbols:
+            del self.next_check[symbol]
+            self.intervals.pop(symbol, None)
+        # Entry heap untuk symbol yang dibuang diabaikan saat di-pop
+
+    def schedule(self, symbol: str, when: float):
+        self.next_check[symbol] = when
+        heapq.heappush(self.heap, (when, symbol))
+
+    def due_symbols(self, now: float, limit: int) -> List[str]:
+        """Ambil sampai `limit` symbol yang sudah jatuh tempo"""
+        due = []
+        while self.heap and self.heap[0][0] <= now and len(due) < limit:
+            when, symbol = heapq.heappop(self.heap)
+            # Lewati entry basi (symbol dihapus atau sudah dijadwal ulang)
+            if self.next_check.get(symbol) == when:
+                due.append(symbol)
+        return due
+
+    def seconds_until_due(self) -> float:
+        while self.heap and self.next_check.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        if not self.heap:
+            return self.min_interval
+        return max(0.0, self.heap[0][0] - time.time())
+
+    def get_atr(self, symbol: str, price: float) -> float:
+        """ATR symbol (cache `atr_ttl` detik); fallback persentase harga"""
+        cached = self.atr_cache.get(symbol)
+        if cached and time.time() - cached[1] < self.atr_ttl:
+            return cached[0]
+
+        try:
+            atr = self.fetch_atr(symbol)
+        except Exception as e:
+            logger.warning(f"ATR unavailable for {symbol}: {e}")
+            atr = None
+
+        if not atr or atr <= 0:
+            atr = price * self.fallback_atr_pct
+        self.atr_cache[symbol] = (atr, time.time())
+        return atr
+
+    def desired_interval(self, symbol: str, price: float) -> float:
+        """Interval cek berikutnya dari jarak threshold terdekat dalam satuan ATR"""
+        interval = self.max_interval
+
+        distance = self.alert_system.index.nearest_distance(symbol, price)
+        if distance is not None:
+            atrs_away = distance / self.get_atr(symbol, price)
+            interval = self.safety * atrs_away ** 2 * self.atr_timeframe_seconds
+
+        # Volume dan ekspresi tidak punya jarak harga, pakai cadence tetap
+        if (self.alert_system.index.has_volume_alerts(symbol) or
+                self.alert_system.expressions.has_symbol(symbol)):
+            interval = min(interval, self.volume_interval)
+
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def budget_scale(self) -> float:
+        """Faktor peregangan interval agar total cek/menit <= budget"""
+        demand = sum(60 / interval for interval in self.intervals.values())
+        return max(1.0, demand / self.budget_per_minute)
+
+    def run_due(self) -> List[Dict]:
+        """Cek semua symbol yang jatuh tempo dengan satu fetch_tickers"""
+        now = time.time()
+        self.sync_symbols(now)
+
+        due = self.due_symbols(now, limit=self.budget_per_minute)
+        if not due:
+            return []
+
+        tickers = self.alert_system.fetch_tickers(due)
+        triggered_alerts = []
+
+        for symbol in due:
+            ticker = tickers.get(symbol)
+            if not ticker or ticker.get('last') is None:
+                self.schedule(symbol, now + self.min_interval)
+                continue
+
+            triggered_alerts.extend(self.alert_system.check_symbol(
+                symbol, ticker, sync_interval=float('inf')))
+            self.intervals[symbol] = self.desired_interval(symbol, ticker['last'])
+
+        scale = self.budget_scale()
+        for symbol in due:
+            if symbol in self.intervals and symbol in self.next_check:
+                self.schedule(symbol, now + self.intervals[symbol] * scale)
+
+        return triggered_alerts
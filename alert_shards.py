@@ -0,0 +1,287 @@
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from alert_db import AlertDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class HashRing:
+    """Consistent hash ring: symbol -> worker.
+
+    Setiap worker ditempatkan di `replicas` titik virtual, jadi saat worker
+    ditambah/dibuang hanya sekitar 1/N symbol yang pindah pemilik.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 100):
+        self.replicas = replicas
+        self.hashes: List[int] = []
+        self.owners: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+    def add(self, node: str):
+        for replica in range(self.replicas):
+            point = self.hash(f"{node}#{replica}")
+            position = bisect.bisect_left(self.hashes, point)
+            self.hashes.insert(position, point)
+            self.owners.insert(position, node)
+
+    def remove(self, node: str):
+        points = [(point, owner) for point, owner in zip(self.hashes, self.owners)
+                  if owner != node]
+        self.hashes = [point for point, _ in points]
+        self.owners = [owner for _, owner in points]
+
+    def node_for(self, key: str) -> Optional[str]:
+        if not self.hashes:
+            return None
+        position = bisect.bisect_left(self.hashes, self.hash(key)) % len(self.hashes)
+        return self.owners[position]
+
+
+class ShardMembership:
+    """Keanggotaan satu worker di ring (tabel alert_shard_members).
+
+    Worker mengirim heartbeat berkala; anggota yang heartbeat-nya lebih tua
+    dari `ttl` dianggap mati. `refresh()` membangun ulang ring bila daftar
+    anggota berubah sehingga shard otomatis rebalance.
+    """
+
+    def __init__(self, db_path: str, worker_id: str, ttl: float = 15,
+                 replicas: int = 100):
+        self.db = AlertDatabase(db_path)
+        self.worker_id = worker_id
+        self.ttl = ttl
+        self.replicas = replicas
+        self.members: tuple = ()
+        self.ring = HashRing()
+
+    def join(self):
+        now = time.time()
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                INSERT OR REPLACE INTO alert_shard_members
+                    (worker_id, pid, started_at, heartbeat_at)
+                VALUES (?, ?, ?, ?)
+            ''', (self.worker_id, os.getpid(), now, now))
+        self.refresh()
+
+    def heartbeat(self):
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                UPDATE alert_shard_members SET heartbeat_at = ? WHERE worker_id = ?
+            ''', (time.time(), self.worker_id))
+
+    def leave(self):
+        evict_member(self.db, self.worker_id)
+
+    def live_members(self) -> List[str]:
+        return [row[0] for row in self.db.execute('''
+            SELECT worker_id FROM alert_shard_members WHERE heartbeat_at >= ?
+        ''', (time.time() - self.ttl, )).fetchall()]
+
+    def refresh(self) -> bool:
+        """Baca ulang anggota ring; return True bila berubah"""
+        members = tuple(sorted(set(self.live_members()) | {self.worker_id}))
+        if members == self.members:
+            return False
+
+        logger.info(f"Shard {self.worker_id}: members {list(members)}")
+        self.members = members
+        self.ring = HashRing(members, self.replicas)
+        return True
+
+    def owns(self, symbol: str) -> bool:
+        return self.ring.node_for(symbol) == self.worker_id
+
+
+def evict_member(db: AlertDatabase, worker_id: str):
+    with db.transaction() as cursor:
+        cursor.execute('DELETE FROM alert_shard_members WHERE worker_id = ?',
+                       (worker_id, ))
+
+
+def run_shard_worker(worker_id: str, db_path: str, reports, config: Dict):
+    """Entry point proses shard.
+
+    Proses memegang index alert dan subscription harga hanya untuk symbol
+    miliknya, mencatat trigger ke database, lalu melaporkan trigger dan
+    statistiknya ke supervisor lewat `reports`.
+    """
+    # Import di sini supaya proses supervisor tidak ikut memuat engine
+    from alert_engine import AlertEngine
+    from alert_scheduler import AdaptivePollScheduler
+    from alert_system import AdvancedAlertSystem
+    from price_feed import price_feed_from_env
+
+    logging.basicConfig(level=logging.INFO)
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+
+    membership = ShardMembership(db_path, worker_id, ttl=config.get('ttl', 15))
+    membership.join()
+    alert_system = AdvancedAlertSystem(db_path, shard=membership)
+
+    # ATR tidak tersedia di shard (tanpa pandas-ta): scheduler memakai fallback %
+    scheduler = AdaptivePollScheduler(
+        alert_system, fetch_atr=lambda symbol: None,
+        budget_per_minute=config.get('poll_budget', 60))
+    engine = AlertEngine(
+        alert_system,
+        on_triggered=lambda alerts: reports.put(('triggered', worker_id, alerts)),
+        feed=price_feed_from_env(alert_system.current_symbols),
+        scheduler=scheduler,
+        poll_interval=config.get('poll_interval', 60))
+    engine_thread = engine.start()
+    logger.info(f"Shard {worker_id} started (pid {os.getpid()})")
+
+    try:
+        while not stopping.is_set() and engine_thread.is_alive():
+            membership.heartbeat()
+            reports.put(('stats', worker_id, {
+                **engine.stats(),
+                'pid': os.getpid(),
+                'symbols': len(alert_system.watched_symbols()),
+                'alerts': len(alert_system.index) + len(alert_system.expressions),
+            }))
+            stopping.wait(config.get('heartbeat_interval', 5))
+    finally:
+        engine.stop()
+        membership.leave()
+        logger.info(f"Shard {worker_id} stopped")
+
+
+class ShardSupervisor:
+    """Menjalankan N proses shard evaluasi alert dan satu jalur dispatch.
+
+    Symbol dibagi ke shard dengan consistent hashing; tiap shard punya index
+    dan subscription harga sendiri sehingga evaluasi tidak lagi dibatasi satu
+    core/GIL. Trigger dari semua shard masuk satu antrian dan diteruskan ke
+    `on_triggered` (dispatcher notifikasi) di proses ini. Shard yang mati
+    dikeluarkan dari ring (shard lain langsung mengambil alih symbolnya) lalu
+    dijalankan ulang; `scale()` menambah/mengurangi shard saat berjalan.
+    """
+
+    def __init__(self, db_path: str, workers: int,
+                 on_triggered: Callable[[List[Dict]], None],
+                 config: Optional[Dict] = None, restart_delay: float = 5):
+        self.db_path = db_path
+        self.workers = workers
+        self.on_triggered = on_triggered
+        self.config = config or {}
+        self.restart_delay = restart_delay
+        self.db = AlertDatabase(db_path)
+        self.context = multiprocessing.get_context('spawn')
+        self.reports = self.context.Queue()
+        self.processes: Dict[str, multiprocessing.Process] = {}
+        self.worker_stats: Dict[str, Dict] = {}
+        self.restarts = 0
+        self.running = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.running = True
+        # Anggota dari run sebelumnya sudah tidak ada
+        with self.db.transaction() as cursor:
+            cursor.execute('DELETE FROM alert_shard_members')
+
+        self.scale(self.workers)
+        threading.Thread(target=self.drain, daemon=True).start()
+        threading.Thread(target=self.monitor, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        with self.lock:
+            for process in self.processes.values():
+                process.terminate()
+            for process in self.processes.values():
+                process.join(timeout=10)
+            self.processes.clear()
+
+    def worker_ids(self, count: int) -> List[str]:
+        return [f"shard-{number}" for number in range(count)]
+
+    def spawn(self, worker_id: str):
+        process = self.context.Process(
+            target=run_shard_worker, name=worker_id, daemon=True,
+            args=(worker_id, self.db_path, self.reports, self.config))
+        process.start()
+        self.processes[worker_id] = process
+
+    def scale(self, workers: int):
+        """Ubah jumlah shard; ring rebalance lewat tabel anggota"""
+        with self.lock:
+            self.workers = workers
+            wanted = set(self.worker_ids(workers))
+
+            for worker_id in sorted(wanted - set(self.processes)):
+                self.spawn(worker_id)
+
+            for worker_id in sorted(set(self.processes) - wanted):
+                process = self.processes.pop(worker_id)
+                process.terminate()
+                process.join(timeout=10)
+                evict_member(self.db, worker_id)
+                self.worker_stats.pop(worker_id, None)
+
+        logger.info(f"Alert shards: {workers} worker(s)")
+
+    def monitor(self):
+        """Keluarkan shard yang mati dari ring lalu jalankan ulang"""
+        while self.running:
+            time.sleep(self.restart_delay)
+            with self.lock:
+                for worker_id, process in list(self.processes.items()):
+                    if process.is_alive() or not self.running:
+                        continue
+
+                    logger.error(f"Shard {worker_id} exited ({process.exitcode}), restarting")
+                    evict_member(self.db, worker_id)
+                    self.restarts += 1
+                    self.spawn(worker_id)
+
+    def drain(self):
+        """Teruskan trigger semua shard ke satu dispatcher"""
+        while self.running:
+            try:
+                kind, worker_id, payload = self.reports.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            if kind == 'stats':
+                self.worker_stats[worker_id] = payload
+                continue
+
+            try:
+                self.on_triggered(payload)
+            except Exception as e:
+                logger.error(f"Error dispatching triggers from {worker_id}: {e}")
+
+    def stats(self) -> Dict:
+        workers = {}
+        for worker_id, process in list(self.processes.items()):
+            workers[worker_id] = {
+                'alive': process.is_alive(),
+                **self.worker_stats.get(worker_id, {})
+            }
+
+        return {
+            'mode': 'sharded',
+            'shards': self.workers,
+            'restarts': self.restarts,
+            'ticks': sum(worker.get('ticks', 0) for worker in workers.values()),
+            'workers': workers
+        }
@@ -1,65 +1,254 @@
 
 import json
-import sqlite3
 import threading
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import requests
-import ccxt
 import logging
 
+from alert_db import AlertDatabase
+from alert_expressions import ExpressionIndex, compile_expression, indicator_features
+from alert_index import (ALERT_ID, ALERT_TYPE, ARMED, CONDITION_TYPE, COOLDOWN_UNTIL,
+                         EXPRESSION, SYMBOL, AlertThresholdIndex)
+from fake_exchange import create_exchange
+from indicator_alerts import INDICATOR_CONDITIONS, INDICATOR_TIMEFRAMES
+from volume_baseline import VolumeBaseline
+
 logger = logging.getLogger(__name__)
 
+# Kolom yang menentukan dua alert identik (dipakai untuk dedup saat create)
+DEDUP_COLUMNS = ('user_id', 'symbol', 'alert_type', 'condition_type', 'target_price',
+                 'percentage_change', 'volume_threshold', 'timeframe', 'expression')
+REARM_ALERT_TYPES = ('PRICE', 'PERCENTAGE', 'VOLUME')
+# SPIKE: volume 24h >= threshold absolut; ZSCORE: z-score terhadap baseline rolling
+VOLUME_CONDITIONS = ('SPIKE', 'ZSCORE')
+# Entry alert_changes lebih tua dari ini dibuang (pembaca yang tertinggal reload)
+CHANGE_LOG_RETENTION = 3600
+
 class AdvancedAlertSystem:
-    def __init__(self, db_path="alerts.db"):
+    def __init__(self, db_path="alerts.db", shard=None):
         self.db_path = db_path
         self.active_alerts = {}
-        self.exchange = ccxt.binance()
-        self.setup_database()
+        self._exchange = None
+        self.db = AlertDatabase(db_path)
+        # Baseline volume (dibaca saja; di-update oleh loop baseline di app)
+        self.volume_baseline = VolumeBaseline(self.db)
+        self.index = AlertThresholdIndex(volume_level=self.volume_baseline.level)
+        self.expressions = ExpressionIndex()
+        # Mode sharded: hanya alert symbol milik shard ini yang di-index
+        self.shard = shard
+        self._snapshots = {}
+        self._last_sync = 0.0
+        self._change_id = 0
+        self._last_prune = time.monotonic()
+        self.load_index()
+
+    @property
+    def exchange(self):
+        """Instance exchange dibuat saat pertama kali dibutuhkan"""
+        if self._exchange is None:
+            self._exchange = create_exchange()
+        return self._exchange
         
     def setup_database(self):
-        """Initialize SQLite database for alerts"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS alerts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                symbol TEXT NOT NULL,
-                alert_type TEXT NOT NULL,
-                condition_type TEXT NOT NULL,
-                target_price REAL,
-                current_price REAL,
-                percentage_change REAL,
-                volume_threshold REAL,
-                is_active BOOLEAN DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                triggered_at TIMESTAMP,
-                message TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS alert_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                alert_id INTEGER,
-                triggered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                price_at_trigger REAL,
-                message TEXT,
-                FOREIGN KEY (alert_id) REFERENCES alerts (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-    
+        """Initialize SQLite database for alerts (jalankan migrasi schema)"""
+        self.db.migrate()
+
+    def owns(self, symbol: str) -> bool:
+        return self.shard is None or self.shard.owns(symbol)
+
+    def load_index(self):
+        """Bangun ulang threshold index dan index ekspresi dari alert aktif"""
+        # Posisi log dibaca dulu: perubahan selama load diputar ulang (idempoten)
+        self._change_id = self.db.execute(
+            'SELECT COALESCE(MAX(id), 0) FROM alert_changes').fetchone()[0]
+        alerts = [alert for alert in self.db.execute(
+            'SELECT * FROM alerts WHERE is_active = 1').fetchall()
+                  if self.owns(alert[SYMBOL])]
+
+        self.index.load(alerts)
+        self.expressions.load([alert for alert in alerts
+                               if alert[ALERT_TYPE] == 'EXPRESSION'])
+        logger.info(f"Alert index loaded: {len(self.index)} alerts, "
+                    f"{len(self.expressions)} expressions")
+
+    def track_alert(self, alert: tuple):
+        """Masukkan alert aktif ke index yang sesuai"""
+        if not self.owns(alert[SYMBOL]):
+            self.untrack_alert(alert[ALERT_ID])
+            return
+        self.index.add(alert)
+        if alert[ALERT_TYPE] == 'EXPRESSION':
+            self.expressions.add(alert)
+
+    def untrack_alert(self, alert_id: int):
+        self.index.remove(alert_id)
+        self.expressions.remove(alert_id)
+
+    def watched_symbols(self) -> List[str]:
+        """Symbol yang punya alert berbasis ticker (threshold atau ekspresi)"""
+        return sorted(set(self.index.symbols()) | set(self.expressions.symbols()))
+
+    def current_symbols(self, sync_interval: float = 1.0) -> List[str]:
+        """watched_symbols setelah index disinkronkan (untuk subscription feed)"""
+        if time.monotonic() - self._last_sync >= sync_interval:
+            self.sync_index()
+        return self.watched_symbols()
+
+    def sync_index(self):
+        """Samakan index dengan database.
+
+        Alert bisa dibuat/diubah/dihapus oleh proses lain, jadi sebelum
+        evaluasi log `alert_changes` (diisi trigger SQLite) dibaca mulai
+        posisi terakhir dan hanya alert yang berubah dibaca ulang. Bila
+        anggota shard berubah atau log sudah terpangkas melewati posisi
+        kita, index dibangun ulang. Alert berulang yang cooldown-nya habis
+        sekalian di-arm ulang.
+        """
+        self._last_sync = time.monotonic()
+        self.rearm_due()
+        self.prune_changes()
+        self.refresh_volume_levels()
+
+        if self.shard is not None and self.shard.refresh():
+            logger.info("Shard membership changed, reloading alert index")
+            self.load_index()
+            return
+
+        changes = self.db.execute('''
+            SELECT id, alert_id FROM alert_changes WHERE id > ? ORDER BY id
+        ''', (self._change_id, )).fetchall()
+        if not changes:
+            return
+
+        if changes[0][0] > self._change_id + 1:
+            self.load_index()
+            return
+
+        alert_ids = sorted({alert_id for _, alert_id in changes})
+        alerts = {alert[ALERT_ID]: alert for alert in self.db.execute('''
+            SELECT * FROM alerts
+            WHERE id IN (SELECT value FROM json_each(?)) AND is_active = 1
+        ''', (json.dumps(alert_ids), )).fetchall()}
+
+        with self.index.lock:
+            for alert_id in alert_ids:
+                if alert_id in alerts:
+                    self.track_alert(alerts[alert_id])
+                else:
+                    self.untrack_alert(alert_id)
+            self._change_id = changes[-1][0]
+
+    def refresh_volume_levels(self):
+        """Index ulang alert VOLUME ZSCORE di symbol yang baseline-nya berubah"""
+        symbols = self.volume_baseline.reload()
+        if not symbols:
+            return
+
+        for alert in self.db.execute('''
+            SELECT * FROM alerts
+            WHERE is_active = 1 AND alert_type = 'VOLUME' AND condition_type = 'ZSCORE'
+              AND symbol IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(symbols), )).fetchall():
+            self.track_alert(alert)
+
+    def volume_zscore_symbols(self) -> List[str]:
+        """Symbol yang punya alert VOLUME ZSCORE aktif (butuh baseline ter-update)"""
+        return [row[0] for row in self.db.execute('''
+            SELECT DISTINCT symbol FROM alerts
+            WHERE is_active = 1 AND alert_type = 'VOLUME' AND condition_type = 'ZSCORE'
+        ''').fetchall()]
+
+    def prune_changes(self, interval: float = 600):
+        """Buang entry alert_changes lama (paling sering tiap `interval` detik)"""
+        if time.monotonic() - self._last_prune < interval:
+            return
+        self._last_prune = time.monotonic()
+        with self.db.transaction() as cursor:
+            cursor.execute('DELETE FROM alert_changes WHERE changed_at < ?',
+                           (time.time() - CHANGE_LOG_RETENTION, ))
+
+    def validate_market(self, symbol: str):
+        """Tolak symbol yang tidak terdaftar di exchange (ValueError).
+
+        Symbol salah yang lolos akan ikut di fetch_tickers/watch_tickers dan
+        menggagalkan request bersama untuk semua alert. Bila daftar market
+        tidak bisa dimuat, symbol diterima (fetch per symbol jadi fallback).
+        """
+        try:
+            markets = self.exchange.load_markets()
+        except Exception as e:
+            logger.warning(f"Could not load markets to validate {symbol}: {e}")
+            return
+        if markets and symbol not in markets:
+            raise ValueError(f"Symbol tidak dikenal di exchange: {symbol}")
+
+    def _insert_alert(self, values: Dict, cooldown: Optional[float] = None,
+                      rearm_pct: Optional[float] = None) -> int:
+        """INSERT alert dalam satu transaksi lalu masukkan barisnya ke index.
+
+        `cooldown` (detik) dan/atau `rearm_pct` membuat alert berulang: setelah
+        trigger alert tetap aktif dan di-arm ulang saat cooldown habis dan
+        (bila `rearm_pct` diisi) harga/volume sudah kembali `rearm_pct` persen
+        dari threshold. Alert aktif identik milik user yang sama tidak
+        diduplikasi; id lama dipakai dan pengaturan berulangnya diperbarui.
+        """
+        self.validate_market(values['symbol'])
+        if cooldown is not None and cooldown < 0:
+            raise ValueError("cooldown must be >= 0")
+        if rearm_pct is not None:
+            if values['alert_type'] not in REARM_ALERT_TYPES:
+                raise ValueError("rearm_pct is only supported for PRICE, "
+                                 "PERCENTAGE and VOLUME alerts")
+            if rearm_pct <= 0:
+                raise ValueError("rearm_pct must be > 0")
+
+        recurrence = {
+            'recurring': int(cooldown is not None or rearm_pct is not None),
+            'cooldown_seconds': cooldown,
+            'rearm_pct': rearm_pct,
+        }
+        # current_price adalah basis alert PERCENTAGE, untuk tipe lain hanya info
+        key_columns = DEDUP_COLUMNS + (('current_price', )
+                                       if values['alert_type'] == 'PERCENTAGE' else ())
+
+        with self.db.transaction() as cursor:
+            cursor.execute(f'''
+                SELECT id FROM alerts
+                WHERE {' AND '.join(f'{column} IS ?' for column in key_columns)}
+                  AND is_active = 1
+                LIMIT 1
+            ''', tuple(values.get(column) for column in key_columns))
+            existing = cursor.fetchone()
+
+            if existing:
+                alert_id = existing[0]
+                cursor.execute('''
+                    UPDATE alerts SET recurring = ?, cooldown_seconds = ?,
+                        rearm_pct = ?, message = ?
+                    WHERE id = ?
+                ''', (recurrence['recurring'], cooldown, rearm_pct,
+                      values.get('message'), alert_id))
+            else:
+                columns = {**values, **recurrence}
+                cursor.execute(f'''
+                    INSERT INTO alerts ({', '.join(columns)})
+                    VALUES ({', '.join('?' for _ in columns)})
+                ''', tuple(columns.values()))
+                alert_id = cursor.lastrowid
+
+            cursor.execute('SELECT * FROM alerts WHERE id = ?', (alert_id, ))
+            alert = cursor.fetchone()
+
+        self.track_alert(alert)
+        return alert_id
+
     def create_price_alert(self, user_id: str, symbol: str, condition_type: str, 
-                          target_price: float, message: str = None) -> int:
+                          target_price: float, message: str = None,
+                          cooldown: Optional[float] = None,
+                          rearm_pct: Optional[float] = None) -> int:
         """Create price-based alert"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         # Get current price
         try:
             ticker = self.exchange.fetch_ticker(symbol)
@@ -67,159 +256,414 @@ class AdvancedAlertSystem:
         except:
             current_price = 0
         
-        cursor.execute('''
-            INSERT INTO alerts (user_id, symbol, alert_type, condition_type, 
-                               target_price, current_price, message)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, symbol, 'PRICE', condition_type, target_price, 
-              current_price, message or f"{symbol} price alert"))
-        
-        alert_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        alert_id = self._insert_alert({
+            'user_id': user_id,
+            'symbol': symbol,
+            'alert_type': 'PRICE',
+            'condition_type': condition_type,
+            'target_price': target_price,
+            'current_price': current_price,
+            'message': message or f"{symbol} price alert"
+        }, cooldown, rearm_pct)
         
         logger.info(f"✅ Price alert created: {alert_id} for {user_id}")
         return alert_id
     
     def create_volume_alert(self, user_id: str, symbol: str, volume_threshold: float,
-                           message: str = None) -> int:
-        """Create volume spike alert"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO alerts (user_id, symbol, alert_type, condition_type,
-                               volume_threshold, message)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, symbol, 'VOLUME', 'SPIKE', volume_threshold,
-              message or f"{symbol} volume spike alert"))
-        
-        alert_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+                           message: str = None, cooldown: Optional[float] = None,
+                           rearm_pct: Optional[float] = None,
+                           condition_type: str = 'SPIKE') -> int:
+        """Create volume spike alert.
+
+        SPIKE: volume 24h (quote) >= `volume_threshold`. ZSCORE:
+        `volume_threshold` adalah z-score volume 24h terhadap baseline rolling
+        harian symbol (mis. 3 = tiga stddev di atas rata-rata).
+        """
+        if condition_type not in VOLUME_CONDITIONS:
+            raise ValueError(f"Unknown volume condition: {condition_type}")
+
+        alert_id = self._insert_alert({
+            'user_id': user_id,
+            'symbol': symbol,
+            'alert_type': 'VOLUME',
+            'condition_type': condition_type,
+            'volume_threshold': volume_threshold,
+            'message': message or f"{symbol} volume spike alert"
+        }, cooldown, rearm_pct)
         
         return alert_id
     
     def create_percentage_alert(self, user_id: str, symbol: str, percentage_change: float,
-                               condition_type: str, message: str = None) -> int:
+                               condition_type: str, message: str = None,
+                               cooldown: Optional[float] = None,
+                               rearm_pct: Optional[float] = None) -> int:
         """Create percentage change alert"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
             ticker = self.exchange.fetch_ticker(symbol)
             current_price = ticker['last']
         except:
             current_price = 0
         
-        cursor.execute('''
-            INSERT INTO alerts (user_id, symbol, alert_type, condition_type,
-                               percentage_change, current_price, message)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, symbol, 'PERCENTAGE', condition_type, percentage_change,
-              current_price, message or f"{symbol} {percentage_change}% change alert"))
-        
-        alert_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        alert_id = self._insert_alert({
+            'user_id': user_id,
+            'symbol': symbol,
+            'alert_type': 'PERCENTAGE',
+            'condition_type': condition_type,
+            'percentage_change': percentage_change,
+            'current_price': current_price,
+            'message': message or f"{symbol} {percentage_change}% change alert"
+        }, cooldown, rearm_pct)
         
         return alert_id
     
-    def check_alerts(self) -> List[Dict]:
-        """Check all active alerts and trigger if conditions are met"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM alerts WHERE is_active = 1
-        ''')
-        
-        active_alerts = cursor.fetchall()
+    def create_indicator_alert(self, user_id: str, symbol: str, condition_type: str,
+                               timeframe: str = '1h', level: float = None,
+                               message: str = None,
+                               cooldown: Optional[float] = None) -> int:
+        """Create indicator-based alert (RSI cross, MACD crossover, BB breakout, Ichimoku cloud)"""
+        if condition_type not in INDICATOR_CONDITIONS:
+            raise ValueError(f"Invalid indicator condition: {condition_type}")
+        if timeframe not in INDICATOR_TIMEFRAMES:
+            raise ValueError(f"Invalid timeframe: {timeframe}")
+        if INDICATOR_CONDITIONS[condition_type]:
+            if level is None:
+                raise ValueError(f"{condition_type} requires a level")
+            level = float(level)
+        else:
+            level = None
+
+        alert_id = self._insert_alert({
+            'user_id': user_id,
+            'symbol': symbol,
+            'alert_type': 'INDICATOR',
+            'condition_type': condition_type,
+            'target_price': level,
+            'timeframe': timeframe,
+            'message': message or f"{symbol} {condition_type} ({timeframe}) alert"
+        }, cooldown)
+
+        return alert_id
+
+    def create_expression_alert(self, user_id: str, symbol: str, expression: str,
+                                timeframe: str = '1h', message: str = None,
+                                cooldown: Optional[float] = None) -> int:
+        """Create composite expression alert, mis. `price > 70000 AND rsi_14 < 70`.
+
+        Ekspresi divalidasi saat dibuat (raise ExpressionError/ValueError).
+        Timeframe hanya disimpan bila ekspresi memakai feature indikator.
+        Alert berulang di-arm ulang setelah cooldown habis dan ekspresinya
+        sempat bernilai salah lagi.
+        """
+        ast = compile_expression(expression)
+        if indicator_features(ast):
+            if timeframe not in INDICATOR_TIMEFRAMES:
+                raise ValueError(f"Invalid timeframe: {timeframe}")
+        else:
+            timeframe = None
+
+        alert_id = self._insert_alert({
+            'user_id': user_id,
+            'symbol': symbol,
+            'alert_type': 'EXPRESSION',
+            'condition_type': 'MATCH',
+            'timeframe': timeframe,
+            'expression': expression.strip(),
+            'message': message or f"{symbol} expression alert"
+        }, cooldown)
+
+        return alert_id
+
+    def indicator_snapshot(self, symbol: str, timeframe: str,
+                           max_age: float = 5.0) -> Optional[Dict]:
+        """Snapshot indikator terbaru dari tabel indicator_state (cache singkat)"""
+        key = (symbol, timeframe)
+        cached = self._snapshots.get(key)
+        if cached and time.monotonic() - cached[1] < max_age:
+            return cached[0]
+
+        row = self.db.execute('''
+            SELECT state FROM indicator_state WHERE symbol = ? AND timeframe = ?
+        ''', (symbol, timeframe)).fetchone()
+        snapshot = json.loads(row[0]).get('snapshot') if row else None
+        self._snapshots[key] = (snapshot, time.monotonic())
+        return snapshot
+
+    def fetch_tickers(self, symbols: List[str]) -> Dict[str, Dict]:
+        """Ambil ticker untuk semua symbol dengan satu request bulk.
+
+        Bila fetch_tickers gagal (mis. exchange tidak mendukung filter
+        symbol), fallback ke fetch_ticker per symbol.
+        """
+        if not symbols:
+            return {}
+
+        try:
+            tickers = self.exchange.fetch_tickers(symbols)
+            return {symbol: tickers[symbol] for symbol in symbols if symbol in tickers}
+        except Exception as e:
+            logger.warning(f"fetch_tickers failed, falling back to fetch_ticker: {e}")
+
+        tickers = {}
+        for symbol in symbols:
+            try:
+                tickers[symbol] = self.exchange.fetch_ticker(symbol)
+            except Exception as e:
+                logger.error(f"Error fetching ticker {symbol}: {e}")
+        return tickers
+
+    @staticmethod
+    def evaluate_alert(alert: tuple, live_price: float, live_volume: Optional[float],
+                       volume_z: Optional[float] = None) -> Optional[str]:
+        """Evaluasi satu baris alert terhadap harga/volume; return pesan trigger atau None"""
+        alert_id, user_id, symbol, alert_type, condition_type, target_price, \
+        current_price, percentage_change, volume_threshold, is_active, \
+        created_at, triggered_at, message = alert[:13]
+
+        # Check price alerts
+        if alert_type == 'PRICE':
+            if condition_type == 'ABOVE' and live_price >= target_price:
+                return f"🚀 {symbol} hit target: ${live_price:,.4f} (Target: ${target_price:,.4f})"
+            elif condition_type == 'BELOW' and live_price <= target_price:
+                return f"📉 {symbol} dropped to: ${live_price:,.4f} (Target: ${target_price:,.4f})"
+
+        # Check percentage alerts
+        elif alert_type == 'PERCENTAGE' and current_price and current_price > 0:
+            price_change_pct = ((live_price - current_price) / current_price) * 100
+            if condition_type == 'GAIN' and price_change_pct >= percentage_change:
+                return f"📈 {symbol} gained {price_change_pct:+.2f}% (Target: +{percentage_change}%)"
+            elif condition_type == 'LOSS' and price_change_pct <= -percentage_change:
+                return f"📉 {symbol} lost {abs(price_change_pct):.2f}% (Target: -{percentage_change}%)"
+
+        # Check volume alerts
+        elif alert_type == 'VOLUME' and condition_type == 'ZSCORE':
+            if volume_z is not None and volume_z >= volume_threshold:
+                return (f"📊 {symbol} volume spike: ${live_volume:,.0f} "
+                        f"(z-score {volume_z:.2f}, threshold {volume_threshold:g})")
+
+        elif alert_type == 'VOLUME':
+            if live_volume is not None and live_volume >= volume_threshold:
+                return f"📊 {symbol} volume spike: ${live_volume:,.0f} (Threshold: ${volume_threshold:,.0f})"
+
+        return None
+
+    def check_alerts(self, tickers: Optional[Dict[str, Dict]] = None) -> List[Dict]:
+        """Check all active alerts and trigger if conditions are met.
+
+        Alert dikelompokkan per symbol dan semua ticker diambil dengan satu
+        `fetch_tickers`, jadi jumlah request sebanding dengan jumlah symbol,
+        bukan jumlah alert. `tickers` bisa diisi dari feed live. Kandidat
+        alert per symbol dicari lewat threshold index (binary search).
+        """
+        self.sync_index()
+        symbols = self.watched_symbols()
+
+        if tickers is None:
+            tickers = self.fetch_tickers(symbols)
+
         triggered_alerts = []
-        
-        for alert in active_alerts:
-            alert_id, user_id, symbol, alert_type, condition_type, target_price, \
-            current_price, percentage_change, volume_threshold, is_active, \
-            created_at, triggered_at, message = alert
-            
+        timestamp = datetime.now().isoformat()
+
+        for symbol in symbols:
+            ticker = tickers.get(symbol)
+            if not ticker or ticker.get('last') is None:
+                logger.error(f"No ticker for {symbol}, skipping its alerts")
+                continue
+
+            triggered_alerts.extend(self.match_symbol(symbol, ticker, timestamp))
+
+        return self.record_triggers(triggered_alerts)
+
+    def check_symbol(self, symbol: str, ticker: Dict,
+                     sync_interval: float = 1.0) -> List[Dict]:
+        """Evaluasi hanya alert milik satu symbol yang baru saja tick.
+
+        Dipakai engine event-driven: setiap update harga dari stream cukup
+        mengecek index symbol itu. Sinkronisasi index dengan database
+        dibatasi paling sering sekali per `sync_interval` detik.
+        """
+        now = time.monotonic()
+        if now - self._last_sync >= sync_interval:
+            self.sync_index()
+
+        if ticker.get('last') is None:
+            return []
+
+        triggered_alerts = self.match_symbol(symbol, ticker,
+                                             datetime.now().isoformat())
+        return self.record_triggers(triggered_alerts)
+
+    def match_symbol(self, symbol: str, ticker: Dict, timestamp: str) -> List[Dict]:
+        """Alert symbol ini yang kena oleh ticker (belum disimpan ke database).
+
+        Alert berulang yang level re-arm-nya tercapai dan cooldown-nya sudah
+        lewat langsung di-arm ulang.
+        """
+        live_price = ticker['last']
+        live_volume = ticker.get('quoteVolume')
+        now = time.time()
+
+        triggered_alerts = []
+        rearm_ids = []
+        for alert in self.index.match(symbol, live_price, live_volume):
+            alert_id, user_id = alert[0], alert[1]
+            if not alert[ARMED]:
+                if (alert[COOLDOWN_UNTIL] or 0) <= now:
+                    rearm_ids.append(alert_id)
+                continue
+
             try:
-                # Get current market data
-                ticker = self.exchange.fetch_ticker(symbol)
-                live_price = ticker['last']
-                live_volume = ticker['quoteVolume']
-                
-                triggered = False
-                trigger_message = ""
-                
-                # Check price alerts
-                if alert_type == 'PRICE':
-                    if condition_type == 'ABOVE' and live_price >= target_price:
-                        triggered = True
-                        trigger_message = f"🚀 {symbol} hit target: ${live_price:,.4f} (Target: ${target_price:,.4f})"
-                    elif condition_type == 'BELOW' and live_price <= target_price:
-                        triggered = True
-                        trigger_message = f"📉 {symbol} dropped to: ${live_price:,.4f} (Target: ${target_price:,.4f})"
-                
-                # Check percentage alerts
-                elif alert_type == 'PERCENTAGE' and current_price > 0:
-                    price_change_pct = ((live_price - current_price) / current_price) * 100
-                    if condition_type == 'GAIN' and price_change_pct >= percentage_change:
-                        triggered = True
-                        trigger_message = f"📈 {symbol} gained {price_change_pct:+.2f}% (Target: +{percentage_change}%)"
-                    elif condition_type == 'LOSS' and price_change_pct <= -percentage_change:
-                        triggered = True
-                        trigger_message = f"📉 {symbol} lost {abs(price_change_pct):.2f}% (Target: -{percentage_change}%)"
-                
-                # Check volume alerts
-                elif alert_type == 'VOLUME':
-                    # Get average volume (simplified - you could make this more sophisticated)
-                    if live_volume >= volume_threshold:
-                        triggered = True
-                        trigger_message = f"📊 {symbol} volume spike: ${live_volume:,.0f} (Threshold: ${volume_threshold:,.0f})"
-                
-                if triggered:
-                    # Mark alert as triggered
-                    cursor.execute('''
-                        UPDATE alerts SET is_active = 0, triggered_at = ?
-                        WHERE id = ?
-                    ''', (datetime.now().isoformat(), alert_id))
-                    
-                    # Add to history
-                    cursor.execute('''
-                        INSERT INTO alert_history (alert_id, price_at_trigger, message)
-                        VALUES (?, ?, ?)
-                    ''', (alert_id, live_price, trigger_message))
-                    
-                    triggered_alerts.append({
-                        'alert_id': alert_id,
-                        'user_id': user_id,
-                        'symbol': symbol,
-                        'message': trigger_message,
-                        'price': live_price,
-                        'timestamp': datetime.now().isoformat()
-                    })
-                    
-                    logger.info(f"🔔 Alert triggered: {alert_id} - {trigger_message}")
-                    
+                volume_z = (self.volume_baseline.zscore(symbol, live_volume)
+                            if alert[CONDITION_TYPE] == 'ZSCORE' else None)
+                trigger_message = self.evaluate_alert(alert, live_price, live_volume,
+                                                      volume_z)
             except Exception as e:
                 logger.error(f"Error checking alert {alert_id}: {e}")
-        
-        conn.commit()
-        conn.close()
-        
+                continue
+
+            if trigger_message:
+                triggered_alerts.append({
+                    'alert_id': alert_id,
+                    'user_id': user_id,
+                    'symbol': symbol,
+                    'message': trigger_message,
+                    'price': live_price,
+                    'timestamp': timestamp
+                })
+
+        # Semua ekspresi symbol ini dievaluasi sekaligus (plan bersama)
+        matched_ids = set()
+        for alert in self.expressions.match(symbol, ticker, self.indicator_snapshot):
+            matched_ids.add(alert[0])
+            if not alert[ARMED]:
+                continue
+            triggered_alerts.append({
+                'alert_id': alert[0],
+                'user_id': alert[1],
+                'symbol': symbol,
+                'message': f"🧮 {symbol} kondisi terpenuhi: {alert[EXPRESSION]}",
+                'price': live_price,
+                'timestamp': timestamp
+            })
+
+        # Ekspresi berulang di-arm ulang setelah kondisinya tidak terpenuhi lagi
+        for alert in self.expressions.disarmed(symbol):
+            if alert[0] not in matched_ids and (alert[COOLDOWN_UNTIL] or 0) <= now:
+                rearm_ids.append(alert[0])
+
+        if rearm_ids:
+            self.rearm_alerts(rearm_ids)
+
         return triggered_alerts
-    
-    def get_user_alerts(self, user_id: str) -> List[Dict]:
-        """Get all alerts for a specific user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM alerts WHERE user_id = ? ORDER BY created_at DESC
-        ''', (user_id,))
-        
-        alerts = cursor.fetchall()
-        conn.close()
+
+    def record_triggers(self, triggered_alerts: List[Dict]) -> List[Dict]:
+        """Simpan semua trigger satu siklus dalam satu transaksi.
+
+        Semua UPDATE alerts dan INSERT alert_history masuk satu transaksi
+        pendek walau ribuan alert kena di detik yang sama. UPDATE hanya
+        berlaku untuk alert yang masih aktif dan armed, jadi bila dua proses
+        (mis. shard lama dan baru saat rebalance) memicu alert yang sama
+        hanya satu yang tercatat. Alert sekali-pakai dinonaktifkan; alert
+        berulang tetap aktif tapi di-disarm sampai `cooldown_until`. Index
+        diperbarui setelah commit. Return trigger yang benar-benar tercatat.
+        """
+        if not triggered_alerts:
+            return []
+
+        now = time.time()
+        recorded = []
+
+        with self.db.transaction() as cursor:
+            # Mark alert as triggered
+            for alert in triggered_alerts:
+                cursor.execute('''
+                    UPDATE alerts SET triggered_at = ?,
+                        trigger_count = trigger_count + 1,
+                        is_active = recurring, armed = 0,
+                        cooldown_until = CASE WHEN recurring = 1
+                            THEN ? + COALESCE(cooldown_seconds, 0) END
+                    WHERE id = ? AND is_active = 1 AND armed = 1
+                ''', (alert['timestamp'], now, alert['alert_id']))
+                if cursor.rowcount:
+                    recorded.append(alert)
+            triggered_alerts = recorded
+            alert_ids = [alert['alert_id'] for alert in triggered_alerts]
+
+            # Add to history
+            cursor.executemany('''
+                INSERT INTO alert_history (alert_id, user_id, symbol, triggered_at,
+                                           price_at_trigger, message)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(alert['alert_id'], alert['user_id'], alert['symbol'],
+                   alert['timestamp'], alert['price'], alert['message'])
+                  for alert in triggered_alerts])
+
+            cursor.execute('''
+                SELECT * FROM alerts
+                WHERE id IN (SELECT value FROM json_each(?)) AND is_active = 1
+            ''', (json.dumps(alert_ids), ))
+            recurring_alerts = cursor.fetchall()
+
+        for alert in triggered_alerts:
+            self.untrack_alert(alert['alert_id'])
+            logger.info(f"🔔 Alert triggered: {alert['alert_id']} - {alert['message']}")
+
+        # Alert berulang kembali ke index pada level re-arm-nya
+        for alert in recurring_alerts:
+            self.track_alert(alert)
+
+        return triggered_alerts
+
+    def rearm_alerts(self, alert_ids: List[int]):
+        """Arm ulang alert berulang lalu kembalikan ke level trigger di index"""
+        with self.db.transaction() as cursor:
+            cursor.executemany('''
+                UPDATE alerts SET armed = 1, cooldown_until = NULL
+                WHERE id = ? AND is_active = 1 AND armed = 0
+            ''', [(alert_id, ) for alert_id in alert_ids])
+
+            cursor.execute('''
+                SELECT * FROM alerts
+                WHERE id IN (SELECT value FROM json_each(?)) AND is_active = 1
+            ''', (json.dumps(alert_ids), ))
+            alerts = cursor.fetchall()
+
+        for alert in alerts:
+            self.track_alert(alert)
+        logger.info(f"🔁 Re-armed {len(alerts)} recurring alert(s)")
+
+    def rearm_due(self):
+        """Arm ulang alert yang hanya menunggu cooldown.
+
+        Alert dengan `rearm_pct` di-arm ulang oleh match_symbol saat level
+        re-arm tercapai, dan ekspresi saat kondisinya tidak terpenuhi lagi;
+        sisanya (INDICATOR, atau tanpa `rearm_pct`) cukup menunggu waktu.
+        """
+        alert_ids = [row[0] for row in self.db.execute('''
+            SELECT id FROM alerts
+            WHERE is_active = 1 AND armed = 0 AND cooldown_until <= ?
+              AND (alert_type = 'INDICATOR' OR
+                   (alert_type != 'EXPRESSION' AND rearm_pct IS NULL))
+        ''', (time.time(), )).fetchall()]
+
+        if alert_ids:
+            self.rearm_alerts(alert_ids)
+
+    def get_user_alerts(self, user_id: str, limit: Optional[int] = None,
+                        before_id: Optional[int] = None,
+                        active_only: bool = False) -> List[Dict]:
+        """Alert milik user, terbaru dulu.
+
+        Keyset pagination lewat index (user_id, id): halaman berikutnya
+        diminta dengan `before_id` = id terakhir halaman sebelumnya, jadi
+        biaya per halaman tetap walau user punya ribuan alert.
+        """
+        alerts = self.db.execute(f'''
+            SELECT * FROM alerts INDEXED BY idx_alerts_user_id
+            WHERE user_id = ? AND id < ?
+            {'AND is_active = 1' if active_only else ''}
+            ORDER BY id DESC LIMIT ?
+        ''', (user_id, before_id if before_id is not None else 2 ** 63 - 1,
+              limit if limit is not None else -1)).fetchall()
         
         return [
             {
@@ -228,27 +672,104 @@ class AdvancedAlertSystem:
                 'alert_type': alert[3],
                 'condition_type': alert[4],
                 'target_price': alert[5],
+                'timeframe': alert[13],
+                'expression': alert[14],
                 'is_active': bool(alert[9]),
+                'recurring': bool(alert[15]),
+                'cooldown_seconds': alert[16],
+                'rearm_pct': alert[17],
+                'armed': bool(alert[18]),
+                'cooldown_until': alert[19],
+                'trigger_count': alert[20],
+                'triggered_at': alert[11],
                 'created_at': alert[10],
                 'message': alert[12]
             }
             for alert in alerts
         ]
     
+    def get_trigger_history(self, user_id: str, limit: int = 50,
+                            before_id: Optional[int] = None,
+                            symbol: Optional[str] = None) -> List[Dict]:
+        """Riwayat trigger user (terbaru dulu), keyset pagination seperti get_user_alerts"""
+        rows = self.db.execute(f'''
+            SELECT id, alert_id, symbol, triggered_at, price_at_trigger, message
+            FROM alert_history INDEXED BY idx_alert_history_user
+            WHERE user_id = ? AND id < ? {'AND symbol = ?' if symbol else ''}
+            ORDER BY id DESC LIMIT ?
+        ''', (user_id, before_id if before_id is not None else 2 ** 63 - 1,
+              *((symbol, ) if symbol else ()), limit)).fetchall()
+
+        return [
+            {
+                'id': row[0],
+                'alert_id': row[1],
+                'symbol': row[2],
+                'triggered_at': row[3],
+                'price': row[4],
+                'message': row[5]
+            }
+            for row in rows
+        ]
+
+    def get_trigger_summary(self, user_id: str, limit: int = 30,
+                            before: Optional[Tuple[str, int]] = None) -> List[Dict]:
+        """Agregat harian trigger yang sudah dikompaksi (lihat AlertHistoryCompactor).
+
+        Kursor `before` adalah (day, alert_id) baris terakhir halaman sebelumnya.
+        """
+        rows = self.db.execute('''
+            SELECT day, alert_id, symbol, trigger_count, first_triggered_at,
+                   last_triggered_at, min_price, max_price
+            FROM alert_history_daily
+            WHERE user_id = ? AND (day, alert_id) < (?, ?)
+            ORDER BY day DESC, alert_id DESC LIMIT ?
+        ''', (user_id, *(before or ('9999-12-31', 0)), limit)).fetchall()
+
+        return [
+            {
+                'day': row[0],
+                'alert_id': row[1],
+                'symbol': row[2],
+                'trigger_count': row[3],
+                'first_triggered_at': row[4],
+                'last_triggered_at': row[5],
+                'min_price': row[6],
+                'max_price': row[7]
+            }
+            for row in rows
+        ]
+
     def delete_alert(self, alert_id: int, user_id: str) -> bool:
         """Delete an alert"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            DELETE FROM alerts WHERE id = ? AND user_id = ?
-        ''', (alert_id, user_id))
-        
-        deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                DELETE FROM alerts WHERE id = ? AND user_id = ?
+            ''', (alert_id, user_id))
+            deleted = cursor.rowcount > 0
+
+        if deleted:
+            self.untrack_alert(alert_id)
         
         return deleted
 
-# Global alert system instance
-alert_system = AdvancedAlertSystem()
+# Global alert system instance, dibuat saat pertama kali dipakai
+_alert_system = None
+_alert_system_lock = threading.Lock()
+
+
+def get_alert_system() -> AdvancedAlertSystem:
+    """Singleton alert system (lazy, thread-safe)"""
+    global _alert_system
+    if _alert_system is None:
+        with _alert_system_lock:
+            if _alert_system is None:
+                _alert_system = AdvancedAlertSystem()
+    return _alert_system
+
+
+def __getattr__(name):
+    # Kompatibilitas untuk `from alert_system import alert_system`
+    if name == 'alert_system':
+        return get_alert_system()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,12 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
-import ccxt
-import pandas as pd
-import pandas_ta as ta
+from flask import Flask, request, jsonify, render_template, send_from_directory, make_response
 import os
+import sys
 import requests
-import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+import hashlib
+import hmac
+import secrets
 import time
 import threading
 import json
@@ -19,20 +20,113 @@ app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Import Alert System
-from alert_system import alert_system
+# Dependency berat di-import saat pertama dipakai supaya server cepat siap;
+# pandas_ta ikut di-load bersama pandas agar accessor df.ta terdaftar
+from lazy_imports import LazyModule
 
-# Global variables untuk caching dan real-time updates
-cache_data = {}
-alert_history = []
+ccxt = LazyModule('ccxt')
+pd = LazyModule('pandas', also_import=('pandas_ta', ))
+ta = LazyModule('pandas_ta')
+np = LazyModule('numpy')
 
-# Import Telegram bot
+# Import Alert System
+from alert_system import get_alert_system
+from event_stream import EventStreamServer, MarketStreamPoller, STREAM_PATH
+from delta_encoding import AnalysisVersionTracker
+from shared_cache import SharedCache, LeaderElection
+from alert_engine import AlertEngine
+from alert_shards import ShardSupervisor
+from alert_retention import AlertHistoryCompactor
+from signal_events import SignalEventLog
+from volume_baseline import VolumeBaseline, run_volume_baseline
+from watchlist_digest import DIGEST_INTERVALS, DigestScheduler, WatchlistStore
+from alert_scheduler import AdaptivePollScheduler
+from notification_queue import DeliveryDeferred, NotificationDispatcher
+from price_feed import price_feed_from_env
+from fake_exchange import create_exchange
+from indicator_alerts import (INDICATOR_CONDITIONS, IndicatorAlertEvaluator,
+                              run_indicator_alerts)
+
+# Cache bersama untuk semua worker (hasil analisis, status
+# service). Generasi cache ikut masuk ke ETag; restart leader atau invalidasi
+# manual otomatis membuat semua ETag lama tidak valid
+shared_cache = SharedCache(os.getenv('SHARED_CACHE_PATH', 'shared_cache.db'))
+ANALYSIS_CACHE_TTL = int(os.getenv('ANALYSIS_CACHE_TTL', '60'))
+# Response analisis memuat bagian live (candle berjalan, order book, harga
+# terkini); ETag dan cache ikut berganti setiap bucket waktu ini (detik,
+# minimal 1 agar pembagian bucket tidak gagal)
+LIVE_DATA_BUCKET = max(1, int(os.getenv('LIVE_DATA_BUCKET', str(ANALYSIS_CACHE_TTL))))
+# Secret admin untuk endpoint invalidasi cache (header X-Admin-Token);
+# endpoint tidak aktif bila tidak di-set
+CACHE_ADMIN_SECRET = os.getenv('CACHE_ADMIN_SECRET', '')
+SIGNAL_EVENT_BUFFER = int(os.getenv('SIGNAL_EVENT_BUFFER', '50'))
+# Daftar market exchange jarang berubah; dipakai bot untuk mengenali symbol
+MARKET_INDEX_TTL = int(os.getenv('MARKET_INDEX_TTL', '21600'))
+
+# Hanya satu proses (leader) yang menjalankan alert monitor, bot Telegram dan
+# event stream; worker lain menunggu giliran bila leader mati
+LEADER_LOCK_PATH = os.getenv('LEADER_LOCK_PATH', 'crypto_app.leader.lock')
+
+# Port web app (sama dengan bind gunicorn); dipakai juga untuk request internal
+APP_PORT = int(os.getenv('PORT', '5000'))
+INTERNAL_API_URL = f"http://0.0.0.0:{APP_PORT}/api"
+# Leader memperbarui status service di cache bersama tiap interval ini; status
+# kedaluwarsa sendiri bila leader mati, sekalian entry cache lama dibersihkan
+SERVICE_HEARTBEAT_INTERVAL = float(os.getenv('SERVICE_HEARTBEAT_INTERVAL', '10'))
+SHARED_CACHE_PURGE_INTERVAL = float(os.getenv('SHARED_CACHE_PURGE_INTERVAL', '300'))
+
+# Server-Sent Events untuk dashboard (port terpisah, dilayani asyncio)
+SSE_PORT = int(os.getenv('SSE_PORT', '5001'))
+# Topic alert per user butuh token HMAC(user_id); tanpa STREAM_TOKEN_SECRET
+# secret dibuat sekali dan disimpan di cache bersama (dipakai semua worker)
+STREAM_TOKEN_SECRET = os.getenv('STREAM_TOKEN_SECRET', '')
+event_stream = EventStreamServer(
+    port=SSE_PORT,
+    is_known_symbol=lambda symbol: is_known_market(symbol),
+    max_topics=int(os.getenv('SSE_MAX_TOPICS', '20')),
+    verify_alert_token=lambda user_id, token: verify_alert_stream_token(user_id, token))
+stream_poller = None
+alert_engine = None
+alert_supervisor = None
+notification_dispatcher = None
+signal_events = None
+_signal_events_lock = threading.Lock()
+volume_baseline = None
+_volume_baseline_lock = threading.Lock()
+watchlist_store = None
+digest_scheduler = None
+
+# Versi + riwayat delta analisis untuk client mode delta
+analysis_versions = AnalysisVersionTracker(store=shared_cache)
+
+# Telegram bot (stack telegram baru di-import saat bot dijalankan)
 telegram_bot = None
-try:
-    from telegram_bot import start_telegram_bot
-except ImportError:
-    print("Warning: Telegram bot tidak dapat diimport. Install python-telegram-bot terlebih dahulu.")
-    start_telegram_bot = None
+_telegram_bot_starter = None
+# Mode webhook: setiap worker memproses update yang diterimanya sendiri.
+# Hanya aktif bila BOT_WEBHOOK_SECRET di-set (bot juga menolak webhook tanpa secret)
+TELEGRAM_WEBHOOK_SECRET = os.getenv('BOT_WEBHOOK_SECRET', '')
+TELEGRAM_WEBHOOK_ENABLED = bool(os.getenv('BOT_WEBHOOK_URL') and TELEGRAM_WEBHOOK_SECRET)
+if os.getenv('BOT_WEBHOOK_URL') and not TELEGRAM_WEBHOOK_SECRET:
+    print("Warning: BOT_WEBHOOK_URL di-set tanpa BOT_WEBHOOK_SECRET; webhook tidak diaktifkan.")
+webhook_bot = None
+_webhook_bot_lock = threading.Lock()
+
+# Status warm-up untuk readiness probe (per proses)
+readiness = {"ready": False, "started_at": None, "completed_at": None,
+             "steps": {}}
+
+
+def get_start_telegram_bot():
+    """Import lazy fungsi start_telegram_bot; None bila library tidak tersedia"""
+    global _telegram_bot_starter
+    if _telegram_bot_starter is None:
+        try:
+            from telegram_bot import start_telegram_bot
+            _telegram_bot_starter = start_telegram_bot
+        except ImportError:
+            print("Warning: Telegram bot tidak dapat diimport. Install python-telegram-bot terlebih dahulu.")
+            return None
+    return _telegram_bot_starter
 
 
 def validate_symbol(symbol_input):
@@ -43,6 +137,148 @@ VALID_TIMEFRAMES = [
     '1m', '3m', '5m', '15m', '30m', '1h', '2h', '4h', '6h', '8h', '12h', '1d',
     '3d', '1w', '1M'
 ]
+# Event stream hanya menerima timeframe yang juga diterima endpoint HTTP
+event_stream.timeframes = set(VALID_TIMEFRAMES)
+
+TIMEFRAME_SECONDS = {
+    '1m': 60, '3m': 180, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '2h': 7200, '4h': 14400, '6h': 21600, '8h': 28800,
+    '12h': 43200, '1d': 86400, '3d': 259200, '1w': 604800
+}
+
+# Candle mingguan Binance dibuka hari Senin 00:00 UTC, sedangkan epoch Unix
+# jatuh pada hari Kamis
+WEEKLY_CANDLE_OFFSET = 4 * 86400
+
+
+def get_last_closed_candle_time(timeframe, now=None):
+    """Waktu close candle terakhir yang sudah selesai (UTC), tanpa fetch OHLCV"""
+    now = now or datetime.now(timezone.utc)
+
+    if timeframe == '1M':
+        return datetime(now.year, now.month, 1, tzinfo=timezone.utc)
+
+    period = TIMEFRAME_SECONDS[timeframe]
+    offset = WEEKLY_CANDLE_OFFSET if timeframe == '1w' else 0
+    closed_at = (int(now.timestamp()) - offset) // period * period + offset
+    return datetime.fromtimestamp(closed_at, tz=timezone.utc)
+
+
+def get_live_bucket_start(now=None):
+    """Awal bucket data live yang sedang berjalan (UTC)"""
+    now = now or time.time()
+    return datetime.fromtimestamp(int(now) // LIVE_DATA_BUCKET * LIVE_DATA_BUCKET,
+                                  tz=timezone.utc)
+
+
+def build_etag(*parts):
+    """Bangun ETag dari bagian-bagian kunci cache"""
+    key = '|'.join(str(part) for part in parts)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+
+def get_cache_generation():
+    """Generasi cache yang disepakati semua worker"""
+    generation = shared_cache.get('cache_generation')
+    if generation is None:
+        generation = shared_cache.update(
+            'cache_generation', lambda value: value or int(time.time()))
+    return generation
+
+
+def bump_cache_generation():
+    """Invalidasi semua cache analisis dan ETag yang sudah dikirim ke client"""
+    generation = shared_cache.incr('cache_generation',
+                                   initial=int(time.time()))
+    shared_cache.delete_prefix('analysis:')
+    shared_cache.purge_expired()
+    return generation
+
+
+def get_analysis_cache_key(validated_symbol, timeframe):
+    """Key cache analisis: berlaku selama candle terakhir, bucket data live dan
+    generasi sama (isi cache = isi yang dijamin ETag conditional_get)"""
+    last_closed = get_last_closed_candle_time(timeframe)
+    return (f"analysis:{validated_symbol}:{timeframe}:"
+            f"{int(last_closed.timestamp())}:"
+            f"{int(get_live_bucket_start().timestamp())}:{get_cache_generation()}")
+
+
+def get_signal_events():
+    """Log event sinyal per symbol (lazy, di database alert)"""
+    global signal_events
+    if signal_events is None:
+        with _signal_events_lock:
+            if signal_events is None:
+                signal_events = SignalEventLog(get_alert_system().db,
+                                               per_symbol=SIGNAL_EVENT_BUFFER)
+    return signal_events
+
+
+def get_watchlist_store():
+    """Watchlist user (di database alert)"""
+    global watchlist_store
+    if watchlist_store is None:
+        watchlist_store = WatchlistStore(get_alert_system().db)
+    return watchlist_store
+
+
+def record_signal_event(event):
+    """Simpan event sinyal, sekali per (symbol, timeframe, tipe, candle)"""
+    return get_signal_events().record(event)
+
+
+def conditional_get(fixed_timeframe=None):
+    """Decorator ETag/Last-Modified berbasis candle terakhir yang sudah close
+    dan bucket data live (LIVE_DATA_BUCKET).
+
+    Response memuat candle yang masih berjalan dan harga terkini, jadi
+    validator berganti paling lambat setiap bucket; client tidak memegang
+    harga basi selama satu periode candle. Request dengan If-None-Match (atau
+    If-Modified-Since) yang masih cocok langsung dijawab 304 tanpa menjalankan
+    view, jadi tidak ada fetch OHLCV maupun perhitungan indikator ulang.
+    """
+
+    def decorator(view):
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            symbol = kwargs.get('symbol') or request.args.get('symbol')
+            timeframe = fixed_timeframe or request.args.get('timeframe', '1d')
+
+            # Biarkan view yang menangani validasi parameter
+            if not symbol or timeframe not in VALID_TIMEFRAMES:
+                return view(*args, **kwargs)
+
+            last_closed = get_last_closed_candle_time(timeframe)
+            live_bucket = max(get_live_bucket_start(), last_closed)
+            etag = build_etag(request.path, validate_symbol(symbol), timeframe,
+                              int(last_closed.timestamp()),
+                              int(live_bucket.timestamp()),
+                              get_cache_generation())
+
+            not_modified = False
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            elif request.if_modified_since:
+                not_modified = request.if_modified_since >= live_bucket
+
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.last_modified = live_bucket
+            # Client boleh menyimpan response, tapi wajib revalidasi setiap poll
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapper
+
+    return decorator
 
 
 def calculate_fibonacci_levels(high, low):
@@ -359,11 +595,18 @@ def detect_candlestick_patterns(df):
     return patterns
 
 
-def check_macd_crossover(df):
+def check_macd_crossover(df, symbol=None, timeframe=None):
     """Cek crossover MACD dan generate alert"""
     if len(df) < 2:
         return None
 
+    event = {
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "candle_time": pd.Timestamp(df.iloc[-1]['timestamp']).isoformat()
+        if 'timestamp' in df.columns else None,
+    }
+
     current_macd = df.iloc[-1].get('MACD_12_26_9', 0)
     current_signal = df.iloc[-1].get('MACDs_12_26_9', 0)
     prev_macd = df.iloc[-2].get('MACD_12_26_9', 0)
@@ -372,6 +615,7 @@ def check_macd_crossover(df):
     # Bullish crossover: MACD crosses above signal
     if prev_macd <= prev_signal and current_macd > current_signal:
         return {
+            **event,
             "type": "MACD_BULLISH_CROSSOVER",
             "message": "🟢 MACD Bullish Crossover - Sinyal Beli Potensial",
             "timestamp": datetime.now().isoformat()
@@ -380,6 +624,7 @@ def check_macd_crossover(df):
     # Bearish crossover: MACD crosses below signal
     elif prev_macd >= prev_signal and current_macd < current_signal:
         return {
+            **event,
             "type": "MACD_BEARISH_CROSSOVER",
             "message": "🔴 MACD Bearish Crossover - Sinyal Jual Potensial",
             "timestamp": datetime.now().isoformat()
@@ -388,41 +633,58 @@ def check_macd_crossover(df):
     return None
 
 
+def get_volume_baseline():
+    """Baseline volume rolling harian per symbol (lazy, di database alert)"""
+    global volume_baseline
+    if volume_baseline is None:
+        with _volume_baseline_lock:
+            if volume_baseline is None:
+                volume_baseline = VolumeBaseline(
+                    get_alert_system().db,
+                    fetch_ohlcv=create_exchange().fetch_ohlcv,
+                    last_closed_candle=get_last_closed_candle_time)
+    return volume_baseline
+
+
 def get_realtime_volume_analysis(symbol, timeframe='1m'):
-    """Analisis volume real-time"""
+    """Analisis volume real-time terhadap baseline rolling harian"""
     try:
-        exchange = ccxt.binance()
-        # Ambil data volume 24h dan bandingkan dengan average
+        exchange = create_exchange()
         ticker = exchange.fetch_ticker(symbol)
-        volume_24h = ticker.get('quoteVolume', 0)
-
-        # Ambil data historis untuk perbandingan
-        ohlcv = exchange.fetch_ohlcv(symbol, '1d', limit=7)
-        if ohlcv:
-            df_vol = pd.DataFrame(ohlcv,
-                                  columns=[
-                                      'timestamp', 'open', 'high', 'low',
-                                      'close', 'volume'
-                                  ])
-            avg_volume = df_vol['volume'].mean()
-            volume_ratio = volume_24h / avg_volume if avg_volume > 0 else 1
+        volume_24h = ticker.get('quoteVolume') or 0
+
+        # Candle harian hanya diambil saat ada candle baru yang close
+        baseline = get_volume_baseline()
+        baseline.advance(symbol)
+        stats = baseline.stats(symbol, volume_24h)
+        windows = {window['window']: window for window in stats['windows']}
+
+        # Rata-rata mingguan bila window 7 hari dikonfigurasi, selain itu window terpendek
+        average = windows.get(7) or stats['windows'][0]
+        avg_volume = average['mean']
+        if avg_volume is None:
+            return {"error": "Data volume historis belum cukup"}
+        volume_ratio = volume_24h / avg_volume if avg_volume > 0 else 1
+        zscore = baseline.zscore(symbol, volume_24h)
 
-            return {
-                "current_24h_volume":
-                volume_24h,
-                "average_7d_volume":
-                avg_volume,
-                "volume_ratio":
-                round(volume_ratio, 2),
-                "volume_status":
-                "High" if volume_ratio > 1.5 else
-                "Normal" if volume_ratio > 0.7 else "Low"
-            }
+        return {
+            "current_24h_volume": volume_24h,
+            "average_volume": avg_volume,
+            "average_window_days": average['window'],
+            f"average_{average['window']}d_volume": avg_volume,
+            "volume_ratio": round(volume_ratio, 2),
+            "volume_zscore": round(zscore, 2) if zscore is not None else None,
+            "volume_status":
+            "High" if volume_ratio > 1.5 else
+            "Normal" if volume_ratio > 0.7 else "Low",
+            "baseline": stats['windows']
+        }
     except Exception as e:
         return {"error": f"Gagal mengambil analisis volume: {str(e)}"}
 
 
 @app.route('/api/analyze', methods=['GET'])
+@conditional_get()
 def analyze_crypto():
     symbol = request.args.get('symbol')
     timeframe = request.args.get('timeframe', '1d')
@@ -434,14 +696,25 @@ def analyze_crypto():
 
     validated_symbol = validate_symbol(symbol)
 
+    result, status_code = compute_analysis(validated_symbol, timeframe)
+    return jsonify(result), status_code
+
+
+def compute_analysis(validated_symbol, timeframe):
+    """Hitung analisis lengkap, dipakai oleh endpoint HTTP dan event stream"""
     try:
-        exchange = ccxt.binance()
+        # Worker lain mungkin sudah menghitung candle yang sama
+        cache_key = get_analysis_cache_key(validated_symbol, timeframe)
+        cached = shared_cache.get(cache_key)
+        if cached is not None:
+            return cached, 200
+
+        exchange = create_exchange()
 
         # --- 1. AMBIL DATA TEKNIKAL (OHLCV) ---
         ohlcv = exchange.fetch_ohlcv(validated_symbol, timeframe, limit=250)
         if not ohlcv or len(ohlcv) < 200:
-            return jsonify(
-                {"error": f"Data teknikal tidak cukup untuk {timeframe}"}), 404
+            return {"error": f"Data teknikal tidak cukup untuk {timeframe}"}, 404
 
         df = pd.DataFrame(
             ohlcv,
@@ -594,12 +867,10 @@ def analyze_crypto():
 
         # --- 9. MACD CROSSOVER ALERT ---
         try:
-            macd_alert = check_macd_crossover(df)
+            macd_alert = check_macd_crossover(df, validated_symbol, timeframe)
             if macd_alert:
-                alert_history.append(macd_alert)
-                # Keep only last 50 alerts
-                if len(alert_history) > 50:
-                    alert_history.pop(0)
+                # Satu event per crossover candle (duplikat diabaikan)
+                record_signal_event(macd_alert)
         except Exception as e:
             print(f"DEBUG: Error checking MACD crossover: {e}")
             macd_alert = None
@@ -1009,7 +1280,7 @@ def analyze_crypto():
             # ALERTS
             "alerts": {
                 "latest_macd_alert": macd_alert,
-                "recent_alerts": alert_history[-5:] if alert_history else []
+                "recent_alerts": get_signal_events().recent(validated_symbol, limit=5)
             },
 
             # METADATA
@@ -1024,12 +1295,12 @@ def analyze_crypto():
         }
 
         # Cache data untuk auto-update
-        cache_data[validated_symbol] = result
+        shared_cache.set(cache_key, result, ttl=ANALYSIS_CACHE_TTL)
 
-        return jsonify(result)
+        return result, 200
 
     except Exception as e:
-        return jsonify({"error": f"Terjadi kesalahan fatal: {str(e)}"}), 500
+        return {"error": f"Terjadi kesalahan fatal: {str(e)}"}, 500
 
 
 def generate_comprehensive_summary(analysis_data):
@@ -1068,6 +1339,7 @@ def generate_comprehensive_summary(analysis_data):
         return {"error": f"Failed to generate summary: {str(e)}"}
 
 @app.route('/api/analyze/summary/<path:symbol>')
+@conditional_get()
 def get_comprehensive_summary(symbol):
     """Endpoint untuk mendapatkan ringkasan analisis yang mudah dipahami"""
     try:
@@ -1075,7 +1347,7 @@ def get_comprehensive_summary(symbol):
         timeframe = request.args.get('timeframe', '1d')
 
         # Get full analysis
-        response = requests.get(f"http://0.0.0.0:5000/api/analyze?symbol={validated_symbol}&timeframe={timeframe}")
+        response = requests.get(f"{INTERNAL_API_URL}/analyze?symbol={validated_symbol}&timeframe={timeframe}")
 
         if response.status_code != 200:
             return jsonify({"error": "Failed to get analysis data"}), 500
@@ -1096,6 +1368,7 @@ def get_comprehensive_summary(symbol):
         return jsonify({"error": f"Failed to generate summary: {str(e)}"}), 500
 
 @app.route('/api/indicators/all/<path:symbol>')
+@conditional_get()
 def get_all_indicators(symbol):
     """Endpoint khusus untuk mendapatkan semua indikator dalam format terstruktur"""
     try:
@@ -1103,7 +1376,7 @@ def get_all_indicators(symbol):
         timeframe = request.args.get('timeframe', '1d')
 
         # Get full analysis
-        response = requests.get(f"http://0.0.0.0:5000/api/analyze?symbol={validated_symbol}&timeframe={timeframe}")
+        response = requests.get(f"{INTERNAL_API_URL}/analyze?symbol={validated_symbol}&timeframe={timeframe}")
 
         if response.status_code != 200:
             return jsonify({"error": "Failed to get analysis data"}), 500
@@ -1391,7 +1664,7 @@ def get_all_indicators(symbol):
             # ALERTS
             "alerts": {
                 "latest_macd_alert": macd_alert,
-                "recent_alerts": alert_history[-5:] if alert_history else []
+                "recent_alerts": get_signal_events().recent(validated_symbol, limit=5)
             },
 
             # METADATA
@@ -1406,7 +1679,7 @@ def get_all_indicators(symbol):
         }
 
         # Cache data untuk auto-update
-        cache_data[validated_symbol] = result
+        shared_cache.set(cache_key, result, ttl=ANALYSIS_CACHE_TTL)
 
         return jsonify(result)
 
@@ -1419,13 +1692,23 @@ def get_alerts(symbol):
     """Endpoint khusus untuk mendapatkan alert terbaru"""
     try:
         validated_symbol = validate_symbol(symbol)
-        recent_alerts = [
-            alert for alert in alert_history if validated_symbol in str(alert)
-        ]
+        since = request.args.get('since', type=float)
+        until = request.args.get('until', type=float)
+        limit = page_limit(default=10)
+
+        events = get_signal_events()
+        if since is not None or until is not None:
+            # Rentang waktu (epoch detik) langsung dari index database
+            recent_alerts = events.query(validated_symbol, since, until, limit)
+            total = len(recent_alerts)
+        else:
+            recent_alerts = events.recent(validated_symbol, limit)
+            total = events.count(validated_symbol)
+
         return jsonify({
             "symbol": validated_symbol,
-            "alerts": recent_alerts[-10:],  # 10 alert terbaru
-            "total_alerts": len(recent_alerts)
+            "alerts": recent_alerts,
+            "total_alerts": total
         })
     except Exception as e:
         return jsonify({"error": f"Error getting alerts: {str(e)}"}), 500
@@ -1436,7 +1719,7 @@ def get_realtime_data(symbol):
     """Endpoint untuk data real-time singkat"""
     try:
         validated_symbol = validate_symbol(symbol)
-        exchange = ccxt.binance()
+        exchange = create_exchange()
         ticker = exchange.fetch_ticker(validated_symbol)
 
         # Safely get order book
@@ -1464,12 +1747,72 @@ def get_realtime_data(symbol):
                         f"Error getting realtime data: {str(e)}"}), 500
 
 
+def load_market_index():
+    """Market spot aktif exchange sebagai [symbol, base, quote] (cache bersama)"""
+    markets = shared_cache.get('markets:index')
+    if markets is None:
+        markets = [[market['symbol'], market['base'], market['quote']]
+                   for market in create_exchange().load_markets().values()
+                   if market.get('active') is not False and market.get('spot', True)
+                   and '/' in market['symbol'] and ':' not in market['symbol']]
+        shared_cache.set('markets:index', markets, ttl=MARKET_INDEX_TTL)
+    return markets
+
+
+_market_symbols = {"loaded_at": 0.0, "symbols": frozenset()}
+
+
+def is_known_market(symbol):
+    """True bila symbol ada di daftar market exchange.
+
+    Set symbol disimpan per proses selama MARKET_INDEX_TTL. Bila daftar
+    market tidak bisa dimuat (exchange down) symbol dianggap valid; fetch
+    per symbol di pemanggil yang menangani symbol yang ternyata salah.
+    """
+    now = time.time()
+    if now - _market_symbols["loaded_at"] > MARKET_INDEX_TTL:
+        try:
+            _market_symbols["symbols"] = frozenset(
+                market[0] for market in load_market_index())
+            _market_symbols["loaded_at"] = now
+        except Exception as e:
+            # Coba lagi satu menit lagi, bukan di setiap panggilan
+            _market_symbols["loaded_at"] = now - MARKET_INDEX_TTL + 60
+            logger.error(f"Error loading markets for symbol validation: {e}")
+    symbols = _market_symbols["symbols"]
+    return not symbols or symbol in symbols
+
+
+@app.route('/api/markets')
+def get_markets():
+    """Market spot aktif exchange sebagai [symbol, base, quote] (cache bersama)"""
+    try:
+        markets = load_market_index()
+        return jsonify({"markets": markets, "count": len(markets)})
+    except Exception as e:
+        return jsonify({"error": f"Error loading markets: {str(e)}"}), 500
+
+
+@app.route('/api/volume/<path:symbol>')
+def get_volume_analysis(symbol):
+    """Volume 24h terhadap baseline rolling (mean, stddev, z-score per window)"""
+    try:
+        validated_symbol = validate_symbol(symbol)
+        analysis = get_realtime_volume_analysis(validated_symbol)
+        if 'error' in analysis:
+            return jsonify(analysis), 502
+        return jsonify({"symbol": validated_symbol, **analysis})
+    except Exception as e:
+        return jsonify({"error": f"Error getting volume analysis: {str(e)}"}), 500
+
+
 @app.route('/api/fibonacci/<path:symbol>')
+@conditional_get(fixed_timeframe='1d')
 def get_fibonacci_only(symbol):
     """Endpoint khusus untuk level Fibonacci"""
     try:
         validated_symbol = validate_symbol(symbol)
-        exchange = ccxt.binance()
+        exchange = create_exchange()
         ohlcv = exchange.fetch_ohlcv(validated_symbol, '1d', limit=50)
 
         if not ohlcv or len(ohlcv) < 10:
@@ -1507,6 +1850,125 @@ def get_fibonacci_only(symbol):
                         f"Error calculating Fibonacci: {str(e)}"}), 500
 
 
+def start_event_stream():
+    """Start server SSE dan poller upstream yang di-fan-out ke semua client"""
+    global stream_poller
+
+    if os.getenv('SSE_ENABLED', '1') == '0':
+        logger.info("Event stream dinonaktifkan (SSE_ENABLED=0)")
+        return
+
+    event_stream.start()
+    if not event_stream.running:
+        logger.error("Event stream gagal dimulai, dashboard akan memakai polling")
+        return
+
+    ticker_exchange = create_exchange()
+    stream_poller = MarketStreamPoller(
+        event_stream,
+        fetch_tickers=ticker_exchange.fetch_tickers,
+        fetch_ticker=ticker_exchange.fetch_ticker,
+        compute_analysis=compute_analysis,
+        last_closed_candle=get_last_closed_candle_time,
+        versions=analysis_versions,
+        interval=float(os.getenv('SSE_POLL_INTERVAL', '5')))
+    stream_poller.start()
+    publish_service_status()
+
+
+@app.route('/api/analyze/delta')
+def get_analysis_delta():
+    """Resync client mode delta: delta sejak versi tertentu atau snapshot penuh"""
+    symbol = request.args.get('symbol')
+    timeframe = request.args.get('timeframe', '1d')
+
+    if not symbol:
+        return jsonify({"error": "Parameter 'symbol' tidak ditemukan."}), 400
+    if timeframe not in VALID_TIMEFRAMES:
+        return jsonify({"error": f"Timeframe tidak valid."}), 400
+
+    validated_symbol = validate_symbol(symbol)
+
+    try:
+        since = request.args.get('since', type=int)
+        epoch = request.args.get('epoch', type=int)
+
+        event = None
+        if since is not None:
+            event = analysis_versions.since(validated_symbol, timeframe, since,
+                                            epoch)
+        else:
+            event = analysis_versions.snapshot(validated_symbol, timeframe)
+
+        if event is None:
+            # Belum pernah dihitung untuk key ini: hitung dan mulai dari versi 1
+            result, status_code = compute_analysis(validated_symbol, timeframe)
+            if status_code != 200:
+                return jsonify(result), status_code
+            analysis_versions.update(validated_symbol, timeframe, result)
+            event = analysis_versions.snapshot(validated_symbol, timeframe)
+
+        return jsonify(event)
+
+    except Exception as e:
+        return jsonify({"error": f"Failed to get analysis delta: {str(e)}"}), 500
+
+
+def get_stream_token_secret():
+    if STREAM_TOKEN_SECRET:
+        return STREAM_TOKEN_SECRET
+    return shared_cache.update('stream_token_secret',
+                               lambda secret: secret or secrets.token_hex(32))
+
+
+def alert_stream_token(user_id):
+    """Token untuk subscribe topic alerts:<user_id> di event stream"""
+    return hmac.new(get_stream_token_secret().encode(), str(user_id).encode(),
+                    hashlib.sha256).hexdigest()
+
+
+def verify_alert_stream_token(user_id, token):
+    return bool(token) and hmac.compare_digest(alert_stream_token(user_id).encode(),
+                                               token.encode())
+
+
+@app.route('/api/stream/info')
+def stream_info():
+    """Info endpoint SSE supaya dashboard bisa memilih stream atau polling.
+
+    Dengan `user_id` dashboard (bukan chat id Telegram yang numerik) ikut
+    diberikan token untuk topic alert user itu. Alert user Telegram tidak
+    dibuka lewat stream: chat id mudah ditebak.
+    """
+    info = {
+        "available": event_stream.running or bool(
+            shared_cache.get('event_stream_running', False)),
+        "port": SSE_PORT,
+        "path": STREAM_PATH,
+        "url": os.getenv('SSE_PUBLIC_URL'),
+        "clients": event_stream.client_count()
+    }
+    user_id = request.args.get('user_id')
+    if user_id and not user_id.isdigit():
+        info["alert_token"] = alert_stream_token(user_id)
+    return jsonify(info)
+
+
+@app.route('/api/cache/invalidate', methods=['POST'])
+def invalidate_cache():
+    """Invalidasi cache analisis sehingga semua ETag lama tidak berlaku"""
+    if not CACHE_ADMIN_SECRET:
+        return jsonify({"error": "Cache invalidation tidak aktif"}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(),
+                               CACHE_ADMIN_SECRET.encode()):
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        generation = bump_cache_generation()
+        return jsonify({"success": True, "cache_generation": generation})
+    except Exception as e:
+        return jsonify({"error": f"Failed to invalidate cache: {str(e)}"}), 500
+
+
 def start_telegram_bot_thread():
     """Start Telegram bot in a separate thread"""
     logger = logging.getLogger(__name__)
@@ -1516,6 +1978,7 @@ def start_telegram_bot_thread():
     try:
         logger.info("Starting telegram bot thread...")
 
+        start_telegram_bot = get_start_telegram_bot()
         if start_telegram_bot is None:
             logger.error("start_telegram_bot function not available")
             return
@@ -1532,6 +1995,7 @@ def start_telegram_bot_thread():
 
         if telegram_bot:
             logger.info("Starting Telegram Bot in background...")
+            publish_service_status()
             telegram_bot.run()
         else:
             logger.error("Failed to create telegram bot instance")
@@ -1541,6 +2005,12 @@ def start_telegram_bot_thread():
         logger.error(f"Traceback: {traceback.format_exc()}")
 
 
+def is_telegram_bot_running():
+    """Status bot dari sudut pandang worker mana pun"""
+    return telegram_bot is not None or bool(
+        shared_cache.get('telegram_bot_running', False))
+
+
 def run_bot_directly():
     """Alternative: Run bot directly in main thread"""
     import logging
@@ -1554,13 +2024,13 @@ def run_bot_directly():
             from telegram_bot import CryptoTelegramBot
             bot = CryptoTelegramBot(bot_token)
 
-            # Run bot dengan polling sederhana
+            # Run bot dengan polling sederhana (long polling, tanpa jeda antar poll)
             logger.info("🚀 Starting bot polling...")
             bot.application.run_polling(
                 allowed_updates=None,  # Allow all updates
                 drop_pending_updates=True,
                 timeout=10,
-                poll_interval=2.0)
+                poll_interval=0.0)
         else:
             logger.error("❌ No bot token found")
 
@@ -1569,6 +2039,63 @@ def run_bot_directly():
         logger.error(f"Traceback: {traceback.format_exc()}")
 
 
+def get_webhook_bot(wait=10):
+    """Bot yang memproses update webhook di proses ini.
+
+    Leader memakai instance bot-nya (yang juga mendaftarkan webhook); worker
+    lain membuat instance sendiri dalam mode 'webhook-worker', jadi update
+    bisa di-load-balance ke semua worker gunicorn. Selama bot leader masih
+    start, update dijawab 503 (Telegram mengirim ulang) alih-alih membuat
+    bot kedua di proses leader.
+    """
+    global webhook_bot
+    bot = telegram_bot
+    if bot is None:
+        if leader_election.is_leader:
+            return None
+        with _webhook_bot_lock:
+            if webhook_bot is None:
+                start_telegram_bot = get_start_telegram_bot()
+                bot = start_telegram_bot() if start_telegram_bot else None
+                if bot is None:
+                    return None
+                threading.Thread(target=bot.run, kwargs={'mode': 'webhook-worker'},
+                                 daemon=True).start()
+                webhook_bot = bot
+            bot = webhook_bot
+
+    return bot if bot.ready.wait(wait) else None
+
+
+@app.route('/telegram/webhook', methods=['POST'])
+def telegram_webhook():
+    """Endpoint webhook Telegram: update diantrikan ke pool worker bot, dijawab segera"""
+    if not TELEGRAM_WEBHOOK_ENABLED:
+        return jsonify({"error": "Webhook mode tidak aktif"}), 404
+    if not hmac.compare_digest(
+            request.headers.get('X-Telegram-Bot-Api-Secret-Token', '').encode(),
+            TELEGRAM_WEBHOOK_SECRET.encode()):
+        return jsonify({"error": "Forbidden"}), 403
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'update_id' not in data:
+        return jsonify({"error": "Invalid update"}), 400
+
+    bot = get_webhook_bot()
+    try:
+        accepted = bot is not None and bot.submit_update(data)
+    except Exception as e:
+        logger.error(f"Error queueing Telegram update: {e}")
+        accepted = False
+
+    # Non-2xx: Telegram mengirim ulang update nanti
+    if not accepted:
+        response = jsonify({"error": "Bot sibuk, coba lagi"})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    return jsonify({"ok": True})
+
+
 @app.route('/api/telegram/start')
 def start_telegram():
     """Endpoint untuk memulai Telegram bot"""
@@ -1594,8 +2121,17 @@ def start_telegram():
                 }
             }), 400
 
+        # Bot hanya boleh polling dari satu proses (leader)
+        if not leader_election.is_leader:
+            return jsonify({
+                "status": "managed_by_leader",
+                "message": "Telegram bot dijalankan oleh proses leader",
+                "bot_running": is_telegram_bot_running(),
+                "bot_token_available": True
+            })
+
         # Start bot in background thread
-        if not telegram_bot and start_telegram_bot:
+        if not telegram_bot and get_start_telegram_bot():
             logger.info("Creating new bot thread...")
             thread = threading.Thread(target=start_telegram_bot_thread, daemon=True)
             thread.start()
@@ -1640,7 +2176,8 @@ def telegram_status():
     # Detailed debug info
     debug_info = {
         "bot_configured": bot_token is not None,
-        "bot_running": telegram_bot is not None,
+        "bot_running": is_telegram_bot_running(),
+        "mode": "webhook" if TELEGRAM_WEBHOOK_ENABLED else "polling",
         "token_length": len(bot_token) if bot_token else 0,
         "token_valid_format":
         bot_token.count(':') == 1 if bot_token else False,
@@ -1655,6 +2192,11 @@ def telegram_status():
     if bot_token:
         debug_info["token_preview"] = f"{bot_token[:10]}...{bot_token[-10:]}"
 
+    # Antrian update webhook di proses ini
+    bot = telegram_bot or webhook_bot
+    if TELEGRAM_WEBHOOK_ENABLED and bot is not None:
+        debug_info["webhook_updates"] = bot.update_stats()
+
     return jsonify(debug_info)
 
 
@@ -1695,7 +2237,7 @@ def telegram_debug():
         debug_data = {
             "timestamp": datetime.now().isoformat(),
             "bot_token_exists": bool(bot_token),
-            "bot_instance_exists": telegram_bot is not None,
+            "bot_instance_exists": is_telegram_bot_running(),
             "environment_check": {
                 "total_env_vars":
                 len(os.environ),
@@ -1723,7 +2265,8 @@ def telegram_debug():
             # Test koneksi ke Telegram API
             try:
                 import requests
-                test_url = f"https://api.telegram.org/bot{bot_token}/getMe"
+                test_url = (f"{os.getenv('TELEGRAM_API_BASE_URL', 'https://api.telegram.org/bot')}"
+                            f"{bot_token}/getMe")
                 response = requests.get(test_url, timeout=10)
                 debug_data["api_test"] = {
                     "status_code":
@@ -1782,20 +2325,55 @@ def create_alert():
         alert_type = data.get('alert_type')
         condition = data.get('condition')
         value = data.get('value')
-
-        if not all([symbol, alert_type, condition, value]):
+        # Alert berulang: cooldown (detik) dan/atau re-arm setelah harga kembali X%
+        cooldown = data.get('cooldown')
+        rearm_pct = data.get('rearm_pct')
+        recurrence = {
+            'cooldown': float(cooldown) if cooldown is not None else None,
+        }
+        if alert_type in ('PRICE', 'PERCENTAGE', 'VOLUME'):
+            recurrence['rearm_pct'] = float(rearm_pct) if rearm_pct is not None else None
+        elif rearm_pct is not None:
+            return jsonify({"error": "rearm_pct is only supported for PRICE, "
+                                     "PERCENTAGE and VOLUME alerts"}), 400
+
+        # Alert EXPRESSION membawa ekspresi di `expression` (atau `condition`)
+        if alert_type == 'EXPRESSION':
+            condition = data.get('expression') or condition
+
+        # Alert INDICATOR tanpa level (MACD/BB/Ichimoku) dan EXPRESSION tidak butuh value
+        value_required = alert_type != 'EXPRESSION' and (
+            alert_type != 'INDICATOR' or INDICATOR_CONDITIONS.get(condition, True))
+        if not all([symbol, alert_type, condition]) or (value_required and
+                                                        value is None):
             return jsonify({"error": "Missing required fields"}), 400
 
-        if alert_type == 'PRICE':
-            alert_id = alert_system.create_price_alert(user_id, symbol,
-                                                       condition, value)
-        elif alert_type == 'PERCENTAGE':
-            alert_id = alert_system.create_percentage_alert(
-                user_id, symbol, value, condition)
-        elif alert_type == 'VOLUME':
-            alert_id = alert_system.create_volume_alert(user_id, symbol, value)
-        else:
-            return jsonify({"error": "Invalid alert type"}), 400
+        try:
+            if alert_type == 'PRICE':
+                alert_id = get_alert_system().create_price_alert(
+                    user_id, symbol, condition, value, **recurrence)
+            elif alert_type == 'PERCENTAGE':
+                alert_id = get_alert_system().create_percentage_alert(
+                    user_id, symbol, value, condition, **recurrence)
+            elif alert_type == 'VOLUME':
+                # Kondisi selain ZSCORE diperlakukan sebagai SPIKE (threshold absolut)
+                alert_id = get_alert_system().create_volume_alert(
+                    user_id, symbol, value,
+                    condition_type='ZSCORE' if condition.upper() == 'ZSCORE' else 'SPIKE',
+                    **recurrence)
+            elif alert_type == 'EXPRESSION':
+                alert_id = get_alert_system().create_expression_alert(
+                    user_id, symbol, condition,
+                    timeframe=data.get('timeframe', '1h'), **recurrence)
+            elif alert_type == 'INDICATOR':
+                alert_id = get_alert_system().create_indicator_alert(
+                    user_id, symbol, condition,
+                    timeframe=data.get('timeframe', '1h'), level=value,
+                    **recurrence)
+            else:
+                return jsonify({"error": "Invalid alert type"}), 400
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         return jsonify({
             "success": True,
@@ -1807,16 +2385,71 @@ def create_alert():
         return jsonify({"error": f"Failed to create alert: {str(e)}"}), 500
 
 
+def page_limit(default=50, maximum=500):
+    """Parameter `limit` halaman, dibatasi ke [1, maximum]"""
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, maximum))
+
+
 @app.route('/api/alerts/user/<user_id>')
 def get_user_alerts(user_id):
-    """Get all alerts for a user"""
+    """Alert milik user, per halaman (kursor = id alert terakhir halaman sebelumnya)"""
     try:
-        alerts = alert_system.get_user_alerts(user_id)
-        return jsonify({"alerts": alerts, "total": len(alerts)})
+        limit = page_limit()
+        alerts = get_alert_system().get_user_alerts(
+            user_id, limit=limit,
+            before_id=request.args.get('cursor', type=int),
+            active_only=request.args.get('active', '').lower() in ('1', 'true'))
+        next_cursor = alerts[-1]['id'] if len(alerts) == limit else None
+        return jsonify({"alerts": alerts, "total": len(alerts),
+                        "next_cursor": next_cursor})
     except Exception as e:
         return jsonify({"error": f"Failed to get alerts: {str(e)}"}), 500
 
 
+@app.route('/api/alerts/user/<user_id>/history')
+def get_user_alert_history(user_id):
+    """Riwayat trigger user dalam masa retensi, per halaman"""
+    try:
+        limit = page_limit()
+        symbol = request.args.get('symbol')
+        history = get_alert_system().get_trigger_history(
+            user_id, limit=limit,
+            before_id=request.args.get('cursor', type=int),
+            symbol=symbol.upper() if symbol else None)
+        next_cursor = history[-1]['id'] if len(history) == limit else None
+        return jsonify({"history": history, "total": len(history),
+                        "next_cursor": next_cursor})
+    except Exception as e:
+        return jsonify({"error": f"Failed to get alert history: {str(e)}"}), 500
+
+
+@app.route('/api/alerts/user/<user_id>/history/daily')
+def get_user_alert_history_daily(user_id):
+    """Ringkasan harian trigger yang sudah melewati masa retensi.
+
+    Kursor berbentuk "YYYY-MM-DD:alert_id" dari baris terakhir halaman sebelumnya.
+    """
+    try:
+        limit = page_limit(default=30)
+        before = None
+        cursor = request.args.get('cursor')
+        if cursor:
+            day, _, alert_id = cursor.partition(':')
+            if not alert_id.isdigit():
+                return jsonify({"error": "Invalid cursor"}), 400
+            before = (day, int(alert_id))
+
+        summary = get_alert_system().get_trigger_summary(user_id, limit=limit,
+                                                         before=before)
+        next_cursor = (f"{summary[-1]['day']}:{summary[-1]['alert_id']}"
+                       if len(summary) == limit else None)
+        return jsonify({"days": summary, "total": len(summary),
+                        "next_cursor": next_cursor})
+    except Exception as e:
+        return jsonify({"error": f"Failed to get alert summary: {str(e)}"}), 500
+
+
 @app.route('/api/alerts/<int:alert_id>', methods=['DELETE'])
 def delete_alert(alert_id):
     """Delete an alert"""
@@ -1824,7 +2457,7 @@ def delete_alert(alert_id):
         data = request.json
         user_id = data.get('user_id', 'web_user')
 
-        success = alert_system.delete_alert(alert_id, user_id)
+        success = get_alert_system().delete_alert(alert_id, user_id)
 
         if success:
             return jsonify({"success": True, "message": "Alert deleted"})
@@ -1835,11 +2468,64 @@ def delete_alert(alert_id):
         return jsonify({"error": f"Failed to delete alert: {str(e)}"}), 500
 
 
+@app.route('/api/watchlist', methods=['POST'])
+def subscribe_watchlist():
+    """Tambah symbol ke watchlist user (digest tiap `interval_hours` jam)"""
+    try:
+        data = request.json or {}
+        user_id = data.get('user_id', 'web_user')
+        symbol = data.get('symbol')
+        timeframe = data.get('timeframe', '1d')
+        if not symbol:
+            return jsonify({"error": "Missing required fields"}), 400
+        if timeframe not in VALID_TIMEFRAMES:
+            return jsonify({"error": "Timeframe tidak valid."}), 400
+
+        try:
+            subscription = get_watchlist_store().subscribe(
+                str(user_id), validate_symbol(symbol), timeframe,
+                int(data.get('interval_hours', 4)))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify({"success": True, **subscription})
+    except Exception as e:
+        return jsonify({"error": f"Failed to update watchlist: {str(e)}"}), 500
+
+
+@app.route('/api/watchlist/<user_id>')
+def get_watchlist(user_id):
+    try:
+        return jsonify({"watchlist": get_watchlist_store().user_watchlist(user_id),
+                        "intervals": list(DIGEST_INTERVALS)})
+    except Exception as e:
+        return jsonify({"error": f"Failed to get watchlist: {str(e)}"}), 500
+
+
+@app.route('/api/watchlist/<user_id>/<path:symbol>', methods=['DELETE'])
+def unsubscribe_watchlist(user_id, symbol):
+    """Hapus symbol dari watchlist (opsional hanya satu `timeframe`)"""
+    try:
+        removed = get_watchlist_store().unsubscribe(user_id, validate_symbol(symbol),
+                                                    request.args.get('timeframe'))
+        if removed:
+            return jsonify({"success": True, "removed": removed})
+        return jsonify({"error": "Symbol tidak ada di watchlist"}), 404
+    except Exception as e:
+        return jsonify({"error": f"Failed to update watchlist: {str(e)}"}), 500
+
+
+def analyze_for_digest(symbol, timeframe):
+    """Analisis untuk digest (lewat cache analisis bersama); None bila gagal"""
+    result, status_code = compute_analysis(symbol, timeframe)
+    return result if status_code == 200 else None
+
+
 @app.route('/api/alerts/check')
 def check_alerts():
     """Manually trigger alert checking"""
     try:
-        triggered_alerts = alert_system.check_alerts()
+        triggered_alerts = get_alert_system().check_alerts()
         return jsonify({
             "triggered_alerts": triggered_alerts,
             "count": len(triggered_alerts)
@@ -1848,59 +2534,161 @@ def check_alerts():
         return jsonify({"error": f"Failed to check alerts: {str(e)}"}), 500
 
 
-def start_alert_monitoring():
-    """Background thread for monitoring alerts"""
-    import logging
-    logger = logging.getLogger(__name__)
+@app.route('/api/alerts/engine')
+def alert_engine_status():
+    """Mode alert engine (stream/polling/sharded) dan latency trigger"""
+    stats = current_engine_stats()
+    if stats is not None:
+        if notification_dispatcher:
+            stats["notifications"] = notification_dispatcher.stats()
+        if digest_scheduler:
+            stats["digest"] = digest_scheduler.last_run
+        return jsonify({"available": True, **stats})
+
+    stats = shared_cache.get('alert_engine_stats')
+    return jsonify({"available": stats is not None, **(stats or {})})
+
+
+def format_alert_notification(alert):
+    """Format pesan Telegram untuk satu alert yang terpicu"""
+    notification = f"🚨 *ALERT TRIGGERED!*\n\n"
+    notification += f"📊 Symbol: {alert.get('symbol', '')}\n"
+    notification += f"💰 Price: ${alert.get('price', 0):,.2f}\n"
+    notification += f"🔔 Message: {alert.get('message', 'Alert triggered')}\n"
+    notification += f"⏰ Time: {datetime.now().strftime('%H:%M:%S')}"
+    return notification
+
+
+def send_telegram_notification(chat_id, text):
+    """Kirim satu pesan lewat bot (blocking); dipakai NotificationDispatcher"""
+    if not telegram_bot or not getattr(telegram_bot, 'application', None):
+        raise DeliveryDeferred("Telegram bot belum berjalan")
+
+    loop = getattr(telegram_bot, 'loop', None)
+    if loop is None:
+        raise DeliveryDeferred("Telegram bot belum berjalan")
+    future = asyncio.run_coroutine_threadsafe(
+        send_telegram_alert(chat_id, text), loop)
+    future.result(timeout=30)
+
+
+def dispatch_triggered_alerts(triggered_alerts):
+    """Kirim alert yang terpicu ke Telegram (lewat antrian) dan ke dashboard (SSE)"""
+    # User Telegram (id numerik) masuk outbox; dispatcher yang mengatur rate.
+    # Pesan identik untuk user yang sama (alert kembar) cukup dikirim sekali
+    if notification_dispatcher:
+        notification_dispatcher.enqueue_many(list(dict.fromkeys(
+            (alert['user_id'], format_alert_notification(alert))
+            for alert in triggered_alerts
+            if str(alert.get('user_id', '')).isdigit()
+        )))
+
+    # Push ke dashboard yang subscribe alert user ini
+    for alert in triggered_alerts:
+        event_stream.publish(f"alerts:{alert.get('user_id', '')}",
+                             "alert", alert, retain=False)
+
+    # Statistik engine untuk worker lain (/api/alerts/engine)
+    stats = current_engine_stats()
+    if stats is not None:
+        shared_cache.set('alert_engine_stats', stats)
+
+
+def current_engine_stats():
+    """Statistik alert engine di proses ini (None bila bukan leader)"""
+    if alert_supervisor:
+        return alert_supervisor.stats()
+    if alert_engine:
+        return alert_engine.stats()
+    return None
 
-    while True:
-        try:
-            triggered_alerts = alert_system.check_alerts()
-
-            # Send triggered alerts to Telegram bot if available
-            if triggered_alerts and telegram_bot:
-                for alert in triggered_alerts:
-                    try:
-                        # Send alert to Telegram user
-                        user_id = alert.get('user_id', '')
-                        message = alert.get('message', 'Alert triggered')
-                        symbol = alert.get('symbol', '')
-                        price = alert.get('price', 0)
-
-                        # Format notification message
-                        notification = f"🚨 *ALERT TRIGGERED!*\n\n"
-                        notification += f"📊 Symbol: {symbol}\n"
-                        notification += f"💰 Price: ${price:,.2f}\n"
-                        notification += f"🔔 Message: {message}\n"
-                        notification += f"⏰ Time: {datetime.now().strftime('%H:%M:%S')}"
-
-                        # Send via Telegram bot if user_id is valid
-                        if user_id and user_id.isdigit():
-                            asyncio.run_coroutine_threadsafe(
-                                send_telegram_alert(user_id, notification),
-                                telegram_bot.application.updater._loop)
-
-                        logger.info(
-                            f"🔔 Alert sent to user {user_id}: {message}")
-                    except Exception as telegram_error:
-                        logger.error(
-                            f"Failed to send Telegram alert: {telegram_error}")
 
-        except Exception as e:
-            logger.error(f"Error in alert monitoring: {e}")
+def create_price_feed():
+    """Feed harga untuk alert engine sesuai ALERT_ENGINE_MODE (lihat price_feed_from_env)"""
+    return price_feed_from_env(get_alert_system().current_symbols)
+
+
+def get_symbol_atr(symbol, timeframe='1h'):
+    """ATR(14) symbol dengan perhitungan yang sama seperti analyze_crypto"""
+    cache_key = f"atr:{symbol}:{timeframe}:{get_last_closed_candle_time(timeframe)}"
+    cached = shared_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    exchange = create_exchange()
+    ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=50)
+    if not ohlcv or len(ohlcv) < 15:
+        return None
+
+    df = pd.DataFrame(
+        ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    atr_series = df.ta.atr(length=14)  # Average True Range
+    atr = atr_series.iloc[-1] if atr_series is not None else None
+    if atr is None or pd.isna(atr):
+        return None
+
+    atr = float(atr)
+    shared_cache.set(cache_key, atr, ttl=TIMEFRAME_SECONDS[timeframe])
+    return atr
+
+
+def start_indicator_alert_monitoring():
+    """Background thread untuk alert INDICATOR (update per candle closed)"""
+    exchange = create_exchange()
+    evaluator = IndicatorAlertEvaluator(
+        get_alert_system(),
+        fetch_ohlcv=exchange.fetch_ohlcv,
+        last_closed_candle=get_last_closed_candle_time)
+    run_indicator_alerts(evaluator, dispatch_triggered_alerts,
+                         interval=float(os.getenv('INDICATOR_ALERT_INTERVAL', '30')))
 
-        # Check alerts every 60 seconds
-        time.sleep(60)
+
+def start_alert_monitoring():
+    """Background thread for monitoring alerts"""
+    global alert_engine, alert_supervisor
+
+    budget = int(os.getenv('ALERT_POLL_BUDGET', '60'))
+    poll_interval = float(os.getenv('ALERT_POLL_INTERVAL', '60'))
+
+    # ALERT_SHARDS > 1: symbol dibagi ke beberapa proses (consistent hashing)
+    shards = int(os.getenv('ALERT_SHARDS', '1'))
+    if shards > 1:
+        alert_supervisor = ShardSupervisor(
+            get_alert_system().db_path, shards,
+            on_triggered=dispatch_triggered_alerts,
+            config={'poll_budget': max(1, budget // shards),
+                    'poll_interval': poll_interval})
+        alert_supervisor.start()
+        return
+
+    # Polling adaptif: symbol dekat threshold dicek lebih sering dalam budget tetap
+    scheduler = AdaptivePollScheduler(
+        get_alert_system(),
+        fetch_atr=get_symbol_atr,
+        budget_per_minute=budget,
+        atr_timeframe_seconds=TIMEFRAME_SECONDS['1h'])
+
+    alert_engine = AlertEngine(
+        get_alert_system(),
+        on_triggered=dispatch_triggered_alerts,
+        feed=create_price_feed(),
+        scheduler=scheduler,
+        poll_interval=poll_interval)
+    alert_engine.running = True
+    alert_engine.run()
 
 
 async def send_telegram_alert(user_id, message):
-    """Send alert notification to Telegram user"""
+    """Send alert notification to Telegram user (error diteruskan ke dispatcher)"""
+    bot = telegram_bot.application.bot
     try:
-        if telegram_bot and telegram_bot.application:
-            await telegram_bot.application.bot.send_message(
-                chat_id=int(user_id), text=message, parse_mode='Markdown')
+        await bot.send_message(chat_id=int(user_id), text=message,
+                               parse_mode='Markdown')
     except Exception as e:
-        logger.error(f"Error sending Telegram alert to {user_id}: {e}")
+        # Teks dari user (mis. ekspresi) bisa merusak Markdown: kirim polos
+        if "parse entities" not in str(e).lower():
+            raise
+        await bot.send_message(chat_id=int(user_id), text=message)
 
 
 @app.route('/')
@@ -2019,22 +2807,140 @@ def home():
     """
 
 
-if __name__ == "__main__":
+def warm_up():
+    """Load dependency berat dan singleton di background setelah port terbuka"""
+    readiness["started_at"] = datetime.now().isoformat()
+
+    steps = [
+        ("pandas", lambda: pd.load()),
+        ("numpy", lambda: np.load()),
+        ("ccxt", lambda: ccxt.load()),
+        ("alert_system", get_alert_system),
+        ("exchange", lambda: get_alert_system().exchange),
+    ]
+
+    for name, step in steps:
+        started = time.time()
+        try:
+            step()
+            readiness["steps"][name] = {
+                "ok": True,
+                "seconds": round(time.time() - started, 3)
+            }
+        except Exception as e:
+            readiness["steps"][name] = {"ok": False, "error": str(e)}
+            logger.error(f"Warm-up step {name} gagal: {e}")
+
+    readiness["ready"] = all(step["ok"] for step in readiness["steps"].values())
+    readiness["completed_at"] = datetime.now().isoformat()
+    logger.info(f"Warm-up selesai (ready={readiness['ready']})")
+
+
+def start_warm_up():
+    """Mulai warm-up di background thread"""
+    threading.Thread(target=warm_up, daemon=True).start()
+
+
+@app.route('/healthz')
+def liveness():
+    """Liveness probe: proses hidup dan bisa melayani HTTP"""
+    return jsonify({"status": "alive", "pid": os.getpid()})
+
+
+@app.route('/readyz')
+def readiness_probe():
+    """Readiness probe: 200 setelah dependency berat dan alert DB siap"""
+    status_code = 200 if readiness["ready"] else 503
+    return jsonify({
+        "status": "ready" if readiness["ready"] else "warming_up",
+        "is_leader": leader_election.is_leader,
+        **readiness
+    }), status_code
+
+
+def publish_service_status():
+    """Status service leader dengan TTL: hilang sendiri bila leader mati"""
+    ttl = SERVICE_HEARTBEAT_INTERVAL * 3
+    if event_stream.running:
+        shared_cache.set('event_stream_running', True, ttl=ttl)
+    if telegram_bot is not None:
+        shared_cache.set('telegram_bot_running', True, ttl=ttl)
+
+
+def run_service_heartbeat():
+    """Loop leader: perbarui status service dan buang entry cache kedaluwarsa.
+
+    Key analisis/ATR memuat candle sehingga tidak pernah ditimpa; tanpa
+    purge berkala shared_cache.db terus membesar sampai deploy berikutnya.
+    """
+    last_purge = 0.0
+    while True:
+        try:
+            publish_service_status()
+            if time.time() - last_purge >= SHARED_CACHE_PURGE_INTERVAL:
+                last_purge = time.time()
+                shared_cache.purge_expired()
+        except Exception as e:
+            logger.error(f"Error in service heartbeat: {e}")
+        time.sleep(SERVICE_HEARTBEAT_INTERVAL)
+
+
+def start_background_services():
+    """Jalankan service tunggal (dipanggil oleh proses leader)"""
+    global notification_dispatcher, digest_scheduler
+
+    # Deploy/restart baru = generasi cache baru
+    bump_cache_generation()
+    shared_cache.delete('telegram_bot_running')
+    shared_cache.delete('event_stream_running')
+    threading.Thread(target=run_service_heartbeat, daemon=True).start()
+
     # Initialize database untuk alert system
     try:
-        alert_system.setup_database()
+        get_alert_system().setup_database()
         print("Alert system database initialized")
     except Exception as e:
         print(f"Alert system initialization warning: {e}")
 
+    # Antrian notifikasi Telegram (melanjutkan outbox yang tersisa)
+    if os.getenv('TELEGRAM_BOT_TOKEN'):
+        notification_dispatcher = NotificationDispatcher(
+            get_alert_system().db, send_telegram_notification,
+            global_rate=float(os.getenv('TELEGRAM_GLOBAL_RATE', '25')),
+            per_chat_rate=float(os.getenv('TELEGRAM_CHAT_RATE', '1')))
+        notification_dispatcher.start()
+
+        # Digest watchlist: dihitung sekali per symbol, dikirim lewat outbox
+        digest_scheduler = DigestScheduler(
+            get_watchlist_store(), analyze_for_digest,
+            notification_dispatcher.enqueue_many,
+            check_interval=float(os.getenv('DIGEST_CHECK_INTERVAL', '60')),
+            wake=notification_dispatcher.wake)
+        digest_scheduler.start()
+
+    # Retensi riwayat alert: ringkas trigger lama ke agregat harian
+    retention_days = float(os.getenv('ALERT_HISTORY_RETENTION_DAYS', '90'))
+    if retention_days > 0:
+        AlertHistoryCompactor(
+            get_alert_system().db, retention_days=retention_days,
+            interval=float(os.getenv('ALERT_COMPACTION_INTERVAL', '3600'))).start()
+
     # Start alert monitoring
     print("Starting alert monitoring system...")
     alert_thread = threading.Thread(target=start_alert_monitoring, daemon=True)
     alert_thread.start()
+    threading.Thread(target=start_indicator_alert_monitoring, daemon=True).start()
+    threading.Thread(target=run_volume_baseline, daemon=True,
+                     args=(get_volume_baseline(), get_alert_system().volume_zscore_symbols),
+                     kwargs={'interval': float(os.getenv('VOLUME_BASELINE_INTERVAL', '300'))}).start()
+
+    # Start event stream (SSE) untuk dashboard
+    print(f"Starting event stream on port {SSE_PORT}...")
+    start_event_stream()
 
     # Auto-start Telegram bot jika token tersedia
     bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
-    if bot_token and start_telegram_bot:
+    if bot_token and get_start_telegram_bot():
         print("Starting Telegram bot automatically...")
         thread = threading.Thread(target=start_telegram_bot_thread, daemon=True)
         thread.start()
@@ -2044,8 +2950,39 @@ if __name__ == "__main__":
         print("TELEGRAM_BOT_TOKEN tidak ditemukan. Bot tidak akan dimulai.")
         print("Tambahkan token ke Secrets untuk mengaktifkan bot Telegram.")
 
+
+leader_election = LeaderElection(LEADER_LOCK_PATH,
+                                 on_elected=start_background_services)
+
+
+def serve_production():
+    """Jalankan app dengan gunicorn multi-worker (lihat gunicorn.conf.py)"""
+    from gunicorn.app.wsgiapp import run
+
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.argv = [
+        'gunicorn', '--chdir', app_dir, '--config',
+        os.path.join(app_dir, 'gunicorn.conf.py'), 'app:app'
+    ]
+    run()
+
+
+if __name__ == "__main__":
+    if '--production' in sys.argv or os.getenv('APP_MODE') == 'production':
+        print("Starting production server (gunicorn)...")
+        serve_production()
+        sys.exit(0)
+
+    start_warm_up()
+
+    # Service background jalan di thread supaya port 5000 langsung terbuka
+    if leader_election.try_acquire():
+        threading.Thread(target=start_background_services, daemon=True).start()
+    else:
+        print("Proses lain sudah menjadi leader; service background tidak dimulai.")
+
     print("Starting web server...")
-    print("Dashboard available at: http://0.0.0.0:5000/dashboard")
+    print(f"Dashboard available at: http://0.0.0.0:{APP_PORT}/dashboard")
     print("Public URL akan tersedia setelah deploy")
     
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=APP_PORT, debug=False)
@@ -0,0 +1,51 @@
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple, Optional
+
+
+class RenderedMessage(NamedTuple):
+    version: Optional[str]
+    etag: Optional[str]
+    text: str
+    reply_markup: Any = None
+
+
+class RenderedMessageCache:
+    """Cache LRU pesan bot yang sudah di-render (teks Markdown + inline keyboard).
+
+    Key berupa (command, symbol, timeframe, ...); setiap entry menyimpan versi
+    data sumbernya, yaitu ETag dari API (analisis/fibonacci). Selama versi
+    sama, permintaan berikutnya memakai teks yang sama tanpa parse JSON
+    maupun format ulang; ETag juga dikirim sebagai If-None-Match sehingga
+    backend cukup menjawab 304. Response tanpa ETag tidak di-cache: isinya
+    (mis. harga terkini) berubah hampir setiap request.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[Hashable, RenderedMessage]' = OrderedDict()
+        self.hits = 0
+        self.renders = 0
+
+    def get(self, key: Hashable) -> Optional[RenderedMessage]:
+        message = self.entries.get(key)
+        if message is not None:
+            self.entries.move_to_end(key)
+        return message
+
+    def put(self, key: Hashable, message: RenderedMessage):
+        self.entries[key] = message
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def lookup(self, key: Hashable, version: str) -> Optional[RenderedMessage]:
+        """Entry untuk key bila versinya masih `version`"""
+        message = self.get(key)
+        if message is not None and message.version == version:
+            self.hits += 1
+            return message
+        return None
+
+    def stats(self):
+        return {'entries': len(self.entries), 'hits': self.hits,
+                'renders': self.renders}
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """User sudah punya terlalu banyak permintaan yang menunggu"""
+
+
+class _Job:
+    __slots__ = ('user_id', 'key', 'fn', 'args', 'future')
+
+    def __init__(self, user_id, key, fn, args, future):
+        self.user_id = user_id
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.future = future
+
+
+class FairWorkQueue:
+    """Antrian kerja adil untuk request bot ke backend.
+
+    - Paling banyak `workers` request berjalan bersamaan (global) dan
+      `per_user_concurrency` per user; fungsi blocking dijalankan lewat
+      asyncio.to_thread sehingga event loop bot tetap responsif.
+    - Antrian per user dilayani round-robin: user yang mengirim banyak
+      request hanya mendapat giliran yang sama dengan user lain, jadi tail
+      latency user lain tetap terbatas. Lebih dari `per_user_pending`
+      request menunggu ditolak dengan QueueFull.
+    - Request dengan `key` sama yang masih menunggu/berjalan digabung:
+      semua pemanggil menunggu hasil yang sama (mis. banyak user menekan
+      tombol "Analisis BTC" bersamaan).
+    """
+
+    def __init__(self, workers: int = 4, per_user_concurrency: int = 1,
+                 per_user_pending: int = 3):
+        self.workers = workers
+        self.per_user_concurrency = per_user_concurrency
+        self.per_user_pending = per_user_pending
+        self.queues: Dict[Hashable, Deque[_Job]] = {}
+        # User yang punya job menunggu, urutan giliran round-robin
+        self.ready: Deque[Hashable] = deque()
+        self.in_flight: Dict[Hashable, int] = {}
+        self.pending: Dict[Hashable, asyncio.Future] = {}
+        self.condition: Optional[asyncio.Condition] = None
+        self.tasks = []
+        self.completed = 0
+        self.merged = 0
+        self.rejected = 0
+
+    def start(self):
+        """Jalankan worker di event loop yang sedang berjalan (sekali)"""
+        if self.tasks:
+            return
+        self.condition = asyncio.Condition()
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def submit(self, user_id: Hashable, key: Optional[Hashable],
+                     fn: Callable[..., Any], *args) -> Any:
+        """Jalankan `fn(*args)` atas nama user; `key` None = tidak pernah digabung"""
+        self.start()
+
+        if key is not None and key in self.pending:
+            self.merged += 1
+            return await asyncio.shield(self.pending[key])
+
+        queue = self.queues.setdefault(user_id, deque())
+        if len(queue) + self.in_flight.get(user_id, 0) >= self.per_user_pending:
+            self.rejected += 1
+            raise QueueFull("⏳ Masih ada permintaan Anda yang diproses, coba lagi sebentar lagi")
+
+        future = asyncio.get_running_loop().create_future()
+        if key is not None:
+            self.pending[key] = future
+        queue.append(_Job(user_id, key, fn, args, future))
+
+        async with self.condition:
+            if user_id not in self.ready:
+                self.ready.append(user_id)
+            self.condition.notify()
+
+        return await asyncio.shield(future)
+
+    def _next_job(self) -> Optional[_Job]:
+        """Job berikutnya secara round-robin (dipanggil dengan condition dipegang)"""
+        for _ in range(len(self.ready)):
+            user_id = self.ready.popleft()
+            queue = self.queues.get(user_id)
+            if not queue:
+                self.queues.pop(user_id, None)
+                continue
+
+            # User di batas concurrency tetap di antrian giliran
+            self.ready.append(user_id)
+            if self.in_flight.get(user_id, 0) >= self.per_user_concurrency:
+                continue
+
+            job = queue.popleft()
+            if not queue:
+                # Antrian user kosong: keluar dari giliran dan hapus deque-nya
+                self.ready.pop()
+                del self.queues[user_id]
+            return job
+        return None
+
+    async def _worker(self):
+        while True:
+            async with self.condition:
+                job = self._next_job()
+                while job is None:
+                    await self.condition.wait()
+                    job = self._next_job()
+                self.in_flight[job.user_id] = self.in_flight.get(job.user_id, 0) + 1
+
+            try:
+                result = await asyncio.to_thread(job.fn, *job.args)
+                job.future.set_result(result)
+            except Exception as e:
+                job.future.set_exception(e)
+            finally:
+                if job.key is not None:
+                    self.pending.pop(job.key, None)
+                self.completed += 1
+                async with self.condition:
+                    self.in_flight[job.user_id] -= 1
+                    if not self.in_flight[job.user_id]:
+                        del self.in_flight[job.user_id]
+                    # Slot user ini terbuka lagi: job berikutnya bisa jalan
+                    self.condition.notify_all()
+
+    def stats(self) -> Dict:
+        return {
+            'queued': sum(len(queue) for queue in self.queues.values()),
+            'in_flight': sum(self.in_flight.values()),
+            'users_waiting': len(self.ready),
+            'completed': self.completed,
+            'merged': self.merged,
+            'rejected': self.rejected
+        }
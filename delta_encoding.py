@@ -0,0 +1,225 @@
+import copy
+import math
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+def _escape(token) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def normalize_json(value):
+    """Salinan `value` dalam bentuk yang sama seperti setelah round-trip JSON.
+
+    Scalar numpy (np.float64 dari round() atau pandas) menjadi float/int
+    Python, NaN/inf menjadi None, tuple menjadi list dan key dict menjadi
+    string. Data yang di-diff dan disimpan selalu dalam bentuk ini, jadi
+    nilai yang tidak berubah tidak menghasilkan operasi replace.
+    """
+    if isinstance(value, dict):
+        return {str(key): normalize_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_json(item) for item in value]
+    if value is None or isinstance(value, (str, bool)):
+        return value
+    if hasattr(value, 'item') and not isinstance(value, (int, float)):
+        # Scalar numpy
+        value = value.item()
+        if isinstance(value, (bool, int, str)):
+            return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, int):
+        return value
+    return str(value)
+
+
+def _same_value(old, new) -> bool:
+    # bool adalah subclass int, jadi bool hanya sama dengan bool (True != 1);
+    # angka lain dibandingkan nilainya (1 == 1.0)
+    if isinstance(old, bool) or isinstance(new, bool):
+        return type(old) is type(new) and old == new
+    if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+        return old == new
+    return type(old) is type(new) and old == new
+
+
+def diff_json(old, new, path: str = "") -> List[Dict]:
+    """Hitung operasi JSON-patch (RFC 6902 subset) dari `old` ke `new`.
+
+    Dict dibandingkan per key secara rekursif. List yang berubah diganti
+    utuh karena list di hasil analisis pendek (level S/R, pola candlestick).
+    Kedua sisi diharapkan sudah melalui normalize_json.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops.extend(diff_json(old[key], value, child))
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        return ops
+
+    if not _same_value(old, new):
+        return [{"op": "replace", "path": path, "value": new}]
+
+    return []
+
+
+def apply_patch(document, ops: List[Dict]):
+    """Terapkan operasi dari diff_json ke salinan `document`"""
+    document = copy.deepcopy(document)
+
+    for op in ops:
+        if op["path"] == "":
+            document = copy.deepcopy(op["value"])
+            continue
+
+        tokens = [_unescape(t) for t in op["path"].split("/")[1:]]
+        target = document
+        for token in tokens[:-1]:
+            target = target[int(token)] if isinstance(target, list) else target[token]
+
+        last = tokens[-1]
+        if isinstance(target, list):
+            last = int(last)
+
+        if op["op"] == "remove":
+            del target[last]
+        else:
+            target[last] = copy.deepcopy(op["value"])
+
+    return document
+
+
+class AnalysisVersionTracker:
+    """Versi dan riwayat delta hasil analisis per (symbol, timeframe).
+
+    Client stream menerima snapshot penuh sekali, lalu delta bernomor versi.
+    Client yang ketinggalan versi bisa resync lewat `since()`: kalau riwayat
+    delta masih lengkap cukup dikirim gabungan delta, kalau tidak snapshot.
+    `epoch` dibuat ulang setiap state baru, jadi nomor versi dari state lama
+    tidak pernah dianggap valid.
+
+    Dengan `store` (SharedCache) state disimpan lintas proses sehingga worker
+    mana pun bisa melayani resync untuk versi yang dibuat leader.
+    """
+
+    def __init__(self, history_size: int = 20, store=None):
+        self.history_size = history_size
+        self.store = store
+        self.states: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(symbol: str, timeframe: str) -> str:
+        return f"analysis_versions:{symbol}:{timeframe}"
+
+    def _load(self, key: str) -> Optional[Dict]:
+        if self.store is not None:
+            return self.store.get(key)
+        return self.states.get(key)
+
+    def _mutate(self, key: str, fn):
+        """Read-modify-write state secara atomik (antar thread atau antar proses)"""
+        if self.store is not None:
+            return self.store.update(key, fn)
+        with self.lock:
+            self.states[key] = fn(self.states.get(key))
+            return self.states[key]
+
+    def update(self, symbol: str, timeframe: str, data: Dict) -> Optional[Dict]:
+        """Simpan hasil analisis baru; return event snapshot/delta atau None bila sama"""
+        data = normalize_json(data)
+        changes = {}
+
+        def apply(state):
+            if state is None:
+                changes["ops"] = None
+                return {
+                    "epoch": int(time.time() * 1000),
+                    "version": 1,
+                    "data": data,
+                    "history": []
+                }
+
+            ops = diff_json(state["data"], data)
+            changes["ops"] = ops
+            if not ops:
+                return state
+
+            version = state["version"] + 1
+            history = state["history"] + [[version, ops]]
+            return {
+                "epoch": state["epoch"],
+                "version": version,
+                "data": data,
+                "history": history[-self.history_size:]
+            }
+
+        state = self._mutate(self._key(symbol, timeframe), apply)
+
+        if changes["ops"] is None:
+            return self._snapshot(symbol, timeframe, state)
+        if not changes["ops"]:
+            return None
+        return self._delta(symbol, timeframe, state, state["version"] - 1,
+                           changes["ops"])
+
+    def snapshot(self, symbol: str, timeframe: str) -> Optional[Dict]:
+        """Snapshot penuh versi terbaru"""
+        state = self._load(self._key(symbol, timeframe))
+        return self._snapshot(symbol, timeframe, state) if state else None
+
+    def since(self, symbol: str, timeframe: str, version: int,
+              epoch: Optional[int] = None) -> Optional[Dict]:
+        """Delta gabungan dari `version` ke versi terbaru, atau snapshot bila riwayat kurang"""
+        state = self._load(self._key(symbol, timeframe))
+        if state is None:
+            return None
+
+        current = state["version"]
+        if epoch != state["epoch"] or version > current:
+            return self._snapshot(symbol, timeframe, state)
+        if version == current:
+            return self._delta(symbol, timeframe, state, current, [])
+
+        history = [(v, ops) for v, ops in state["history"] if v > version]
+        if not history or history[0][0] != version + 1:
+            return self._snapshot(symbol, timeframe, state)
+
+        return self._delta(symbol, timeframe, state, version,
+                           [op for _, ops in history for op in ops])
+
+    @staticmethod
+    def _snapshot(symbol: str, timeframe: str, state: Dict) -> Dict:
+        return {
+            "type": "snapshot",
+            "symbol": symbol,
+            "timeframe": timeframe,
+            "epoch": state["epoch"],
+            "version": state["version"],
+            "data": state["data"]
+        }
+
+    @staticmethod
+    def _delta(symbol: str, timeframe: str, state: Dict, base_version: int,
+               ops: List[Dict]) -> Dict:
+        return {
+            "type": "delta",
+            "symbol": symbol,
+            "timeframe": timeframe,
+            "epoch": state["epoch"],
+            "version": state["version"],
+            "base_version": base_version,
+            "ops": ops
+        }
@@ -0,0 +1,439 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from urllib.parse import parse_qs, urlsplit
+
+from delta_encoding import AnalysisVersionTracker
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = "/api/stream"
+
+
+class StreamRequestError(ValueError):
+    """Query stream tidak valid (dijawab dengan `status`, default 400)"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+HTTP_REASONS = {400: "Bad Request", 403: "Forbidden"}
+
+
+class EventStreamServer:
+    """Server Server-Sent Events berbasis asyncio.
+
+    Semua koneksi dilayani oleh satu event loop di satu thread, jadi ribuan
+    client idle hanya memakan satu coroutine dan satu queue kecil per client,
+    bukan satu thread per client. Setiap event di-encode sekali lalu byte yang
+    sama dikirim ke semua subscriber topic tersebut.
+    """
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 5001,
+                 heartbeat_interval: float = 15.0, client_queue_size: int = 100,
+                 is_known_symbol: Optional[Callable[[str], bool]] = None,
+                 timeframes: Optional[Iterable[str]] = None, max_topics: int = 20,
+                 verify_alert_token: Optional[Callable[[str, str], bool]] = None):
+        self.host = host
+        self.port = port
+        self.heartbeat_interval = heartbeat_interval
+        self.client_queue_size = client_queue_size
+        # Symbol yang tidak dikenal exchange ditolak saat subscribe, supaya
+        # tidak ikut di fetch_tickers bersama milik client lain
+        self.is_known_symbol = is_known_symbol
+        self.timeframes = set(timeframes) if timeframes else None
+        self.max_topics = max_topics
+        # Topic alerts:<user_id> hanya dengan token milik user itu; tanpa
+        # verifier topic alert tidak bisa di-subscribe sama sekali
+        self.verify_alert_token = verify_alert_token
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.running = False
+
+        # topic -> queue milik client (hanya disentuh dari thread event loop)
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        # topic -> event terakhir, dikirim ulang ke client yang baru connect
+        self.retained_events: Dict[str, bytes] = {}
+
+        # Jumlah subscriber per topic, dibaca dari thread lain oleh poller
+        self._topic_counts: Dict[str, int] = defaultdict(int)
+        self._client_count = 0
+        self._counts_lock = threading.Lock()
+        self._event_ids = itertools.count(1)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def start(self):
+        """Jalankan server SSE di background thread"""
+        if self.running:
+            return
+
+        ready = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            try:
+                server = self.loop.run_until_complete(
+                    asyncio.start_server(self._handle_client, self.host,
+                                         self.port, backlog=1024))
+                self.running = True
+                logger.info(
+                    f"📡 Event stream listening on {self.host}:{self.port}{STREAM_PATH}")
+                ready.set()
+                self.loop.run_forever()
+                server.close()
+            except Exception as e:
+                logger.error(f"Event stream server error: {e}")
+            finally:
+                self.running = False
+                ready.set()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        ready.wait(timeout=5)
+
+    def stop(self):
+        """Hentikan event loop server"""
+        if self.loop and self.running:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    # ------------------------------------------------------------------
+    # Publishing (thread-safe)
+    # ------------------------------------------------------------------
+    def publish(self, topic: str, event_type: str, data, retain: bool = True):
+        """Kirim event ke semua subscriber topic; aman dipanggil dari thread mana pun"""
+        if not self.running or not self.loop:
+            return
+
+        payload = (f"id: {next(self._event_ids)}\n"
+                   f"event: {event_type}\n"
+                   f"data: {json.dumps(data, default=str)}\n\n").encode("utf-8")
+
+        self.loop.call_soon_threadsafe(self._fan_out, topic, payload, retain)
+
+    def retain(self, topic: str, event_type: str, data):
+        """Simpan state awal untuk client baru tanpa broadcast ke client lama"""
+        if not self.running or not self.loop:
+            return
+
+        payload = (f"event: {event_type}\n"
+                   f"data: {json.dumps(data, default=str)}\n\n").encode("utf-8")
+        self.loop.call_soon_threadsafe(self.retained_events.__setitem__, topic,
+                                       payload)
+
+    def _fan_out(self, topic: str, payload: bytes, retain: bool):
+        if retain:
+            self.retained_events[topic] = payload
+
+        for queue in list(self.subscribers.get(topic, ())):
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # Client terlalu lambat; putuskan supaya reconnect dengan state baru
+                self._evict(queue)
+
+    def _evict(self, queue: asyncio.Queue):
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    # ------------------------------------------------------------------
+    # Subscription info (dibaca oleh poller)
+    # ------------------------------------------------------------------
+    def active_topics(self, prefix: str = "") -> List[str]:
+        """Daftar topic yang sedang punya subscriber"""
+        with self._counts_lock:
+            return [
+                topic for topic, count in self._topic_counts.items()
+                if count > 0 and topic.startswith(prefix)
+            ]
+
+    def client_count(self) -> int:
+        """Jumlah koneksi SSE yang sedang aktif"""
+        with self._counts_lock:
+            return self._client_count
+
+    def _track(self, topics: List[str], delta: int):
+        with self._counts_lock:
+            self._client_count += delta
+            for topic in topics:
+                self._topic_counts[topic] += delta
+                if self._topic_counts[topic] <= 0:
+                    del self._topic_counts[topic]
+
+    # ------------------------------------------------------------------
+    # HTTP handling
+    # ------------------------------------------------------------------
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter):
+        topics: List[str] = []
+        queue: Optional[asyncio.Queue] = None
+
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=10)
+            while True:
+                header = await asyncio.wait_for(reader.readline(), timeout=10)
+                if header in (b"\r\n", b"\n", b""):
+                    break
+
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2:
+                return
+            method, target = parts[0], parts[1]
+
+            if method == "OPTIONS":
+                writer.write(b"HTTP/1.1 204 No Content\r\n"
+                             b"Access-Control-Allow-Origin: *\r\n"
+                             b"Access-Control-Allow-Headers: Last-Event-ID, Cache-Control\r\n"
+                             b"Content-Length: 0\r\n\r\n")
+                await writer.drain()
+                return
+
+            url = urlsplit(target)
+            if method != "GET" or url.path != STREAM_PATH:
+                writer.write(b"HTTP/1.1 404 Not Found\r\n"
+                             b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+                await writer.drain()
+                return
+
+            try:
+                # Validasi bisa memuat daftar market (blocking): jangan di event loop
+                topics = await asyncio.get_running_loop().run_in_executor(
+                    None, self.topics_from_query, parse_qs(url.query))
+            except StreamRequestError as e:
+                body = str(e).encode("utf-8")
+                writer.write(f"HTTP/1.1 {e.status} {HTTP_REASONS.get(e.status, 'Error')}\r\n"
+                             .encode() +
+                             b"Content-Type: text/plain; charset=utf-8\r\n"
+                             b"Access-Control-Allow-Origin: *\r\n"
+                             b"Connection: close\r\n"
+                             b"Content-Length: " + str(len(body)).encode() +
+                             b"\r\n\r\n" + body)
+                await writer.drain()
+                return
+
+            queue = asyncio.Queue(maxsize=self.client_queue_size)
+            for topic in topics:
+                self.subscribers[topic].add(queue)
+            self._track(topics, 1)
+
+            writer.write(b"HTTP/1.1 200 OK\r\n"
+                         b"Content-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-cache\r\n"
+                         b"Connection: keep-alive\r\n"
+                         b"X-Accel-Buffering: no\r\n"
+                         b"Access-Control-Allow-Origin: *\r\n\r\n"
+                         b"retry: 3000\n\n")
+
+            # State terakhir supaya client langsung punya data tanpa menunggu
+            for topic in topics:
+                if topic in self.retained_events:
+                    writer.write(self.retained_events[topic])
+            await writer.drain()
+
+            while True:
+                try:
+                    payload = await asyncio.wait_for(
+                        queue.get(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    payload = b": ping\n\n"
+
+                if payload is None:
+                    break
+                writer.write(payload)
+                await writer.drain()
+
+        except (ConnectionError, asyncio.TimeoutError,
+                asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.error(f"Event stream client error: {e}")
+        finally:
+            if queue is not None:
+                for topic in topics:
+                    self.subscribers[topic].discard(queue)
+                    if not self.subscribers[topic]:
+                        del self.subscribers[topic]
+                self._track(topics, -1)
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    def topics_from_query(self, query: Dict[str, List[str]]) -> List[str]:
+        """Terjemahkan query string menjadi daftar topic (StreamRequestError bila tidak valid)"""
+        topics = []
+        timeframe = query.get("timeframe", ["1d"])[0]
+        if self.timeframes is not None and timeframe not in self.timeframes:
+            raise StreamRequestError(f"Timeframe tidak valid: {timeframe}")
+        # mode=delta: snapshot sekali lalu JSON-patch, selain itu hasil penuh
+        analysis_prefix = ("analysis-delta" if query.get("mode", ["full"])[0]
+                           == "delta" else "analysis")
+
+        for raw in query.get("symbol", []) + query.get("symbols", []):
+            for symbol in raw.split(","):
+                symbol = symbol.strip().upper().replace("-", "/")
+                if not symbol:
+                    continue
+                if self.is_known_symbol and not self.is_known_symbol(symbol):
+                    raise StreamRequestError(f"Symbol tidak dikenal: {symbol}")
+                topics.append(f"ticker:{symbol}")
+                topics.append(f"{analysis_prefix}:{symbol}:{timeframe}")
+
+        token = query.get("token", [""])[0]
+        for user_id in query.get("user_id", []):
+            if not (self.verify_alert_token and self.verify_alert_token(user_id, token)):
+                raise StreamRequestError("Token alert tidak valid", status=403)
+            topics.append(f"alerts:{user_id}")
+
+        topics = list(dict.fromkeys(topics))
+        if len(topics) > self.max_topics:
+            raise StreamRequestError(f"Terlalu banyak topic (maks {self.max_topics})")
+        return topics
+
+
+class MarketStreamPoller:
+    """Satu loop upstream yang hasilnya di-fan-out ke semua client SSE.
+
+    Ticker untuk semua symbol yang sedang di-subscribe diambil dengan satu
+    panggilan fetch_tickers per siklus. Analisis dihitung ulang hanya ketika
+    candle baru close, satu kali per (symbol, timeframe), berapapun jumlah
+    client yang menonton. Subscriber mode delta menerima event dari
+    AnalysisVersionTracker, bukan hasil penuh.
+    """
+
+    def __init__(self, server: EventStreamServer, fetch_tickers: Callable,
+                 compute_analysis: Callable, last_closed_candle: Callable,
+                 versions: Optional[AnalysisVersionTracker] = None,
+                 interval: float = 5.0, analysis_workers: int = 2,
+                 fetch_ticker: Optional[Callable] = None):
+        self.server = server
+        self.versions = versions or AnalysisVersionTracker()
+        self.fetch_tickers = fetch_tickers
+        self.fetch_ticker = fetch_ticker
+        self.compute_analysis = compute_analysis
+        self.last_closed_candle = last_closed_candle
+        self.interval = interval
+
+        self.executor = ThreadPoolExecutor(max_workers=analysis_workers)
+        self.last_tickers: Dict[str, tuple] = {}
+        self.last_closed: Dict[str, datetime] = {}
+        self.in_flight: Set[str] = set()
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Jalankan poller di background thread"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                self.poll_tickers()
+                self.poll_analysis()
+            except Exception as e:
+                logger.error(f"Error in market stream poller: {e}")
+            time.sleep(self.interval)
+
+    def poll_tickers(self):
+        """Ambil semua ticker yang dibutuhkan dengan satu request upstream"""
+        topics = self.server.active_topics("ticker:")
+        if not topics:
+            return
+
+        symbols = [topic.split(":", 1)[1] for topic in topics]
+        try:
+            tickers = self.fetch_tickers(symbols)
+        except Exception as e:
+            # Satu symbol bermasalah (mis. BadSymbol) tidak boleh menghentikan
+            # update symbol lain: ulangi per symbol seperti check_alerts
+            logger.warning(f"fetch_tickers failed, falling back to per-symbol fetch: {e}")
+            tickers = {}
+            for symbol in symbols:
+                try:
+                    if self.fetch_ticker:
+                        tickers[symbol] = self.fetch_ticker(symbol)
+                    else:
+                        tickers.update(self.fetch_tickers([symbol]))
+                except Exception as e:
+                    logger.error(f"Error fetching ticker {symbol}: {e}")
+
+        for symbol in symbols:
+            ticker = tickers.get(symbol)
+            if not ticker:
+                continue
+
+            fingerprint = (ticker.get('last'), ticker.get('quoteVolume'),
+                           ticker.get('bid'), ticker.get('ask'))
+            if self.last_tickers.get(symbol) == fingerprint:
+                continue
+            self.last_tickers[symbol] = fingerprint
+
+            self.server.publish(f"ticker:{symbol}", "ticker", {
+                "symbol": symbol,
+                "price": ticker.get('last', 0),
+                "change_24h": ticker.get('percentage', 0),
+                "volume_24h": ticker.get('quoteVolume', 0),
+                "bid": ticker.get('bid'),
+                "ask": ticker.get('ask'),
+                "timestamp": datetime.now().isoformat()
+            })
+
+    def poll_analysis(self):
+        """Jadwalkan analisis ulang untuk setiap candle yang baru close"""
+        keys = set()
+        for topic in (self.server.active_topics("analysis:") +
+                      self.server.active_topics("analysis-delta:")):
+            _, symbol, timeframe = topic.split(":", 2)
+            keys.add(f"{symbol}:{timeframe}")
+
+        for key in keys:
+            symbol, timeframe = key.rsplit(":", 1)
+
+            try:
+                closed = self.last_closed_candle(timeframe)
+            except KeyError:
+                continue
+
+            with self.lock:
+                if self.last_closed.get(key) == closed or key in self.in_flight:
+                    continue
+                self.in_flight.add(key)
+
+            self.executor.submit(self._refresh_analysis, key, symbol,
+                                 timeframe, closed)
+
+    def _refresh_analysis(self, key, symbol, timeframe, closed):
+        try:
+            result, status_code = self.compute_analysis(symbol, timeframe)
+            if status_code == 200:
+                # Satu perhitungan untuk subscriber mode penuh dan mode delta
+                self.server.publish(f"analysis:{key}", "analysis", result)
+
+                event = self.versions.update(symbol, timeframe, result)
+                if event:
+                    delta_topic = f"analysis-delta:{key}"
+                    self.server.publish(delta_topic, "analysis_" + event["type"],
+                                        event, retain=False)
+                    self.server.retain(delta_topic, "analysis_snapshot",
+                                       self.versions.snapshot(symbol, timeframe))
+
+                with self.lock:
+                    self.last_closed[key] = closed
+        except Exception as e:
+            logger.error(f"Error refreshing analysis {key}: {e}")
+        finally:
+            with self.lock:
+                self.in_flight.discard(key)
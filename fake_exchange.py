@@ -0,0 +1,297 @@
+import asyncio
+import json
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from lazy_imports import LazyModule
+from notification_queue import TokenBucket
+
+ccxt = LazyModule('ccxt')
+
+# Durasi candle per timeframe ccxt (detik)
+TIMEFRAME_SECONDS = {
+    '1m': 60, '3m': 180, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '2h': 7200, '4h': 14400, '6h': 21600, '8h': 28800,
+    '12h': 43200, '1d': 86400, '3d': 259200, '1w': 604800
+}
+
+# Periode gelombang harga ticker (dalam langkah)
+WAVE_PERIODS = (30, 240, 1800, 14400)
+
+DEFAULT_SYMBOLS = ['BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'SOL/USDT', 'XRP/USDT',
+                   'ADA/USDT', 'DOGE/USDT', 'AVAX/USDT', 'DOT/USDT', 'LINK/USDT']
+
+
+# Nama exception mengikuti hierarki ccxt (NetworkError > RateLimitExceeded)
+class NetworkError(Exception):
+    pass
+
+
+class RateLimitExceeded(NetworkError):
+    pass
+
+
+class BadSymbol(Exception):
+    pass
+
+
+def symbol_seed(seed: int, symbol: str, salt: str = '') -> int:
+    return zlib.crc32(f"{seed}:{symbol}:{salt}".encode())
+
+
+class FakeExchange:
+    """Exchange lokal yang kompatibel dengan subset API ccxt yang dipakai app.
+
+    Tanpa jaringan sama sekali: harga ticker deterministik per symbol dari
+    `seed` (lihat price_at), atau tick dari file JSONL `replay_file` (format sama
+    dengan ReplayPriceFeed). OHLCV dan order book dibangkitkan deterministik
+    dari seed. `latency`, `error_rate` dan `rate_limit` (request/detik)
+    mensimulasikan exchange sungguhan. Harga maju satu langkah setiap
+    `tick_interval` detik, atau manual lewat `advance()` bila `tick_interval`
+    None (dipakai load generator).
+    """
+
+    id = 'fake'
+
+    def __init__(self, seed: int = 42, symbols: Optional[List[str]] = None,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: Optional[float] = None, tick_interval: Optional[float] = 1.0,
+                 volatility: float = 0.002, replay_file: Optional[str] = None):
+        self.seed = seed
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(rate_limit, rate_limit) if rate_limit else None
+        self.tick_interval = tick_interval
+        self.volatility = volatility
+        self.step = 0
+        self.requests = 0
+        self.errors = random.Random(seed)
+        self.lock = threading.Lock()
+
+        self.replay: Dict[str, List[Dict]] = {}
+        if replay_file:
+            self.load_replay(replay_file)
+
+        self.markets = {}
+        for symbol in symbols or DEFAULT_SYMBOLS:
+            self.add_market(symbol)
+        for symbol in self.replay:
+            self.add_market(symbol)
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self.markets)
+
+    def add_market(self, symbol: str):
+        base, _, quote = symbol.partition('/')
+        self.markets[symbol] = {'id': symbol.replace('/', ''), 'symbol': symbol,
+                                'base': base, 'quote': quote, 'active': True}
+
+    def load_markets(self, reload: bool = False) -> Dict:
+        self._request()
+        return self.markets
+
+    def load_replay(self, path: str):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    tick = json.loads(line)
+                    self.replay.setdefault(tick['symbol'], []).append(tick)
+
+    # --- Simulasi kondisi jaringan -------------------------------------
+
+    def _request(self):
+        """Latency, rate limit dan error acak untuk satu panggilan API"""
+        with self.lock:
+            self.requests += 1
+            if self.bucket and not self.bucket.try_take():
+                raise RateLimitExceeded(f"{self.id} rate limit exceeded")
+            failed = self.error_rate and self.errors.random() < self.error_rate
+            delay = self.latency + (self.errors.uniform(0, self.jitter) if self.jitter else 0)
+
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            raise NetworkError(f"{self.id} simulated network error")
+
+    def _check_symbol(self, symbol: str):
+        # Pair USDT apa pun dianggap ada, jadi alert symbol acak tetap bisa diuji
+        if symbol not in self.markets:
+            if not symbol.endswith('/USDT'):
+                raise BadSymbol(f"{self.id} does not have market symbol {symbol}")
+            self.add_market(symbol)
+
+    # --- Jalur harga ---------------------------------------------------
+
+    def advance(self, steps: int = 1):
+        """Majukan jam harga (mode manual)"""
+        self.step += steps
+
+    def current_step(self) -> int:
+        # Jam absolut supaya semua instance sepakat harga saat ini
+        if self.tick_interval:
+            return int(time.time() / self.tick_interval)
+        return self.step
+
+    def base_price(self, symbol: str) -> float:
+        return 10 ** random.Random(symbol_seed(self.seed, symbol)).uniform(-1, 4.5)
+
+    def price_at(self, symbol: str, step: int) -> float:
+        """Harga deterministik symbol pada langkah `step`.
+
+        Tanpa state: jumlah beberapa gelombang (periode pendek s/d panjang,
+        amplitudo ~ volatility * sqrt(periode) seperti random walk) dengan
+        fase acak per symbol, ditambah noise per langkah. Semua instance dan
+        proses melihat harga yang sama pada langkah yang sama.
+        """
+        rng = random.Random(symbol_seed(self.seed, symbol))
+        log_price = math.log(self.base_price(symbol))
+        for period in WAVE_PERIODS:
+            phase = rng.uniform(0, 2 * math.pi)
+            log_price += self.volatility * math.sqrt(period) * math.sin(step / period + phase)
+
+        noise = random.Random(symbol_seed(self.seed, symbol, str(step)))
+        return math.exp(log_price + noise.gauss(0, self.volatility))
+
+    def replay_tick(self, symbol: str, step: int) -> Optional[Dict]:
+        ticks = self.replay.get(symbol)
+        return ticks[step % len(ticks)] if ticks else None
+
+    def _ticker(self, symbol: str) -> Dict:
+        self._check_symbol(symbol)
+        step = self.current_step()
+        now = int(time.time() * 1000)
+
+        tick = self.replay_tick(symbol, step)
+        if tick is not None:
+            last = tick['last']
+            quote_volume = tick.get('quoteVolume')
+            open_price = self.replay_tick(symbol, max(0, step - 1440))['last']
+        else:
+            last = self.price_at(symbol, step)
+            open_price = self.price_at(symbol, max(0, step - 1440))
+            volume_rng = random.Random(symbol_seed(self.seed, symbol, f"v{step}"))
+            quote_volume = 1e6 * math.exp(volume_rng.gauss(0, 0.5))
+
+        spread = last * 0.0002
+        return {
+            'symbol': symbol,
+            'timestamp': now,
+            'datetime': datetime.fromtimestamp(now / 1000, tz=timezone.utc).isoformat(),
+            'last': last,
+            'close': last,
+            'open': open_price,
+            'high': max(last, open_price) * 1.01,
+            'low': min(last, open_price) * 0.99,
+            'bid': last - spread,
+            'ask': last + spread,
+            'baseVolume': quote_volume / last if quote_volume and last else None,
+            'quoteVolume': quote_volume,
+            'change': last - open_price,
+            'percentage': (last - open_price) / open_price * 100 if open_price else None,
+        }
+
+    # --- API ccxt ------------------------------------------------------
+
+    def fetch_ticker(self, symbol: str) -> Dict:
+        self._request()
+        return self._ticker(symbol)
+
+    def fetch_tickers(self, symbols: Optional[List[str]] = None) -> Dict[str, Dict]:
+        self._request()
+        return {symbol: self._ticker(symbol) for symbol in (symbols or self.symbols)}
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', since: Optional[int] = None,
+                    limit: Optional[int] = None, params: Optional[Dict] = None) -> List[List[float]]:
+        """Candle deterministik per (symbol, timeframe), termasuk candle yang sedang berjalan"""
+        self._request()
+        self._check_symbol(symbol)
+        if timeframe not in TIMEFRAME_SECONDS:
+            raise ValueError(f"Invalid timeframe: {timeframe}")
+
+        period = TIMEFRAME_SECONDS[timeframe] * 1000
+        current = int(time.time() * 1000) // period * period
+        limit = limit or 500
+        start = since // period * period if since is not None else current - (limit - 1) * period
+        timestamps = range(max(start, 0), current + 1, period)
+        return [self.candle(symbol, timeframe, ts) for ts in list(timestamps)[:limit]]
+
+    def candle(self, symbol: str, timeframe: str, ts: int) -> List[float]:
+        """Satu candle: close mengikuti random walk pada grid timeframe"""
+        period = TIMEFRAME_SECONDS[timeframe]
+        index = ts // 1000 // period
+        rng = random.Random(symbol_seed(self.seed, symbol, f"{timeframe}:{index}"))
+        # Close dari gelombang + noise pada indeks candle absolut (tanpa state),
+        # cukup bergelombang supaya indikator (RSI/MACD) punya crossing
+        scale = self.volatility * math.sqrt(period / 60)
+        trend = math.sin(index / 17) * 10 * scale + math.sin(index / 53) * 25 * scale
+        close = self.base_price(symbol) * math.exp(trend + rng.gauss(0, scale))
+        open_price = close * math.exp(rng.gauss(0, scale))
+        high = max(open_price, close) * (1 + abs(rng.gauss(0, scale / 2)))
+        low = min(open_price, close) * (1 - abs(rng.gauss(0, scale / 2)))
+        volume = 1e3 * math.exp(rng.gauss(0, 0.5))
+        return [ts, open_price, high, low, close, volume]
+
+    def fetch_order_book(self, symbol: str, limit: Optional[int] = None,
+                         params: Optional[Dict] = None) -> Dict:
+        self._request()
+        ticker = self._ticker(symbol)
+        depth = limit or 20
+        rng = random.Random(symbol_seed(self.seed, symbol, f"book{self.current_step()}"))
+        tick = ticker['last'] * 0.0001
+        bids = [[ticker['bid'] - level * tick, round(rng.uniform(0.1, 5), 4)]
+                for level in range(depth)]
+        asks = [[ticker['ask'] + level * tick, round(rng.uniform(0.1, 5), 4)]
+                for level in range(depth)]
+        return {'symbol': symbol, 'bids': bids, 'asks': asks,
+                'timestamp': ticker['timestamp'], 'datetime': ticker['datetime'],
+                'nonce': None}
+
+    # --- API ccxt.pro (dipakai StreamPriceFeed) ------------------------
+
+    async def watch_tickers(self, symbols: Optional[List[str]] = None) -> Dict[str, Dict]:
+        await asyncio.sleep(self.tick_interval or 1.0)
+        return self.fetch_tickers(symbols)
+
+    async def close(self):
+        return None
+
+
+def fake_exchange_from_env() -> FakeExchange:
+    """FakeExchange dengan konfigurasi dari env FAKE_EXCHANGE_*"""
+    rate_limit = os.getenv('FAKE_EXCHANGE_RATE_LIMIT')
+    return FakeExchange(
+        seed=int(os.getenv('FAKE_EXCHANGE_SEED', '42')),
+        latency=float(os.getenv('FAKE_EXCHANGE_LATENCY', '0')),
+        jitter=float(os.getenv('FAKE_EXCHANGE_JITTER', '0')),
+        error_rate=float(os.getenv('FAKE_EXCHANGE_ERROR_RATE', '0')),
+        rate_limit=float(rate_limit) if rate_limit else None,
+        tick_interval=float(os.getenv('FAKE_EXCHANGE_TICK_INTERVAL', '1')),
+        replay_file=os.getenv('FAKE_EXCHANGE_REPLAY_FILE') or None)
+
+
+_fake_exchange = None
+_fake_exchange_lock = threading.Lock()
+
+
+def create_exchange(exchange_id: str = 'binance'):
+    """Instance exchange sesuai EXCHANGE_MODE: live (default, ccxt) atau fake (offline).
+
+    Mode fake memakai satu instance per proses supaya rate limit simulasi
+    berlaku untuk semua pemanggil.
+    """
+    global _fake_exchange
+    if os.getenv('EXCHANGE_MODE', 'live').lower() != 'fake':
+        return getattr(ccxt, exchange_id)()
+
+    with _fake_exchange_lock:
+        if _fake_exchange is None:
+            _fake_exchange = fake_exchange_from_env()
+        return _fake_exchange
@@ -0,0 +1,257 @@
+"""Server Bot API Telegram lokal untuk test bot tanpa jaringan.
+
+Mengimplementasikan subset method yang dipakai bot (getMe, setWebhook,
+deleteWebhook, getUpdates, sendMessage, editMessageText,
+answerCallbackQuery, ...). Semua panggilan dicatat di `calls`. Update dari
+"user" dimasukkan lewat push_update(): dikirim ke webhook yang terdaftar
+(dengan header secret token, seperti Telegram) atau diantrikan untuk
+getUpdates bila bot memakai long polling.
+
+Contoh:
+    python fake_telegram.py --port 8081
+    TELEGRAM_API_BASE_URL=http://127.0.0.1:8081/bot python app.py
+"""
+import argparse
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Parameter teks yang tidak boleh di-decode sebagai JSON (mis. text "42")
+STRING_PARAMS = {'text', 'caption', 'url', 'secret_token', 'parse_mode',
+                 'callback_query_id', 'data'}
+
+BOT_USER = {'id': 1000000001, 'is_bot': True, 'first_name': 'Fake Bot',
+            'username': 'fake_bot'}
+
+
+def parse_params(body: bytes, content_type: str) -> Dict:
+    """Parameter method Bot API dari body JSON atau form (format request PTB)"""
+    if not body:
+        return {}
+    if content_type.startswith('application/json'):
+        return json.loads(body)
+
+    params = {}
+    for key, value in parse_qsl(body.decode(), keep_blank_values=True):
+        if key not in STRING_PARAMS:
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        params[key] = value
+    return params
+
+
+class FakeTelegramServer:
+    """Stand-in Bot API di thread sendiri (`start()` mengembalikan base URL)"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.calls: List[Dict] = []
+        self.webhook: Optional[Dict] = None
+        self.pending_updates = deque()
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.condition = threading.Condition()
+        self.server = None
+
+    @property
+    def base_url(self) -> str:
+        """Nilai untuk TELEGRAM_API_BASE_URL (token ditambahkan oleh client)"""
+        return f"http://{self.host}:{self.port}/bot"
+
+    def start(self) -> str:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                self.handle_method()
+
+            def do_GET(self):
+                self.handle_method()
+
+            def handle_method(self):
+                # Path: /bot<token>/<method>
+                method = self.path.split('?')[0].rstrip('/').rsplit('/', 1)[-1]
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                params = parse_params(body, self.headers.get('Content-Type', ''))
+                status, payload = server.call(method, params)
+
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        with self.condition:
+            self.condition.notify_all()
+
+    def call(self, method: str, params: Dict) -> tuple:
+        """Jalankan satu method Bot API; return (HTTP status, body)"""
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self.condition:
+            self.calls.append({'method': method, 'params': params, 'at': time.time()})
+            self.condition.notify_all()
+
+        handler = getattr(self, f"api_{method}", None)
+        if handler is None:
+            return 200, {'ok': True, 'result': True}
+        return 200, {'ok': True, 'result': handler(params)}
+
+    def api_getMe(self, params):
+        return BOT_USER
+
+    def api_setWebhook(self, params):
+        self.webhook = {'url': params['url'], 'secret_token': params.get('secret_token')}
+        return True
+
+    def api_deleteWebhook(self, params):
+        self.webhook = None
+        if params.get('drop_pending_updates'):
+            self.pending_updates.clear()
+        return True
+
+    def api_getWebhookInfo(self, params):
+        return {'url': self.webhook['url'] if self.webhook else '',
+                'has_custom_certificate': False,
+                'pending_update_count': len(self.pending_updates)}
+
+    def api_getUpdates(self, params):
+        """Long polling: tunggu update sampai `timeout` detik"""
+        offset = params.get('offset') or 0
+        deadline = time.time() + float(params.get('timeout') or 0)
+        with self.condition:
+            while True:
+                while self.pending_updates and self.pending_updates[0]['update_id'] < offset:
+                    self.pending_updates.popleft()
+                if self.pending_updates or time.time() >= deadline or self.server is None:
+                    return list(itertools.islice(self.pending_updates, params.get('limit') or 100))
+                self.condition.wait(min(1.0, deadline - time.time()))
+
+    def message(self, params: Dict) -> Dict:
+        return {
+            'message_id': params.get('message_id') or next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(params['chat_id']), 'type': 'private'},
+            'from': BOT_USER,
+            'text': params.get('text', '')
+        }
+
+    def api_sendMessage(self, params):
+        return self.message(params)
+
+    def api_editMessageText(self, params):
+        return self.message(params)
+
+    def api_answerCallbackQuery(self, params):
+        return True
+
+    def make_update(self, chat_id: int, text: str, user_id: Optional[int] = None) -> Dict:
+        """Update pesan teks dari user (command diberi entity bot_command)"""
+        message = {
+            'message_id': next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': user_id or chat_id, 'is_bot': False, 'first_name': 'Tester'},
+            'text': text
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0,
+                                    'length': len(text.split()[0])}]
+        return {'update_id': next(self.update_ids), 'message': message}
+
+    def make_callback_update(self, chat_id: int, data: str,
+                             user_id: Optional[int] = None) -> Dict:
+        """Update tombol inline (callback query) pada pesan bot"""
+        user = {'id': user_id or chat_id, 'is_bot': False, 'first_name': 'Tester'}
+        return {
+            'update_id': next(self.update_ids),
+            'callback_query': {
+                'id': str(next(self.update_ids)),
+                'from': user,
+                'chat_instance': str(chat_id),
+                'data': data,
+                'message': {'message_id': next(self.message_ids), 'date': int(time.time()),
+                            'chat': {'id': chat_id, 'type': 'private'},
+                            'from': BOT_USER, 'text': '...'}
+            }
+        }
+
+    def push_update(self, update: Dict, timeout: float = 10) -> Optional[int]:
+        """Kirim update ke bot; return status HTTP webhook (None = diantrikan untuk getUpdates)"""
+        if self.webhook:
+            headers = {}
+            if self.webhook['secret_token']:
+                headers['X-Telegram-Bot-Api-Secret-Token'] = self.webhook['secret_token']
+            return requests.post(self.webhook['url'], json=update, headers=headers,
+                                 timeout=timeout).status_code
+
+        with self.condition:
+            self.pending_updates.append(update)
+            self.condition.notify_all()
+        return None
+
+    def wait_for(self, method: str, count: int = 1, timeout: float = 10,
+                 chat_id: Optional[int] = None) -> List[Dict]:
+        """Tunggu sampai bot memanggil `method` minimal `count` kali"""
+        deadline = time.time() + timeout
+        with self.condition:
+            while True:
+                calls = [call for call in self.calls if call['method'] == method and (
+                    chat_id is None or str(call['params'].get('chat_id')) == str(chat_id))]
+                if len(calls) >= count or time.time() >= deadline:
+                    return calls
+                self.condition.wait(max(0.0, deadline - time.time()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Delay per panggilan API (detik)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = FakeTelegramServer(args.host, args.port, latency=args.latency)
+    print(f"TELEGRAM_API_BASE_URL={server.start()}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
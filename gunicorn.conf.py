@@ -0,0 +1,30 @@
+# Konfigurasi gunicorn untuk mode production (python app.py --production)
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Worker thread-based: I/O ke exchange mendominasi, jadi beberapa thread per
+# worker tetap efektif walau ada GIL
+workers = int(os.getenv('WEB_CONCURRENCY',
+                        min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', '4'))
+
+# Analisis lengkap bisa memakan waktu beberapa detik (banyak request upstream)
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info')
+
+
+def post_worker_init(worker):
+    """Setiap worker ikut pemilihan leader; hanya pemenang yang menjalankan
+    alert monitor, bot Telegram dan event stream"""
+    from app import leader_election, start_warm_up
+
+    start_warm_up()
+    leader_election.start()
@@ -0,0 +1,409 @@
+import json
+import logging
+import math
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from alert_index import (ALERT_TYPE, ARMED, CONDITION_TYPE, CREATED_AT, RECURRING,
+                         SYMBOL, TARGET_PRICE, TIMEFRAME, TRIGGERED_AT)
+
+logger = logging.getLogger(__name__)
+
+# Kondisi alert INDICATOR; True = butuh level (disimpan di target_price)
+INDICATOR_CONDITIONS = {
+    'RSI_CROSS_ABOVE': True,
+    'RSI_CROSS_BELOW': True,
+    'MACD_BULLISH_CROSSOVER': False,
+    'MACD_BEARISH_CROSSOVER': False,
+    'BB_BREAKOUT_UPPER': False,
+    'BB_BREAKOUT_LOWER': False,
+    'ICHIMOKU_ABOVE_CLOUD': False,
+    'ICHIMOKU_BELOW_CLOUD': False,
+}
+
+INDICATOR_TIMEFRAMES = ('15m', '1h', '4h', '1d', '1w')
+TIMEFRAME_SECONDS = {'15m': 900, '1h': 3600, '4h': 14400, '1d': 86400, '1w': 604800}
+
+# Candle yang diambil untuk membangun state dari nol
+SEED_CANDLES = 300
+
+
+class IncrementalIndicators:
+    """State indikator per (symbol, timeframe) yang diperbarui satu candle sekali.
+
+    RSI(14) Wilder, MACD(12,26,9), Bollinger Bands(20,2) dan cloud Ichimoku
+    (9,26,52) plus rasio volume terhadap rata-rata 20 candle dihitung secara
+    incremental dari candle close, jadi berapa pun
+    jumlah alert di symbol itu biayanya tetap satu update per bar. State
+    bisa diserialisasi ke JSON untuk disimpan di database alert.
+    """
+
+    RSI_LENGTH = 14
+    MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+    BB_LENGTH, BB_STD = 20, 2
+    TENKAN, KIJUN, SENKOU = 9, 26, 52
+    VOLUME_LENGTH = 20
+
+    def __init__(self, state: Optional[Dict] = None):
+        state = state or {}
+        self.last_ts = state.get('last_ts')
+        self.bars = state.get('bars', 0)
+        self.prev_close = state.get('prev_close')
+        self.gain_sum = state.get('gain_sum', 0.0)
+        self.loss_sum = state.get('loss_sum', 0.0)
+        self.avg_gain = state.get('avg_gain')
+        self.avg_loss = state.get('avg_loss')
+        self.ema_fast = state.get('ema_fast')
+        self.ema_slow = state.get('ema_slow')
+        self.macd_signal = state.get('macd_signal')
+        self.closes = deque(state.get('closes', []), maxlen=self.BB_LENGTH)
+        self.volumes = deque(state.get('volumes', []), maxlen=self.VOLUME_LENGTH)
+        self.highs = deque(state.get('highs', []), maxlen=self.SENKOU)
+        self.lows = deque(state.get('lows', []), maxlen=self.SENKOU)
+        self.spans = deque(state.get('spans', []), maxlen=self.KIJUN)
+        self.snapshot = state.get('snapshot')
+
+    def to_dict(self) -> Dict:
+        return {
+            'last_ts': self.last_ts,
+            'bars': self.bars,
+            'prev_close': self.prev_close,
+            'gain_sum': self.gain_sum,
+            'loss_sum': self.loss_sum,
+            'avg_gain': self.avg_gain,
+            'avg_loss': self.avg_loss,
+            'ema_fast': self.ema_fast,
+            'ema_slow': self.ema_slow,
+            'macd_signal': self.macd_signal,
+            'closes': list(self.closes),
+            'volumes': list(self.volumes),
+            'highs': list(self.highs),
+            'lows': list(self.lows),
+            'spans': [list(span) for span in self.spans],
+            'snapshot': self.snapshot
+        }
+
+    @staticmethod
+    def _ema(previous: Optional[float], value: float, length: int) -> float:
+        if previous is None:
+            return value
+        return previous + 2 / (length + 1) * (value - previous)
+
+    def _update_rsi(self, close: float) -> Optional[float]:
+        if self.prev_close is not None:
+            change = close - self.prev_close
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            n = self.RSI_LENGTH
+
+            if self.avg_gain is None:
+                self.gain_sum += gain
+                self.loss_sum += loss
+                if self.bars > n:
+                    self.avg_gain, self.avg_loss = self.gain_sum / n, self.loss_sum / n
+            else:
+                self.avg_gain = (self.avg_gain * (n - 1) + gain) / n
+                self.avg_loss = (self.avg_loss * (n - 1) + loss) / n
+        self.prev_close = close
+
+        if self.avg_gain is None:
+            return None
+        if self.avg_loss == 0:
+            return 100.0
+        return 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+
+    def update(self, candle: List[float]) -> Dict:
+        """Proses satu candle closed [ts, open, high, low, close, volume]"""
+        ts, _, high, low, close, volume = candle[:6]
+        self.bars += 1
+        self.last_ts = ts
+
+        rsi = self._update_rsi(close)
+
+        self.ema_fast = self._ema(self.ema_fast, close, self.MACD_FAST)
+        self.ema_slow = self._ema(self.ema_slow, close, self.MACD_SLOW)
+        macd = self.ema_fast - self.ema_slow
+        self.macd_signal = self._ema(self.macd_signal, macd, self.MACD_SIGNAL)
+        macd_ready = self.bars >= self.MACD_SLOW + self.MACD_SIGNAL
+
+        self.closes.append(close)
+        bb_upper = bb_lower = None
+        if len(self.closes) == self.BB_LENGTH:
+            mean = sum(self.closes) / self.BB_LENGTH
+            std = math.sqrt(sum((c - mean) ** 2 for c in self.closes) / self.BB_LENGTH)
+            bb_upper, bb_lower = mean + self.BB_STD * std, mean - self.BB_STD * std
+
+        # Volume candle ini dibanding rata-rata candle sebelumnya
+        volume_ratio = None
+        if len(self.volumes) == self.VOLUME_LENGTH:
+            average = sum(self.volumes) / self.VOLUME_LENGTH
+            volume_ratio = volume / average if average > 0 else None
+        self.volumes.append(volume)
+
+        # Cloud di bar ini = span yang dihitung KIJUN bar sebelumnya
+        cloud = self.spans[0] if len(self.spans) == self.KIJUN else None
+
+        self.highs.append(high)
+        self.lows.append(low)
+        if len(self.highs) == self.SENKOU:
+            highs, lows = list(self.highs), list(self.lows)
+            tenkan = (max(highs[-self.TENKAN:]) + min(lows[-self.TENKAN:])) / 2
+            kijun = (max(highs[-self.KIJUN:]) + min(lows[-self.KIJUN:])) / 2
+            self.spans.append(((tenkan + kijun) / 2, (max(highs) + min(lows)) / 2))
+
+        self.snapshot = {
+            'ts': ts,
+            'close': close,
+            'rsi': rsi,
+            'macd': macd if macd_ready else None,
+            'macd_signal': self.macd_signal if macd_ready else None,
+            'bb_upper': bb_upper,
+            'bb_lower': bb_lower,
+            'cloud_top': max(cloud) if cloud else None,
+            'cloud_bottom': min(cloud) if cloud else None,
+            'volume_ratio': volume_ratio
+        }
+        return self.snapshot
+
+
+def _crossed_above(prev_value, prev_level, value, level) -> bool:
+    if None in (prev_value, prev_level, value, level):
+        return False
+    return prev_value <= prev_level and value > level
+
+
+def _crossed_below(prev_value, prev_level, value, level) -> bool:
+    if None in (prev_value, prev_level, value, level):
+        return False
+    return prev_value >= prev_level and value < level
+
+
+def condition_met(condition: str, level: Optional[float], prev: Dict,
+                  cur: Dict) -> bool:
+    """Evaluasi kondisi indikator antara dua snapshot candle berurutan"""
+    if condition == 'RSI_CROSS_ABOVE':
+        return _crossed_above(prev['rsi'], level, cur['rsi'], level)
+    if condition == 'RSI_CROSS_BELOW':
+        return _crossed_below(prev['rsi'], level, cur['rsi'], level)
+    # Sama seperti check_macd_crossover
+    if condition == 'MACD_BULLISH_CROSSOVER':
+        return _crossed_above(prev['macd'], prev['macd_signal'], cur['macd'],
+                              cur['macd_signal'])
+    if condition == 'MACD_BEARISH_CROSSOVER':
+        return _crossed_below(prev['macd'], prev['macd_signal'], cur['macd'],
+                              cur['macd_signal'])
+    if condition == 'BB_BREAKOUT_UPPER':
+        return _crossed_above(prev['close'], prev['bb_upper'], cur['close'],
+                              cur['bb_upper'])
+    if condition == 'BB_BREAKOUT_LOWER':
+        return _crossed_below(prev['close'], prev['bb_lower'], cur['close'],
+                              cur['bb_lower'])
+    if condition == 'ICHIMOKU_ABOVE_CLOUD':
+        return _crossed_above(prev['close'], prev['cloud_top'], cur['close'],
+                              cur['cloud_top'])
+    if condition == 'ICHIMOKU_BELOW_CLOUD':
+        return _crossed_below(prev['close'], prev['cloud_bottom'], cur['close'],
+                              cur['cloud_bottom'])
+    return False
+
+
+def format_trigger_message(symbol: str, timeframe: str, condition: str,
+                           level: Optional[float], snapshot: Dict) -> str:
+    close = snapshot['close']
+    if condition.startswith('RSI'):
+        direction = "naik di atas" if condition.endswith('ABOVE') else "turun di bawah"
+        return f"📊 {symbol} ({timeframe}) RSI {direction} {level:g}: RSI {snapshot['rsi']:.2f}"
+    if condition == 'MACD_BULLISH_CROSSOVER':
+        return f"🟢 {symbol} ({timeframe}) MACD Bullish Crossover - Sinyal Beli Potensial"
+    if condition == 'MACD_BEARISH_CROSSOVER':
+        return f"🔴 {symbol} ({timeframe}) MACD Bearish Crossover - Sinyal Jual Potensial"
+    if condition == 'BB_BREAKOUT_UPPER':
+        return f"🚀 {symbol} ({timeframe}) breakout di atas Bollinger atas: ${close:,.4f}"
+    if condition == 'BB_BREAKOUT_LOWER':
+        return f"📉 {symbol} ({timeframe}) breakdown di bawah Bollinger bawah: ${close:,.4f}"
+    if condition == 'ICHIMOKU_ABOVE_CLOUD':
+        return f"☁️ {symbol} ({timeframe}) harga menembus di atas cloud Ichimoku: ${close:,.4f}"
+    return f"☁️ {symbol} ({timeframe}) harga jatuh di bawah cloud Ichimoku: ${close:,.4f}"
+
+
+def watch_start(alert: tuple) -> float:
+    """Epoch (ms) sejak alert mulai dipantau.
+
+    created_at diisi CURRENT_TIMESTAMP SQLite (UTC). Alert berulang yang
+    sudah pernah terpicu dipantau lagi setelah triggered_at terakhir
+    (isoformat waktu lokal), karena re-arm selalu terjadi sesudahnya.
+    """
+    start = 0.0
+    if alert[CREATED_AT]:
+        try:
+            created = datetime.fromisoformat(str(alert[CREATED_AT]))
+            if created.tzinfo is None:
+                created = created.replace(tzinfo=timezone.utc)
+            start = created.timestamp() * 1000
+        except ValueError:
+            pass
+    if alert[RECURRING] and alert[TRIGGERED_AT]:
+        try:
+            start = max(start, datetime.fromisoformat(str(alert[TRIGGERED_AT])).timestamp() * 1000)
+        except ValueError:
+            pass
+    return start
+
+
+class IndicatorAlertEvaluator:
+    """Evaluasi alert INDICATOR dari state bersama per (symbol, timeframe).
+
+    State juga dijaga untuk alert EXPRESSION yang memakai feature indikator;
+    ekspresi itu sendiri dievaluasi per tick oleh alert system.
+
+    Setiap siklus hanya (symbol, timeframe) yang punya alert aktif dan punya
+    candle closed baru yang diproses: candle baru diambil sekali, state
+    indikator di-update incremental lalu disimpan ke tabel indicator_state.
+    Alert dikelompokkan per (kondisi, level), jadi ribuan alert RSI yang
+    sama di BTC cukup satu evaluasi kondisi per bar.
+
+    Bila state tertinggal beberapa candle (mis. state lama dari alert yang
+    sudah dihapus), crossing dari candle yang close sebelum alert mulai
+    dipantau (lihat watch_start) tidak memicu alert itu.
+    """
+
+    def __init__(self, alert_system, fetch_ohlcv: Callable[..., List[List[float]]],
+                 last_closed_candle: Callable[[str], datetime]):
+        self.alert_system = alert_system
+        self.fetch_ohlcv = fetch_ohlcv
+        self.last_closed_candle = last_closed_candle
+
+    def load_state(self, symbol: str, timeframe: str) -> IncrementalIndicators:
+        row = self.alert_system.db.execute('''
+            SELECT state FROM indicator_state WHERE symbol = ? AND timeframe = ?
+        ''', (symbol, timeframe)).fetchone()
+        return IncrementalIndicators(json.loads(row[0]) if row else None)
+
+    def save_state(self, symbol: str, timeframe: str, state: IncrementalIndicators):
+        with self.alert_system.db.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO indicator_state (symbol, timeframe, state, last_candle_ts, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(symbol, timeframe) DO UPDATE SET
+                    state = excluded.state,
+                    last_candle_ts = excluded.last_candle_ts,
+                    updated_at = excluded.updated_at
+            ''', (symbol, timeframe, json.dumps(state.to_dict()), state.last_ts,
+                  datetime.now().isoformat()))
+
+    def active_groups(self) -> Dict[Tuple[str, str], List[tuple]]:
+        """Alert INDICATOR/EXPRESSION aktif dikelompokkan per (symbol, timeframe)"""
+        groups: Dict[Tuple[str, str], List[tuple]] = {}
+        for alert in self.alert_system.db.execute('''
+            SELECT * FROM alerts
+            WHERE is_active = 1 AND alert_type IN ('INDICATOR', 'EXPRESSION')
+        ''').fetchall():
+            if alert[ALERT_TYPE] == 'EXPRESSION' and not alert[TIMEFRAME]:
+                continue
+            timeframe = alert[TIMEFRAME] or '1h'
+            groups.setdefault((alert[SYMBOL], timeframe), []).append(alert)
+        return groups
+
+    def advance(self, symbol: str, timeframe: str) -> List[Dict]:
+        """Proses candle closed baru.
+
+        Return snapshot candle terakhir yang sudah diketahui diikuti snapshot
+        tiap candle baru, jadi setiap pasangan berurutan bisa dicek crossing.
+        Saat state baru dibangun (seeding) return list kosong supaya alert
+        hanya terpicu oleh pergerakan setelah alert mulai dipantau.
+        """
+        closed_at = int(self.last_closed_candle(timeframe).timestamp() * 1000)
+        state = self.load_state(symbol, timeframe)
+
+        if state.last_ts is not None:
+            if state.last_ts + 1 >= closed_at:
+                return []
+            candles = self.fetch_ohlcv(symbol, timeframe, since=state.last_ts + 1,
+                                       limit=SEED_CANDLES)
+            # Terlalu lama tertinggal: bangun ulang dari nol
+            if len(candles) >= SEED_CANDLES:
+                state = IncrementalIndicators()
+
+        seeding = state.last_ts is None
+        if seeding:
+            candles = self.fetch_ohlcv(symbol, timeframe, limit=SEED_CANDLES)
+
+        snapshots = [state.snapshot] if state.snapshot else []
+        for candle in candles:
+            # Hanya candle yang sudah close dan belum diproses
+            if candle[0] >= closed_at or (state.last_ts is not None and
+                                          candle[0] <= state.last_ts):
+                continue
+            snapshots.append(state.update(candle))
+
+        self.save_state(symbol, timeframe, state)
+        return [] if seeding else snapshots
+
+    def check(self) -> List[Dict]:
+        """Satu siklus evaluasi; return alert yang terpicu (sudah disimpan)"""
+        triggered_alerts = []
+        timestamp = datetime.now().isoformat()
+        self.alert_system.rearm_due()
+
+        for (symbol, timeframe), alerts in self.active_groups().items():
+            try:
+                snapshots = self.advance(symbol, timeframe)
+            except Exception as e:
+                logger.error(f"Error updating indicators {symbol} {timeframe}: {e}")
+                continue
+
+            previous = None
+            pending = {}
+            for alert in alerts:
+                # Alert berulang dalam cooldown tetap memajukan state indikator
+                if alert[ALERT_TYPE] != 'INDICATOR' or not alert[ARMED]:
+                    continue
+                pending.setdefault((alert[CONDITION_TYPE], alert[TARGET_PRICE]),
+                                   []).append((watch_start(alert), alert))
+
+            period = TIMEFRAME_SECONDS.get(timeframe, 3600) * 1000
+            for snapshot in snapshots:
+                if previous is not None:
+                    closed = snapshot['ts'] + period
+                    for (condition, level), group in list(pending.items()):
+                        if not condition_met(condition, level, previous, snapshot):
+                            continue
+
+                        fired = [alert for start, alert in group if start <= closed]
+                        if not fired:
+                            continue
+                        message = format_trigger_message(symbol, timeframe,
+                                                         condition, level, snapshot)
+                        for alert in fired:
+                            triggered_alerts.append({
+                                'alert_id': alert[0],
+                                'user_id': alert[1],
+                                'symbol': symbol,
+                                'message': message,
+                                'price': snapshot['close'],
+                                'timestamp': timestamp
+                            })
+                        group = [(start, alert) for start, alert in group
+                                 if start > closed]
+                        if group:
+                            pending[(condition, level)] = group
+                        else:
+                            del pending[(condition, level)]
+                previous = snapshot
+
+        return self.alert_system.record_triggers(triggered_alerts)
+
+
+def run_indicator_alerts(evaluator: IndicatorAlertEvaluator,
+                         on_triggered: Callable[[List[Dict]], None],
+                         interval: float = 30):
+    """Loop background evaluasi alert indikator"""
+    while True:
+        try:
+            triggered_alerts = evaluator.check()
+            if triggered_alerts:
+                on_triggered(triggered_alerts)
+        except Exception as e:
+            logger.error(f"Error in indicator alert monitoring: {e}")
+        time.sleep(interval)
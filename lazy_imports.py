@@ -0,0 +1,46 @@
+import importlib
+import threading
+import types
+from typing import Iterable
+
+
+class LazyModule(types.ModuleType):
+    """Proxy modul yang baru di-import saat atribut pertamanya diakses.
+
+    Dipakai untuk dependency berat (pandas, pandas_ta, ccxt, numpy) supaya
+    import app.py tetap cepat dan port server bisa segera dibuka. Modul di
+    `also_import` ikut di-import sesudahnya, misalnya pandas_ta yang harus
+    di-import agar accessor `df.ta` terdaftar di pandas.
+    """
+
+    def __init__(self, name: str, also_import: Iterable[str] = ()):
+        super().__init__(name)
+        self.__dict__['_lazy_name'] = name
+        self.__dict__['_lazy_also_import'] = tuple(also_import)
+        self.__dict__['_lazy_module'] = None
+        self.__dict__['_lazy_lock'] = threading.Lock()
+
+    def load(self) -> types.ModuleType:
+        """Import modul sebenarnya (sekali, thread-safe)"""
+        module = self.__dict__['_lazy_module']
+        if module is not None:
+            return module
+
+        with self.__dict__['_lazy_lock']:
+            module = self.__dict__['_lazy_module']
+            if module is None:
+                module = importlib.import_module(self.__dict__['_lazy_name'])
+                for extra in self.__dict__['_lazy_also_import']:
+                    importlib.import_module(extra)
+                self.__dict__['_lazy_module'] = module
+            return module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__dict__['_lazy_module'] is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __dir__(self):
+        return dir(self.load())
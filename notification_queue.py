@@ -0,0 +1,308 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Batas panjang pesan Telegram 4096 karakter; sisakan ruang untuk header
+MAX_MESSAGE_LENGTH = 4000
+
+
+class DeliveryDeferred(Exception):
+    """Pengiriman belum bisa dilakukan (mis. bot belum siap); coba lagi tanpa
+    menghitung sebagai percobaan gagal"""
+
+    def __init__(self, message: str = "", retry_after: float = 5.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket sederhana: `rate` token per detik, maksimal `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def is_full(self) -> bool:
+        """Bucket penuh lagi = sama dengan bucket baru (aman dibuang)"""
+        self._refill()
+        return self.tokens >= self.capacity
+
+    def wait_time(self) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def pause(self, seconds: float):
+        """Kosongkan bucket selama `seconds` (mis. setelah HTTP 429 retry_after)"""
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class NotificationDispatcher:
+    """Antrian notifikasi Telegram yang persisten (tabel outbox `notifications`).
+
+    Notifikasi ditulis ke database dulu, lalu satu thread dispatcher:
+    - menggabungkan semua notifikasi pending satu chat menjadi satu pesan,
+    - mematuhi rate global dan per chat dengan token bucket,
+    - mengirim lewat pool berukuran `max_in_flight`, jadi satu chat yang
+      lambat (timeout) tidak menahan pengiriman ke chat lain; satu chat
+      paling banyak punya satu pengiriman berjalan,
+    - retry dengan exponential backoff (dan retry_after dari Telegram),
+    - melanjutkan notifikasi yang belum terkirim setelah restart.
+    """
+
+    def __init__(self, db, send: Callable[[str, str], None],
+                 global_rate: float = 25, per_chat_rate: float = 1,
+                 per_chat_burst: float = 3, max_attempts: int = 8,
+                 base_backoff: float = 2, max_backoff: float = 300,
+                 poll_interval: float = 0.2, retention: float = 86400,
+                 max_in_flight: int = 16):
+        self.db = db
+        self.send = send
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.chat_buckets: Dict[str, TokenBucket] = {}
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.max_in_flight = max_in_flight
+        self.pool = ThreadPoolExecutor(max_workers=max_in_flight,
+                                       thread_name_prefix='notify')
+        self.in_flight = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.last_cleanup = 0.0
+
+    def enqueue(self, chat_id: str, text: str):
+        self.enqueue_many([(chat_id, text)])
+
+    def enqueue_many(self, notifications: List[tuple], cursor=None):
+        """Simpan notifikasi (chat_id, text) ke outbox dalam satu transaksi.
+
+        Dengan `cursor`, insert ikut transaksi pemanggil (commit dan
+        `wake()` menjadi tanggung jawab pemanggil).
+        """
+        if not notifications:
+            return
+
+        now = time.time()
+        rows = [(str(chat_id), text, now, now) for chat_id, text in notifications]
+        if cursor is not None:
+            self._insert(cursor, rows)
+            return
+        with self.db.transaction() as cursor:
+            self._insert(cursor, rows)
+        self.wake()
+
+    @staticmethod
+    def _insert(cursor, rows: List[tuple]):
+        cursor.executemany('''
+            INSERT INTO notifications (chat_id, text, status, attempts,
+                                       next_attempt_at, created_at)
+            VALUES (?, ?, 'pending', 0, ?, ?)
+        ''', rows)
+
+    def wake(self):
+        """Bangunkan dispatcher (mis. setelah transaksi pemanggil commit)"""
+        self.wakeup.set()
+
+    def start(self) -> threading.Thread:
+        self.running = True
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        self.pool.shutdown(wait=False)
+
+    def run(self):
+        while self.running:
+            try:
+                delay = self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Error in notification dispatcher: {e}")
+                delay = 1.0
+
+            self.wakeup.wait(delay)
+            self.wakeup.clear()
+
+    def chat_bucket(self, chat_id: str) -> TokenBucket:
+        with self.lock:
+            bucket = self.chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+                self.chat_buckets[chat_id] = bucket
+            return bucket
+
+    def pending_by_chat(self, now: float, limit: int = 1000) -> Dict[str, List[tuple]]:
+        """Notifikasi jatuh tempo dikelompokkan per chat (urut notifikasi tertua)"""
+        rows = self.db.execute('''
+            SELECT id, chat_id, text, attempts FROM notifications
+            WHERE status = 'pending' AND next_attempt_at <= ?
+            ORDER BY id LIMIT ?
+        ''', (now, limit)).fetchall()
+
+        chats: Dict[str, List[tuple]] = {}
+        for row in rows:
+            chats.setdefault(row[1], []).append(row)
+        return chats
+
+    @staticmethod
+    def coalesce(rows: List[tuple]) -> tuple:
+        """Gabungkan notifikasi satu chat menjadi satu pesan.
+
+        Teks akhir (termasuk header) dipotong di MAX_MESSAGE_LENGTH, jadi
+        notifikasi pertama yang sangat panjang tetap muat.
+        """
+        if len(rows) == 1:
+            return rows[0][2][:MAX_MESSAGE_LENGTH], rows
+
+        batch, length = [], 0
+        for row in rows:
+            if batch and length + len(row[2]) + 2 > MAX_MESSAGE_LENGTH - 100:
+                break
+            batch.append(row)
+            length += len(row[2]) + 2
+
+        header = f"📬 *{len(batch)} notifikasi baru*\n\n"
+        text = header + "\n\n".join(row[2] for row in batch)
+        return text[:MAX_MESSAGE_LENGTH], batch
+
+    def dispatch_once(self) -> float:
+        """Kirim semua yang bisa dikirim sekarang; return jeda sampai putaran berikutnya"""
+        now = time.time()
+        self.cleanup(now)
+
+        next_delay = 5.0
+        for chat_id, rows in self.pending_by_chat(now).items():
+            # Baris chat yang sedang dikirim masih 'pending' di database
+            if chat_id in self.in_flight:
+                continue
+            if len(self.in_flight) >= self.max_in_flight:
+                next_delay = self.poll_interval
+                break
+
+            chat_bucket = self.chat_bucket(chat_id)
+            with self.lock:
+                wait = max(chat_bucket.wait_time(), self.global_bucket.wait_time())
+                if wait <= 0:
+                    chat_bucket.try_take()
+                    self.global_bucket.try_take()
+            if wait > 0:
+                next_delay = min(next_delay, wait)
+                continue
+
+            text, batch = self.coalesce(rows)
+            self.in_flight.add(chat_id)
+            self.pool.submit(self._deliver_in_pool, chat_id, text, batch)
+            if len(batch) < len(rows):
+                next_delay = min(next_delay, chat_bucket.wait_time())
+
+        next_due = self.db.execute('''
+            SELECT MIN(next_attempt_at) FROM notifications WHERE status = 'pending'
+        ''').fetchone()[0]
+        if next_due is not None:
+            next_delay = min(next_delay, max(0.0, next_due - time.time()))
+
+        return max(self.poll_interval, next_delay)
+
+    def _deliver_in_pool(self, chat_id: str, text: str, batch: List[tuple]):
+        try:
+            self.deliver(chat_id, text, batch)
+        except Exception as e:
+            logger.error(f"Error delivering notification to {chat_id}: {e}")
+        finally:
+            self.in_flight.discard(chat_id)
+            self.wakeup.set()
+
+    def deliver(self, chat_id: str, text: str, batch: List[tuple]):
+        ids = [(row[0], ) for row in batch]
+        try:
+            self.send(chat_id, text)
+        except DeliveryDeferred as e:
+            self._reschedule(ids, time.time() + e.retry_after, count_attempt=False,
+                             error=str(e))
+            return
+        except Exception as e:
+            retry_after = getattr(e, 'retry_after', None)
+            if hasattr(retry_after, 'total_seconds'):
+                retry_after = retry_after.total_seconds()
+            if retry_after:
+                # HTTP 429 dari Telegram: tahan chat ini (dan global) sesuai arahan
+                chat_bucket = self.chat_bucket(chat_id)
+                with self.lock:
+                    chat_bucket.pause(float(retry_after))
+                    self.global_bucket.pause(float(retry_after))
+
+            attempts = max(row[3] for row in batch) + 1
+            if attempts >= self.max_attempts:
+                self._mark(ids, 'failed', error=str(e))
+                logger.error(f"Notification to {chat_id} failed permanently: {e}")
+                return
+
+            backoff = float(retry_after or min(self.max_backoff,
+                                               self.base_backoff * 2 ** attempts))
+            self._reschedule(ids, time.time() + backoff, count_attempt=True,
+                             error=str(e))
+            logger.warning(f"Notification to {chat_id} failed (attempt {attempts}), "
+                           f"retry in {backoff:.1f}s: {e}")
+            return
+
+        self._mark(ids, 'sent')
+        logger.info(f"📨 Sent {len(batch)} notification(s) to {chat_id}")
+
+    def _mark(self, ids: List[tuple], status: str, error: Optional[str] = None):
+        with self.db.transaction() as cursor:
+            cursor.executemany('''
+                UPDATE notifications SET status = ?, sent_at = ?, last_error = ?
+                WHERE id = ?
+            ''', [(status, time.time(), error, row_id) for (row_id, ) in ids])
+
+    def _reschedule(self, ids: List[tuple], when: float, count_attempt: bool,
+                    error: str):
+        with self.db.transaction() as cursor:
+            cursor.executemany('''
+                UPDATE notifications SET next_attempt_at = ?,
+                    attempts = attempts + ?, last_error = ?
+                WHERE id = ?
+            ''', [(when, int(count_attempt), error, row_id) for (row_id, ) in ids])
+
+    def cleanup(self, now: float):
+        """Hapus notifikasi terkirim/gagal yang lebih tua dari `retention`"""
+        if now - self.last_cleanup < 3600:
+            return
+        self.last_cleanup = now
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                DELETE FROM notifications
+                WHERE status != 'pending' AND created_at < ?
+            ''', (now - self.retention, ))
+
+    def stats(self) -> Dict:
+        rows = self.db.execute('''
+            SELECT status, COUNT(*) FROM notifications GROUP BY status
+        ''').fetchall()
+        return dict(rows)
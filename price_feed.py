@@ -0,0 +1,144 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+from fake_exchange import create_exchange
+from lazy_imports import LazyModule
+
+ccxtpro = LazyModule('ccxt.pro')
+
+logger = logging.getLogger(__name__)
+
+TickHandler = Callable[[str, Dict], None]
+
+
+class StreamPriceFeed:
+    """Feed harga live dari WebSocket exchange (ccxt.pro `watch_tickers`).
+
+    `symbols` dipanggil ulang setiap putaran, jadi symbol alert yang baru
+    dibuat ikut di-subscribe tanpa restart. Symbol yang tidak ada di
+    `exchange.markets` dibuang (dan di-log sekali) sebelum watch_tickers,
+    supaya satu symbol salah tidak menggagalkan stream semua alert. Setiap
+    ticker yang masuk diteruskan ke `on_tick(symbol, ticker)`.
+    """
+
+    def __init__(self, symbols: Callable[[], List[str]],
+                 exchange_id: str = 'binance', idle_interval: float = 1.0,
+                 exchange_factory: Optional[Callable[[], object]] = None):
+        self.symbols = symbols
+        self.exchange_id = exchange_id
+        # Pengganti ccxt.pro, mis. FakeExchange untuk pengujian offline
+        self.exchange_factory = exchange_factory
+        self.idle_interval = idle_interval
+        self.running = False
+        self.unknown_symbols = set()
+
+    def run(self, on_tick: TickHandler):
+        """Blocking; raise bila koneksi stream gagal"""
+        self.running = True
+        asyncio.run(self._watch(on_tick))
+
+    def stop(self):
+        self.running = False
+
+    async def _watch(self, on_tick: TickHandler):
+        if self.exchange_factory is not None:
+            exchange = self.exchange_factory()
+        else:
+            exchange = getattr(ccxtpro, self.exchange_id)()
+        try:
+            markets = exchange.load_markets()
+            if asyncio.iscoroutine(markets):
+                markets = await markets
+
+            while self.running:
+                symbols = self.known_symbols(self.symbols(), markets)
+                if not symbols:
+                    await asyncio.sleep(self.idle_interval)
+                    continue
+
+                tickers = await exchange.watch_tickers(symbols)
+                for symbol, ticker in tickers.items():
+                    on_tick(symbol, ticker)
+        finally:
+            await exchange.close()
+
+    def known_symbols(self, symbols: List[str], markets: Dict) -> List[str]:
+        known = []
+        for symbol in sorted(symbols):
+            if not markets or symbol in markets:
+                known.append(symbol)
+            elif symbol not in self.unknown_symbols:
+                self.unknown_symbols.add(symbol)
+                logger.warning(f"Skipping {symbol} in price stream: not listed on exchange")
+        return known
+
+
+class ReplayPriceFeed:
+    """Feed pengganti untuk testing: memutar ulang tick dari file JSONL.
+
+    Setiap baris berisi `{"symbol", "last", "quoteVolume", "timestamp"}`
+    dengan timestamp dalam milidetik. Jeda antar tick mengikuti selisih
+    timestamp dibagi `speed` (speed 0 = secepat mungkin). Timestamp ticker
+    yang diteruskan diganti waktu emit supaya latency bisa diukur.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = False):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.running = False
+
+    def load(self) -> List[Dict]:
+        with open(self.path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def run(self, on_tick: TickHandler):
+        self.running = True
+        ticks = self.load()
+
+        while self.running:
+            previous = None
+            for tick in ticks:
+                if not self.running:
+                    return
+
+                if previous is not None and self.speed > 0:
+                    delay = (tick['timestamp'] - previous) / 1000 / self.speed
+                    if delay > 0:
+                        time.sleep(delay)
+                previous = tick['timestamp']
+
+                on_tick(tick['symbol'], {
+                    **tick,
+                    'timestamp': int(time.time() * 1000)
+                })
+
+            if not self.loop:
+                self.running = False
+
+    def stop(self):
+        self.running = False
+
+
+def price_feed_from_env(symbols: Callable[[], List[str]]):
+    """Feed harga sesuai ALERT_ENGINE_MODE.
+
+    stream (default): WebSocket exchange via ccxt.pro
+    replay: putar ulang tick dari ALERT_REPLAY_FILE (testing)
+    poll: tanpa feed (None), engine polling setiap ALERT_POLL_INTERVAL
+    """
+    mode = os.getenv('ALERT_ENGINE_MODE', 'stream').lower()
+
+    if mode == 'replay':
+        return ReplayPriceFeed(os.getenv('ALERT_REPLAY_FILE', 'ticks.jsonl'),
+                               speed=float(os.getenv('ALERT_REPLAY_SPEED', '1')),
+                               loop=os.getenv('ALERT_REPLAY_LOOP', 'false').lower() == 'true')
+    if mode == 'stream':
+        if os.getenv('EXCHANGE_MODE', 'live').lower() == 'fake':
+            return StreamPriceFeed(symbols, exchange_factory=create_exchange)
+        return StreamPriceFeed(symbols)
+    return None
@@ -0,0 +1,160 @@
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SharedCache:
+    """Cache key-value lintas proses berbasis file SQLite (mode WAL).
+
+    Semua worker web membaca dan menulis file yang sama, jadi hasil analisis,
+    generasi cache, dan status service cukup dihitung/diset sekali untuk
+    semua proses. Nilai disimpan sebagai JSON dengan TTL opsional.
+    """
+
+    def __init__(self, db_path: str = "shared_cache.db"):
+        self.db_path = db_path
+        self.local = threading.local()
+        self.setup_database()
+
+    def connection(self) -> sqlite3.Connection:
+        """Satu koneksi per thread, dibuka sekali"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def setup_database(self):
+        """Buat tabel cache bila belum ada"""
+        self.connection().execute('''
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        self.connection().execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache (expires_at)")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Ambil nilai yang belum kedaluwarsa"""
+        row = self.connection().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?",
+            (key, )).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return default
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Simpan nilai; `ttl` dalam detik"""
+        now = time.time()
+        self.connection().execute(
+            '''INSERT INTO cache (key, value, expires_at, updated_at)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT(key) DO UPDATE SET value = excluded.value,
+                   expires_at = excluded.expires_at,
+                   updated_at = excluded.updated_at''',
+            (key, json.dumps(value, default=str),
+             now + ttl if ttl else None, now))
+
+    def delete(self, key: str):
+        self.connection().execute("DELETE FROM cache WHERE key = ?", (key, ))
+
+    def delete_prefix(self, prefix: str):
+        """Hapus semua key dengan prefix tertentu"""
+        self.connection().execute("DELETE FROM cache WHERE key LIKE ? || '%'",
+                                  (prefix, ))
+
+    def update(self, key: str, fn: Callable[[Any], Any], default: Any = None,
+               ttl: Optional[float] = None) -> Any:
+        """Read-modify-write atomik lintas proses (BEGIN IMMEDIATE)"""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            value = fn(self.get(key, default))
+            self.set(key, value, ttl)
+            conn.execute("COMMIT")
+            return value
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def incr(self, key: str, amount: int = 1, initial: int = 0) -> int:
+        """Counter atomik lintas proses"""
+        return self.update(key, lambda value: value + amount, default=initial)
+
+    def append_capped(self, key: str, item: Any, maxlen: int) -> list:
+        """Tambah item ke list dan buang yang terlama bila melebihi `maxlen`"""
+        return self.update(key, lambda items: (items + [item])[-maxlen:],
+                           default=[])
+
+    def purge_expired(self):
+        """Hapus entry yang sudah kedaluwarsa"""
+        self.connection().execute(
+            "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?",
+            (time.time(), ))
+
+
+class LeaderElection:
+    """Pemilihan leader antar worker memakai file lock (flock).
+
+    Hanya proses yang memegang lock yang menjalankan service tunggal seperti
+    alert monitor, bot Telegram, dan event stream. Worker lain terus mencoba
+    mengambil lock, jadi bila leader mati (lock otomatis lepas saat proses
+    berhenti) salah satu worker lain mengambil alih.
+    """
+
+    def __init__(self, lock_path: str, on_elected: Callable[[], None],
+                 retry_interval: float = 5.0):
+        self.lock_path = lock_path
+        self.on_elected = on_elected
+        self.retry_interval = retry_interval
+        self.lock_file = None
+        self.is_leader = False
+
+    def try_acquire(self) -> bool:
+        """Coba ambil lock tanpa blocking"""
+        if self.is_leader:
+            return True
+
+        lock_file = open(self.lock_path, "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+
+        self.lock_file = lock_file
+        self.is_leader = True
+        return True
+
+    def start(self):
+        """Ikut pemilihan di background; `on_elected` dipanggil sekali saat menang"""
+
+        def run():
+            while not self.try_acquire():
+                time.sleep(self.retry_interval)
+
+            logger.info(f"👑 Process {os.getpid()} elected as leader")
+            try:
+                self.on_elected()
+            except Exception as e:
+                logger.error(f"Error starting leader services: {e}")
+
+        threading.Thread(target=run, daemon=True).start()
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from alert_db import AlertDatabase
+
+
+class SignalEventLog:
+    """Log event sinyal (MACD crossover dst.) yang persisten dan ter-index per symbol.
+
+    Event disimpan di tabel signal_events (unik per symbol, timeframe, tipe
+    dan candle, jadi analisis berulang pada candle yang sama tidak
+    menggandakan event). Di memori tiap proses memegang ring buffer per
+    symbol berisi `per_symbol` event terakhir; buffer diisi dari database
+    saat symbol pertama kali diminta lalu diperbarui dengan membaca baris
+    baru setelah id terakhir, sehingga event dari worker lain ikut terlihat
+    dan `recent()` sebanding dengan ukuran hasil. Query rentang waktu
+    (`query()`) langsung ke index (symbol, created_at).
+    """
+
+    def __init__(self, db: AlertDatabase, per_symbol: int = 50,
+                 retention_days: float = 30, prune_interval: float = 3600):
+        self.db = db
+        self.per_symbol = per_symbol
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval
+        self.buffers: Dict[str, Deque[Dict]] = {}
+        self.latest: Deque[Dict] = deque(maxlen=per_symbol)
+        self.last_id = None
+        self.last_prune = 0.0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def to_event(row) -> Dict:
+        return json.loads(row[1])
+
+    def record(self, event: Dict) -> bool:
+        """Simpan event; return False bila event yang sama sudah tercatat"""
+        created_at = time.time()
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                INSERT OR IGNORE INTO signal_events
+                    (symbol, timeframe, event_type, candle_time, created_at, payload)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (event.get('symbol') or '', event.get('timeframe') or '',
+                  event.get('type') or '', event.get('candle_time') or '',
+                  created_at, json.dumps(event, default=str)))
+            inserted = cursor.rowcount > 0
+
+        if created_at - self.last_prune >= self.prune_interval:
+            self.prune()
+        return inserted
+
+    def prune(self) -> int:
+        """Buang event yang lebih tua dari masa retensi"""
+        self.last_prune = time.time()
+        with self.db.transaction() as cursor:
+            cursor.execute('DELETE FROM signal_events WHERE created_at < ?',
+                           (self.last_prune - self.retention_days * 86400, ))
+            return cursor.rowcount
+
+    def refresh(self):
+        """Tambahkan event baru (id > last_id) ke buffer yang sudah dimuat.
+
+        Dipanggil dengan lock dipegang.
+        """
+        if self.last_id is None:
+            self.last_id = self.db.execute(
+                'SELECT COALESCE(MAX(id), 0) FROM signal_events').fetchone()[0]
+            for row in self.db.execute('''
+                SELECT id, payload FROM signal_events ORDER BY id DESC LIMIT ?
+            ''', (self.per_symbol, )).fetchall()[::-1]:
+                self.latest.append(self.to_event(row))
+            return
+
+        for row in self.db.execute('''
+            SELECT id, payload, symbol FROM signal_events WHERE id > ? ORDER BY id
+        ''', (self.last_id, )).fetchall():
+            self.last_id = row[0]
+            event = self.to_event(row)
+            self.latest.append(event)
+            buffer = self.buffers.get(row[2])
+            if buffer is not None:
+                buffer.append(event)
+
+    def buffer(self, symbol: str) -> Deque[Dict]:
+        """Ring buffer symbol, dimuat dari database saat pertama kali diminta.
+
+        Dipanggil dengan lock dipegang, setelah refresh(): baris sampai
+        last_id masuk dari sini, sisanya lewat refresh berikutnya.
+        """
+        buffer = self.buffers.get(symbol)
+        if buffer is None:
+            rows = self.db.execute('''
+                SELECT id, payload FROM signal_events
+                WHERE symbol = ? AND id <= ? ORDER BY id DESC LIMIT ?
+            ''', (symbol, self.last_id, self.per_symbol)).fetchall()
+            buffer = deque((self.to_event(row) for row in reversed(rows)),
+                           maxlen=self.per_symbol)
+            self.buffers[symbol] = buffer
+        return buffer
+
+    def recent(self, symbol: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """Event terakhir (terlama dulu) untuk satu symbol, atau semua symbol"""
+        with self.lock:
+            self.refresh()
+            events = self.buffer(symbol) if symbol else self.latest
+            return list(events)[-limit:] if limit else []
+
+    def count(self, symbol: str) -> int:
+        """Jumlah event symbol di buffer (paling banyak `per_symbol`)"""
+        with self.lock:
+            self.refresh()
+            return len(self.buffer(symbol))
+
+    def query(self, symbol: str, since: Optional[float] = None,
+              until: Optional[float] = None, limit: int = 100) -> List[Dict]:
+        """Event symbol dalam rentang waktu [since, until) (epoch detik), terlama dulu"""
+        rows = self.db.execute('''
+            SELECT id, payload FROM signal_events
+            WHERE symbol = ? AND created_at >= ? AND created_at < ?
+            ORDER BY created_at DESC LIMIT ?
+        ''', (symbol, since if since is not None else 0,
+              until if until is not None else float('inf'),
+              limit)).fetchall()
+        return [self.to_event(row) for row in reversed(rows)]
@@ -5,6 +5,12 @@ class CryptoDashboard {
         this.isDarkMode = true;
         this.alerts = [];
         this.isLoading = false;
+        this.eventSource = null;
+        this.streamBaseUrl = null;
+        this.streamErrors = 0;
+        this.streamConnectTimer = null;
+        this.refreshTimers = [];
+        this.analysisState = null;
 
         this.init();
     }
@@ -12,7 +18,12 @@ class CryptoDashboard {
     async init() {
         this.setupEventListeners();
         await this.loadInitialData();
-        this.startAutoRefresh();
+
+        // Prefer server push; fall back to polling when the stream is unavailable
+        const streaming = await this.connectStream();
+        if (!streaming) {
+            this.startAutoRefresh();
+        }
     }
 
     setupEventListeners() {
@@ -20,12 +31,15 @@ class CryptoDashboard {
         document.getElementById('symbolSelect').addEventListener('change', (e) => {
             this.currentSymbol = e.target.value;
             this.loadAnalysis();
+            this.loadRealtimeData();
+            this.openStream();
         });
 
         // Timeframe selector
         document.getElementById('timeframeSelect').addEventListener('change', (e) => {
             this.currentTimeframe = e.target.value;
             this.loadAnalysis();
+            this.openStream();
         });
 
         // Refresh button
@@ -370,16 +384,181 @@ class CryptoDashboard {
         }
     }
 
+    async connectStream() {
+        if (!window.EventSource) return false;
+
+        try {
+            const response = await fetch('/api/stream/info?user_id=web_user');
+            if (!response.ok) return false;
+
+            const info = await response.json();
+            if (!info.available) return false;
+
+            // The dedicated SSE port is plain HTTP: from an HTTPS page it would be
+            // blocked as mixed content, so only use it when a public URL is configured
+            if (!info.url && window.location.protocol === 'https:') return false;
+
+            // Subscribing to our alert topic needs the per-user token
+            this.alertStreamToken = info.alert_token || null;
+            this.streamBaseUrl = info.url ||
+                `${window.location.protocol}//${window.location.hostname}:${info.port}${info.path}`;
+        } catch (error) {
+            console.error('Stream info error:', error);
+            return false;
+        }
+
+        this.openStream();
+        return true;
+    }
+
+    openStream() {
+        if (!this.streamBaseUrl) return;
+        if (this.eventSource) this.eventSource.close();
+        clearTimeout(this.streamConnectTimer);
+        this.streamErrors = 0;
+
+        const params = new URLSearchParams({
+            symbol: this.currentSymbol,
+            timeframe: this.currentTimeframe,
+            mode: 'delta'
+        });
+        if (this.alertStreamToken) {
+            params.set('user_id', 'web_user');
+            params.set('token', this.alertStreamToken);
+        }
+        this.analysisState = null;
+        const source = new EventSource(`${this.streamBaseUrl}?${params}`);
+
+        source.addEventListener('ticker', (e) => {
+            const data = JSON.parse(e.data);
+            if (data.symbol === this.currentSymbol) this.renderRealtimeData(data);
+        });
+
+        source.addEventListener('analysis_snapshot', (e) => {
+            const event = JSON.parse(e.data);
+            if (this.isCurrentAnalysis(event)) this.applyAnalysisEvent(event);
+        });
+
+        source.addEventListener('analysis_delta', (e) => {
+            const event = JSON.parse(e.data);
+            if (this.isCurrentAnalysis(event)) this.applyAnalysisEvent(event);
+        });
+
+        source.addEventListener('alert', (e) => {
+            const alert = JSON.parse(e.data);
+            this.showSuccess(alert.message || 'Alert triggered');
+            this.loadUserAlerts();
+        });
+
+        // An unreachable port keeps EventSource in CONNECTING forever (it never
+        // reaches CLOSED), so give up after a connect timeout or repeated errors
+        this.streamConnectTimer = setTimeout(() => this.fallbackToPolling(), 10000);
+
+        source.onopen = () => {
+            clearTimeout(this.streamConnectTimer);
+            this.streamErrors = 0;
+        };
+
+        source.onerror = () => {
+            this.streamErrors += 1;
+            if (source.readyState === EventSource.CLOSED || this.streamErrors >= 3) {
+                this.fallbackToPolling();
+            }
+        };
+
+        this.eventSource = source;
+    }
+
+    fallbackToPolling() {
+        clearTimeout(this.streamConnectTimer);
+        if (this.eventSource) this.eventSource.close();
+        this.eventSource = null;
+        this.streamBaseUrl = null;
+        this.startAutoRefresh();
+    }
+
+    isCurrentAnalysis(event) {
+        return event.symbol === this.currentSymbol && event.timeframe === this.currentTimeframe;
+    }
+
+    applyAnalysisEvent(event) {
+        if (event.type === 'snapshot') {
+            this.analysisState = { epoch: event.epoch, version: event.version, data: event.data };
+        } else {
+            const state = this.analysisState;
+            // Missed a version (or server restarted): ask the server to resync us
+            if (!state || state.epoch !== event.epoch || state.version !== event.base_version) {
+                this.resyncAnalysis();
+                return;
+            }
+            state.data = this.applyPatch(state.data, event.ops);
+            state.version = event.version;
+        }
+        this.renderAnalysis(this.analysisState.data);
+    }
+
+    async resyncAnalysis() {
+        const params = new URLSearchParams({
+            symbol: this.currentSymbol,
+            timeframe: this.currentTimeframe
+        });
+        if (this.analysisState) {
+            params.set('since', this.analysisState.version);
+            params.set('epoch', this.analysisState.epoch);
+        }
+
+        try {
+            const response = await fetch(`/api/analyze/delta?${params}`);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+
+            const event = await response.json();
+            if (event.type === 'delta' && this.analysisState) {
+                this.analysisState.data = this.applyPatch(this.analysisState.data, event.ops);
+                this.analysisState.version = event.version;
+                this.renderAnalysis(this.analysisState.data);
+            } else {
+                this.applyAnalysisEvent(event);
+            }
+        } catch (error) {
+            console.error('Analysis resync error:', error);
+        }
+    }
+
+    applyPatch(document, ops) {
+        const unescape = (token) => token.replace(/~1/g, '/').replace(/~0/g, '~');
+
+        for (const op of ops) {
+            if (op.path === '') {
+                document = op.value;
+                continue;
+            }
+            const tokens = op.path.split('/').slice(1).map(unescape);
+            let target = document;
+            for (const token of tokens.slice(0, -1)) target = target[token];
+
+            const last = tokens[tokens.length - 1];
+            if (op.op === 'remove') {
+                if (Array.isArray(target)) target.splice(Number(last), 1);
+                else delete target[last];
+            } else {
+                target[last] = op.value;
+            }
+        }
+        return document;
+    }
+
     startAutoRefresh() {
+        if (this.refreshTimers.length) return;
+
         // Refresh realtime data every 30 seconds
-        setInterval(() => {
+        this.refreshTimers.push(setInterval(() => {
             this.loadRealtimeData();
-        }, 30000);
+        }, 30000));
 
         // Refresh analysis every 5 minutes
-        setInterval(() => {
+        this.refreshTimers.push(setInterval(() => {
             this.loadAnalysis();
-        }, 300000);
+        }, 300000));
     }
 
     async refreshAllData() {
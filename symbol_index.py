@@ -0,0 +1,143 @@
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Quote yang dipakai saat user hanya menyebut base ("BTC" -> BTC/USDT), urut prioritas
+PREFERRED_QUOTES = ('USDT', 'USDC', 'FDUSD', 'BTC', 'ETH')
+# Stablecoin/quote tidak dikenali sebagai symbol bila ditulis sendirian
+STABLE_QUOTES = {'USDT', 'USDC', 'FDUSD', 'BUSD', 'TUSD', 'DAI'}
+# Nama koin (case-insensitive) -> base
+COIN_ALIASES = {
+    'BITCOIN': 'BTC', 'ETHEREUM': 'ETH', 'BINANCE COIN': 'BNB', 'SOLANA': 'SOL',
+    'RIPPLE': 'XRP', 'CARDANO': 'ADA', 'DOGECOIN': 'DOGE', 'POLKADOT': 'DOT',
+    'CHAINLINK': 'LINK', 'UNISWAP': 'UNI', 'AVALANCHE': 'AVAX', 'LITECOIN': 'LTC',
+    'TRON': 'TRX', 'TONCOIN': 'TON', 'SHIBA INU': 'SHIB', 'PEPE': 'PEPE'
+}
+# Dipakai sampai daftar market dari API termuat
+DEFAULT_MARKETS = [(f"{base}/USDT", base, 'USDT') for base in
+                   ('BTC', 'ETH', 'BNB', 'SOL', 'XRP', 'ADA', 'DOGE', 'DOT', 'LINK', 'UNI')]
+
+
+class AhoCorasick:
+    """Automaton Aho-Corasick: semua kemunculan banyak pattern dalam satu kali scan"""
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[tuple]] = [[]]
+
+    def add(self, pattern: str, value):
+        node = 0
+        for ch in pattern:
+            next_node = self.goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[node][ch] = next_node
+            node = next_node
+        self.output[node].append((len(pattern), value))
+
+    def build(self):
+        """Hitung fail link (BFS); dipanggil sekali setelah semua pattern ditambahkan"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, next_node in self.goto[node].items():
+                queue.append(next_node)
+                fail = self.fail[node]
+                while fail and ch not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_node] = self.goto[fail].get(ch, 0)
+                self.output[next_node] = self.output[next_node] + self.output[
+                    self.fail[next_node]]
+
+    def search(self, text: str) -> Iterator[Tuple[int, int, object]]:
+        """(start, end, value) untuk setiap kemunculan pattern di `text`"""
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for length, value in self.output[node]:
+                yield i - length + 1, i + 1, value
+
+
+def upper_chars(text: str) -> str:
+    """Upper-case per karakter dengan panjang tetap (posisi match = posisi teks asli)"""
+    return ''.join(upper if len(upper) == 1 else ch
+                   for ch, upper in ((ch, ch.upper()) for ch in text))
+
+
+class SymbolIndex:
+    """Index symbol market untuk mengenali koin di pesan bebas.
+
+    Pattern per market: pasangan ("BTC/USDT", "BTCUSDT", "BTC-USDT",
+    "BTC_USDT"), base saja ("BTC" -> quote prioritas, lihat PREFERRED_QUOTES)
+    dan nama koin (COIN_ALIASES). Semua pattern masuk satu automaton
+    Aho-Corasick sehingga satu pesan di-scan linear berapa pun jumlah
+    market. Match hanya dihitung di batas kata (tidak ada huruf/angka tepat
+    sebelum/sesudahnya), dan base saja harus ditulis huruf besar: "ADA" dan
+    "$ADA" dikenali, kata "ada" atau "KADAL" tidak.
+    """
+
+    def __init__(self, markets: Iterable[Sequence[str]] = DEFAULT_MARKETS,
+                 aliases: Optional[Dict[str, str]] = None,
+                 quotes: Sequence[str] = PREFERRED_QUOTES):
+        self.automaton = AhoCorasick()
+        self.size = 0
+        best: Dict[str, tuple] = {}
+
+        for symbol, base, quote in markets:
+            base, quote = base.upper(), quote.upper()
+            for separator in ('/', '', '-', '_'):
+                self.automaton.add(f"{base}{separator}{quote}", (symbol, False))
+            self.size += 1
+
+            if quote in quotes:
+                rank = quotes.index(quote)
+                if base not in best or rank < best[base][0]:
+                    best[base] = (rank, symbol)
+
+        for base, (_, symbol) in best.items():
+            if len(base) >= 2 and base not in STABLE_QUOTES:
+                self.automaton.add(base, (symbol, True))
+
+        for alias, base in (COIN_ALIASES if aliases is None else aliases).items():
+            if base in best:
+                self.automaton.add(alias.upper(), (best[base][1], False))
+
+        self.automaton.build()
+
+    def __len__(self):
+        return self.size
+
+    @staticmethod
+    def at_boundary(text: str, start: int, end: int) -> bool:
+        return ((start == 0 or not text[start - 1].isalnum()) and
+                (end == len(text) or not text[end].isalnum()))
+
+    def find(self, text: str, limit: Optional[int] = None) -> List[str]:
+        """Symbol market yang disebut di `text`, urut kemunculan, tanpa duplikat.
+
+        Match yang tumpang tindih diselesaikan leftmost-longest: "BTC/USDT"
+        menang atas "BTC" dan "USDT" di dalamnya.
+        """
+        matches = []
+        for start, end, (symbol, uppercase_only) in self.automaton.search(upper_chars(text)):
+            if not self.at_boundary(text, start, end):
+                continue
+            if uppercase_only and not text[start:end].isupper():
+                continue
+            matches.append((start, -(end - start), symbol))
+
+        symbols, last_end = [], 0
+        for start, negative_length, symbol in sorted(matches):
+            if start < last_end:
+                continue
+            last_end = start - negative_length
+            if symbol not in symbols:
+                symbols.append(symbol)
+                if limit and len(symbols) >= limit:
+                    break
+        return symbols
@@ -1,28 +1,87 @@
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, MessageHandler, filters
+from telegram.ext import (Application, ApplicationHandlerStop, CommandHandler,
+                          CallbackQueryHandler, ContextTypes, MessageHandler,
+                          TypeHandler, filters)
 import requests
 import asyncio
 import os
+import threading
+import time
 import traceback
+from datetime import datetime, timezone
+
+from bot_message_cache import RenderedMessage, RenderedMessageCache
+from bot_work_queue import FairWorkQueue, QueueFull
+from notification_queue import TokenBucket
+from symbol_index import SymbolIndex
 
-# Setup logging dengan level DEBUG untuk troubleshooting
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.DEBUG,
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('telegram_bot.log')
-    ])
 logger = logging.getLogger(__name__)
 
-# Enable debug untuk semua komponen telegram
-logging.getLogger('telegram').setLevel(logging.DEBUG)
-logging.getLogger('telegram.ext').setLevel(logging.DEBUG)
-logging.getLogger('httpx').setLevel(logging.DEBUG)
+_logging_configured = False
+
+
+def configure_logging():
+    """Setup logging bot (DEBUG untuk troubleshooting); dipanggil saat bot start, bukan saat import"""
+    global _logging_configured
+    if _logging_configured:
+        return
+    _logging_configured = True
+
+    level = getattr(logging, os.getenv('TELEGRAM_LOG_LEVEL', 'DEBUG').upper(),
+                    logging.DEBUG)
+
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=level,
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler('telegram_bot.log')
+        ])
+
+    # Enable debug untuk semua komponen telegram
+    logging.getLogger('telegram').setLevel(level)
+    logging.getLogger('telegram.ext').setLevel(level)
+    logging.getLogger('httpx').setLevel(level)
 
 # Base URL untuk API crypto - use proper internal URL
-API_BASE_URL = "http://0.0.0.0:5000/api"
+API_BASE_URL = f"http://0.0.0.0:{os.getenv('PORT', '5000')}/api"
+
+ALERT_OPTIONS = ('cooldown=', 'rearm=')
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Batas per user: update per menit (burst), request backend paralel/menunggu
+BOT_USER_RATE = float(os.getenv('BOT_USER_RATE', '20'))
+BOT_USER_BURST = float(os.getenv('BOT_USER_BURST', '5'))
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', '4'))
+BOT_USER_CONCURRENCY = int(os.getenv('BOT_USER_CONCURRENCY', '1'))
+BOT_USER_PENDING = int(os.getenv('BOT_USER_PENDING', '3'))
+# Pemberitahuan "terlalu cepat" paling sering sekali per interval ini per user
+RATE_NOTICE_INTERVAL = 10
+# Bucket rate user yang sudah penuh lagi dibuang tiap interval ini (detik)
+RATE_SWEEP_INTERVAL = 300
+BOT_MESSAGE_CACHE_SIZE = int(os.getenv('BOT_MESSAGE_CACHE_SIZE', '1000'))
+# Index symbol untuk pesan bebas: dimuat ulang dari /api/markets tiap interval
+MARKET_INDEX_REFRESH = float(os.getenv('MARKET_INDEX_REFRESH', '3600'))
+MAX_DETECTED_SYMBOLS = 3
+
+# Base URL Bot API; arahkan ke server lokal (fake_telegram.py) untuk test
+TELEGRAM_API_BASE_URL = os.getenv('TELEGRAM_API_BASE_URL', 'https://api.telegram.org/bot')
+# Mode webhook: URL publik endpoint /telegram/webhook app (kosong = long polling).
+# Secret wajib: tanpa secret siapa pun bisa mengirim update palsu ke endpoint
+BOT_WEBHOOK_URL = os.getenv('BOT_WEBHOOK_URL', '')
+BOT_WEBHOOK_SECRET = os.getenv('BOT_WEBHOOK_SECRET', '')
+# Pool worker update webhook: handler paralel dan update yang boleh menunggu
+BOT_UPDATE_WORKERS = int(os.getenv('BOT_UPDATE_WORKERS', '8'))
+BOT_UPDATE_QUEUE = int(os.getenv('BOT_UPDATE_QUEUE', '256'))
+
+
+def parse_duration(text: str) -> float:
+    """'30m' / '4h' / '1d' / '90' (detik) -> detik"""
+    text = text.strip().lower()
+    if text and text[-1] in DURATION_UNITS:
+        return float(text[:-1]) * DURATION_UNITS[text[-1]]
+    return float(text)
 
 
 class CryptoTelegramBot:
@@ -32,10 +91,29 @@ class CryptoTelegramBot:
         logger.debug(f"Token length: {len(token) if token else 0}")
 
         self.token = token
+        # Request ke backend lewat antrian adil (lihat FairWorkQueue)
+        self.work_queue = FairWorkQueue(workers=BOT_WORKERS,
+                                        per_user_concurrency=BOT_USER_CONCURRENCY,
+                                        per_user_pending=BOT_USER_PENDING)
+        self.user_buckets = {}
+        self.rate_notices = {}
+        self.last_rate_sweep = time.monotonic()
+        self.message_cache = RenderedMessageCache(BOT_MESSAGE_CACHE_SIZE)
+        self.symbol_index = SymbolIndex()
+        self.symbol_index_loaded = None
+        # Event loop bot (diisi saat run); dipakai thread lain untuk kirim pesan
+        self.loop = None
+        self.ready = threading.Event()
+        self.update_queue = None
+        self.update_workers = []
+        self.updates_processed = 0
+        self.updates_rejected = 0
 
         try:
-            # Build application dengan timeout dan error handling
-            self.application = Application.builder().token(token).build()
+            # Update diproses paralel; beban backend dibatasi oleh work_queue
+            self.application = (Application.builder().token(token)
+                                .base_url(TELEGRAM_API_BASE_URL)
+                                .concurrent_updates(True).build())
             logger.info("✅ Application builder berhasil")
 
             self.setup_handlers()
@@ -51,6 +129,10 @@ class CryptoTelegramBot:
         logger.info("🔧 Setting up command handlers...")
 
         try:
+            # Rate limit per user sebelum handler mana pun dijalankan
+            self.application.add_handler(TypeHandler(Update, self.rate_limit_gate),
+                                         group=-1)
+
             # Add handlers dengan debug
             handlers = [("start", self.start_command),
                         ("help", self.help_command),
@@ -62,6 +144,9 @@ class CryptoTelegramBot:
                         ("createalert", self.create_alert_command),
                         ("myalerts", self.my_alerts_command),
                         ("deletealert", self.delete_alert_command),
+                        ("watch", self.watch_command),
+                        ("unwatch", self.unwatch_command),
+                        ("watchlist", self.watchlist_command),
                         ("volume", self.volume_command),
                         ("onchain", self.onchain_command),
                         ("feargreed", self.fear_greed_command)]
@@ -88,6 +173,98 @@ class CryptoTelegramBot:
             logger.error(f"Traceback: {traceback.format_exc()}")
             raise
 
+    async def rate_limit_gate(self, update: Update,
+                              context: ContextTypes.DEFAULT_TYPE):
+        """Tolak update dari user yang melebihi BOT_USER_RATE per menit"""
+        user = update.effective_user
+        if user is None:
+            return
+
+        self.sweep_rate_limits()
+        bucket = self.user_buckets.get(user.id)
+        if bucket is None:
+            bucket = self.user_buckets[user.id] = TokenBucket(BOT_USER_RATE / 60,
+                                                              BOT_USER_BURST)
+        if bucket.try_take():
+            return
+
+        notice = "⏳ Terlalu banyak permintaan, coba lagi beberapa detik lagi."
+        if update.callback_query:
+            await update.callback_query.answer(notice)
+        elif time.monotonic() - self.rate_notices.get(user.id, 0) >= RATE_NOTICE_INTERVAL:
+            self.rate_notices[user.id] = time.monotonic()
+            if update.effective_message:
+                await update.effective_message.reply_text(notice)
+        raise ApplicationHandlerStop()
+
+    def sweep_rate_limits(self):
+        """Buang state rate limit user yang sudah idle supaya dict tidak tumbuh terus"""
+        now = time.monotonic()
+        if now - self.last_rate_sweep < RATE_SWEEP_INTERVAL:
+            return
+        self.last_rate_sweep = now
+
+        for user_id in [user_id for user_id, bucket in self.user_buckets.items()
+                        if bucket.is_full()]:
+            del self.user_buckets[user_id]
+        for user_id in [user_id for user_id, noticed in self.rate_notices.items()
+                        if now - noticed >= RATE_NOTICE_INTERVAL]:
+            del self.rate_notices[user_id]
+
+    async def api_get(self, update: Update, path: str, params=None,
+                      timeout: float = 30, headers=None) -> requests.Response:
+        """GET ke API lewat antrian adil.
+
+        GET identik (path + params + header) yang masih menunggu atau
+        berjalan digabung, jadi banyak user yang meminta analisis symbol yang
+        sama hanya memicu satu request backend.
+        """
+        key = ('GET', path, tuple(sorted((params or {}).items())),
+               tuple(sorted((headers or {}).items())))
+        return await self.work_queue.submit(
+            update.effective_user.id, key,
+            lambda: requests.get(f"{API_BASE_URL}{path}", params=params,
+                                 headers=headers, timeout=timeout))
+
+    async def fetch_rendered(self, update: Update, key, path: str, render,
+                             params=None, timeout: float = 30):
+        """GET data API lalu render pesannya lewat cache pesan ter-render.
+
+        `render(data)` mengembalikan teks atau (teks, reply_markup). Return
+        (response, message); message None bila API tidak menjawab 200/304,
+        response tetap dikembalikan untuk pesan error handler. Hanya response
+        ber-ETag yang di-cache; endpoint tanpa ETag (harga real-time, daftar
+        alert) selalu di-render dari data terbaru.
+        """
+        cached = self.message_cache.get(key)
+        headers = {'If-None-Match': cached.etag} if cached and cached.etag else None
+        response = await self.api_get(update, path, params=params, timeout=timeout,
+                                      headers=headers)
+
+        if response.status_code == 304 and cached:
+            return response, self.message_cache.lookup(key, cached.version) or cached
+        if response.status_code != 200:
+            return response, None
+
+        etag = response.headers.get('ETag')
+        message = self.message_cache.lookup(key, etag) if etag else None
+        if message is None:
+            rendered = render(response.json())
+            text, reply_markup = rendered if isinstance(rendered, tuple) else (rendered, None)
+            message = RenderedMessage(etag, etag, text, reply_markup)
+            self.message_cache.renders += 1
+            if etag:
+                self.message_cache.put(key, message)
+        return response, message
+
+    async def api_call(self, update: Update, method: str, path: str,
+                       json=None, timeout: float = 10) -> requests.Response:
+        """POST/DELETE ke API lewat antrian adil (tidak pernah digabung)"""
+        return await self.work_queue.submit(
+            update.effective_user.id, None,
+            lambda: requests.request(method, f"{API_BASE_URL}{path}",
+                                     json=json, timeout=timeout))
+
     async def start_command(self, update: Update,
                             context: ContextTypes.DEFAULT_TYPE):
         """Handler untuk command /start"""
@@ -166,10 +343,18 @@ Gunakan /help untuk melihat semua perintah yang tersedia."""
 • `/deletealert <id>` - Hapus alert
 • `/alerts <symbol>` - Alert terbaru symbol
 
+*📋 Watchlist Digest:*
+• `/watch <symbol> [timeframe] [interval]` - Digest berkala (default 1d, tiap 4h)
+• `/unwatch <symbol> [timeframe]` - Hapus dari watchlist
+• `/watchlist` - Lihat watchlist Anda
+
 *💡 Contoh Alert:*
 • `/createalert BTC/USDT PRICE ABOVE 120000`
 • `/createalert ETH/USDT PERCENTAGE GAIN 5`
 • `/createalert BNB/USDT VOLUME SPIKE 1000000`
+• `/createalert BNB/USDT VOLUME ZSCORE 3` (volume 3σ di atas rata-rata 30 hari)
+• `/createalert BTC/USDT INDICATOR RSI_CROSS_ABOVE 70 4h`
+• `/createalert BTC/USDT EXPRESSION price > 70000 AND rsi_14 < 70`
 
 *📈 Contoh Analisis:*
 • `/analyze BTC/USDT` - Analisis Bitcoin
@@ -193,47 +378,48 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
         symbol = context.args[0].upper()
         timeframe = context.args[1] if len(context.args) > 1 else "1d"
 
-        await update.message.reply_text(f"🔄 Menganalisis {symbol}...")
+        # Placeholder diedit dengan hasil, bukan pesan baru
+        placeholder = await update.message.reply_text(f"🔄 Menganalisis {symbol}...")
 
         try:
-            response = requests.get(f"{API_BASE_URL}/analyze",
-                                    params={
-                                        "symbol": symbol,
-                                        "timeframe": timeframe
-                                    },
-                                    timeout=30)
+            try:
+                response, message = await self.fetch_rendered(
+                    update, ('analyze', symbol, timeframe), "/analyze",
+                    self.format_analysis,
+                    params={
+                        "symbol": symbol,
+                        "timeframe": timeframe
+                    },
+                    timeout=30)
+            except ValueError as json_error:
+                logger.error(f"JSON parsing error: {json_error}")
+                await placeholder.edit_text(
+                    f"❌ Error parsing response: {str(json_error)}")
+                return
 
             logger.debug(f"API Response status: {response.status_code}")
-            logger.debug(f"API Response text: {response.text[:200]}...")
 
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    analysis_text = self.format_analysis(data)
-                    await update.message.reply_text(analysis_text,
-                                                    parse_mode='Markdown')
-                except ValueError as json_error:
-                    logger.error(f"JSON parsing error: {json_error}")
-                    await update.message.reply_text(
-                        f"❌ Error parsing response: {str(json_error)}")
+            if message:
+                await placeholder.edit_text(message.text, parse_mode='Markdown')
             else:
                 try:
                     error_data = response.json()
-                    await update.message.reply_text(
+                    await placeholder.edit_text(
                         f"❌ Error: {error_data.get('error', 'Unknown error')}")
                 except:
-                    await update.message.reply_text(
+                    await placeholder.edit_text(
                         f"❌ HTTP Error {response.status_code}: {response.text[:100]}"
                     )
 
+        except QueueFull as busy:
+            await placeholder.edit_text(str(busy))
         except requests.exceptions.RequestException as req_error:
             logger.error(f"Request error: {req_error}")
-            await update.message.reply_text(
+            await placeholder.edit_text(
                 f"❌ Connection error: {str(req_error)}")
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
-            await update.message.reply_text(f"❌ Gagal mengambil data: {str(e)}"
-                                            )
+            await placeholder.edit_text(f"❌ Gagal mengambil data: {str(e)}")
 
     async def price_command(self, update: Update,
                             context: ContextTypes.DEFAULT_TYPE):
@@ -246,18 +432,18 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
         symbol = context.args[0].upper()
 
         try:
-            response = requests.get(f"{API_BASE_URL}/realtime/{symbol}",
-                                    timeout=10)
+            try:
+                response, message = await self.fetch_rendered(
+                    update, ('price', symbol), f"/realtime/{symbol}",
+                    self.format_price_data, timeout=10)
+            except ValueError as json_error:
+                await update.message.reply_text(
+                    f"❌ Error parsing price data: {str(json_error)}")
+                return
 
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    price_text = self.format_price_data(data)
-                    await update.message.reply_text(price_text,
-                                                    parse_mode='Markdown')
-                except ValueError as json_error:
-                    await update.message.reply_text(
-                        f"❌ Error parsing price data: {str(json_error)}")
+            if message:
+                await update.message.reply_text(message.text,
+                                                parse_mode='Markdown')
             else:
                 try:
                     error_data = response.json()
@@ -286,13 +472,12 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
         symbol = context.args[0].upper()
 
         try:
-            response = requests.get(f"{API_BASE_URL}/fibonacci/{symbol}",
-                                    timeout=15)
+            response, message = await self.fetch_rendered(
+                update, ('fibonacci', symbol), f"/fibonacci/{symbol}",
+                self.format_fibonacci_data, timeout=15)
 
-            if response.status_code == 200:
-                data = response.json()
-                fib_text = self.format_fibonacci_data(data)
-                await update.message.reply_text(fib_text,
+            if message:
+                await update.message.reply_text(message.text,
                                                 parse_mode='Markdown')
             else:
                 error_data = response.json()
@@ -314,13 +499,12 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
         symbol = context.args[0].upper()
 
         try:
-            response = requests.get(f"{API_BASE_URL}/alerts/{symbol}",
-                                    timeout=10)
+            response, message = await self.fetch_rendered(
+                update, ('alerts', symbol), f"/alerts/{symbol}",
+                self.format_alerts_data, timeout=10)
 
-            if response.status_code == 200:
-                data = response.json()
-                alerts_text = self.format_alerts_data(data)
-                await update.message.reply_text(alerts_text,
+            if message:
+                await update.message.reply_text(message.text,
                                                 parse_mode='Markdown')
             else:
                 error_data = response.json()
@@ -334,31 +518,61 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
     async def create_alert_command(self, update: Update,
                                    context: ContextTypes.DEFAULT_TYPE):
         """Handler untuk command /createalert"""
-        if len(context.args) < 4:
+        # Opsi alert berulang: cooldown=1h (30m/45s/1d) dan rearm=2 (persen)
+        options = dict(arg.lower().split('=', 1) for arg in context.args
+                       if arg.lower().startswith(ALERT_OPTIONS))
+        args = [arg for arg in context.args
+                if not arg.lower().startswith(ALERT_OPTIONS)]
+
+        is_indicator = len(args) >= 2 and args[1].upper() == 'INDICATOR'
+        if len(args) < (3 if is_indicator else 4):
             await update.message.reply_text(
                 "❌ Format: /createalert <symbol> <type> <condition> <value>\n\n"
                 "Contoh:\n"
                 "• /createalert BTC/USDT PRICE ABOVE 120000\n"
                 "• /createalert ETH/USDT PERCENTAGE GAIN 5\n"
-                "• /createalert BNB/USDT VOLUME SPIKE 1000000")
+                "• /createalert BNB/USDT VOLUME SPIKE 1000000\n"
+                "• /createalert BNB/USDT VOLUME ZSCORE 3\n"
+                "• /createalert BTC/USDT INDICATOR RSI_CROSS_ABOVE 70 4h\n"
+                "• /createalert ETH/USDT INDICATOR MACD_BULLISH_CROSSOVER 1h\n"
+                "• /createalert BTC/USDT EXPRESSION price > 70000 AND rsi_14 < 70\n\n"
+                "Alert berulang: tambahkan cooldown=1h dan/atau rearm=2 (persen)\n"
+                "• /createalert BTC/USDT PRICE ABOVE 120000 cooldown=4h rearm=2")
             return
 
-        symbol = context.args[0].upper()
-        alert_type = context.args[1].upper()
-        condition = context.args[2].upper()
-        value = float(context.args[3])
+        symbol = args[0].upper()
+        alert_type = args[1].upper()
+        condition = args[2].upper()
+        value = None
+        timeframe = '1h'
+        if alert_type == 'EXPRESSION':
+            # Seluruh sisa argumen adalah ekspresi
+            condition = ' '.join(args[2:])
+        else:
+            for arg in args[3:5]:
+                try:
+                    value = float(arg)
+                except ValueError:
+                    timeframe = arg
         user_id = str(update.effective_user.id)
 
         try:
-            response = requests.post(f"{API_BASE_URL}/alerts/create",
-                                     json={
-                                         "symbol": symbol,
-                                         "alert_type": alert_type,
-                                         "condition": condition,
-                                         "value": value,
-                                         "user_id": user_id
-                                     },
-                                     timeout=10)
+            payload = {
+                "symbol": symbol,
+                "alert_type": alert_type,
+                "condition": condition,
+                "value": value,
+                "user_id": user_id
+            }
+            if is_indicator:
+                payload["timeframe"] = timeframe
+            if 'cooldown' in options:
+                payload["cooldown"] = parse_duration(options['cooldown'])
+            if 'rearm' in options:
+                payload["rearm_pct"] = float(options['rearm'].rstrip('%'))
+
+            response = await self.api_call(update, 'POST', "/alerts/create",
+                                           json=payload)
 
             if response.status_code == 200:
                 data = response.json()
@@ -366,7 +580,9 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
                     f"✅ Alert berhasil dibuat!\n"
                     f"ID: {data['alert_id']}\n"
                     f"Symbol: {symbol}\n"
-                    f"Type: {alert_type} {condition} {value}")
+                    f"Type: {alert_type} {condition} {value if value is not None else ''}"
+                    f"{f' ({timeframe})' if is_indicator else ''}"
+                    f"{' 🔁' if options else ''}")
             else:
                 error_data = response.json()
                 await update.message.reply_text(
@@ -381,8 +597,8 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
         user_id = str(update.effective_user.id)
 
         try:
-            response = requests.get(f"{API_BASE_URL}/alerts/user/{user_id}",
-                                    timeout=10)
+            response = await self.api_get(update, f"/alerts/user/{user_id}",
+                                          timeout=10)
 
             if response.status_code == 200:
                 data = response.json()
@@ -397,6 +613,10 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
 
                 for alert in alerts[:10]:  # Show max 10 alerts
                     status = "🟢 Aktif" if alert['is_active'] else "🔴 Triggered"
+                    if alert['is_active'] and not alert.get('armed', True):
+                        status = "⏳ Menunggu re-arm"
+                    if alert.get('recurring'):
+                        status += f" 🔁 ({alert.get('trigger_count', 0)}x)"
                     text += f"*ID {alert['id']}:* {alert['symbol']}\n"
                     text += f"• Type: {alert['alert_type']} {alert.get('condition_type', '')}\n"
                     text += f"• Target: {alert.get('target_price', 'N/A')}\n"
@@ -421,9 +641,8 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
         user_id = str(update.effective_user.id)
 
         try:
-            response = requests.delete(f"{API_BASE_URL}/alerts/{alert_id}",
-                                       json={"user_id": user_id},
-                                       timeout=10)
+            response = await self.api_call(update, 'DELETE', f"/alerts/{alert_id}",
+                                           json={"user_id": user_id})
 
             if response.status_code == 200:
                 await update.message.reply_text(
@@ -435,6 +654,99 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
         except Exception as e:
             await update.message.reply_text(f"❌ Error: {str(e)}")
 
+    async def watch_command(self, update: Update,
+                            context: ContextTypes.DEFAULT_TYPE):
+        """Handler untuk command /watch"""
+        if not context.args:
+            await update.message.reply_text(
+                "❌ Format: /watch <symbol> [timeframe] [interval]\n"
+                "Contoh: /watch BTC/USDT 1d 4h")
+            return
+
+        symbol = context.args[0].upper()
+        timeframe = context.args[1] if len(context.args) > 1 else "1d"
+
+        try:
+            interval_hours = (parse_duration(context.args[2]) / 3600
+                              if len(context.args) > 2 else 4)
+            if interval_hours != int(interval_hours):
+                raise ValueError("interval harus kelipatan jam")
+
+            response = await self.api_call(update, 'POST', "/watchlist",
+                                           json={
+                                               "user_id": str(update.effective_user.id),
+                                               "symbol": symbol,
+                                               "timeframe": timeframe,
+                                               "interval_hours": int(interval_hours)
+                                           })
+            data = response.json()
+
+            if response.status_code == 200:
+                await update.message.reply_text(
+                    f"✅ {data['symbol']} ({data['timeframe']}) masuk watchlist\n"
+                    f"Digest tiap {data['interval_hours']}h, berikutnya "
+                    f"{datetime.fromtimestamp(data['next_due_at'], timezone.utc).strftime('%H:%M')} UTC")
+            else:
+                await update.message.reply_text(
+                    f"❌ Error: {data.get('error', 'Unknown error')}")
+
+        except QueueFull as busy:
+            await update.message.reply_text(str(busy))
+        except Exception as e:
+            await update.message.reply_text(f"❌ Gagal menambah watchlist: {str(e)}")
+
+    async def unwatch_command(self, update: Update,
+                              context: ContextTypes.DEFAULT_TYPE):
+        """Handler untuk command /unwatch"""
+        if not context.args:
+            await update.message.reply_text(
+                "❌ Format: /unwatch <symbol> [timeframe]\nContoh: /unwatch BTC/USDT")
+            return
+
+        symbol = context.args[0].upper()
+        user_id = str(update.effective_user.id)
+
+        try:
+            response = await self.api_call(
+                update, 'DELETE', f"/watchlist/{user_id}/{symbol}"
+                + (f"?timeframe={context.args[1]}" if len(context.args) > 1 else ""))
+
+            if response.status_code == 200:
+                await update.message.reply_text(f"✅ {symbol} dihapus dari watchlist")
+            else:
+                await update.message.reply_text(
+                    f"❌ {symbol} tidak ada di watchlist Anda")
+
+        except Exception as e:
+            await update.message.reply_text(f"❌ Error: {str(e)}")
+
+    async def watchlist_command(self, update: Update,
+                                context: ContextTypes.DEFAULT_TYPE):
+        """Handler untuk command /watchlist"""
+        user_id = str(update.effective_user.id)
+
+        try:
+            response = await self.api_get(update, f"/watchlist/{user_id}",
+                                          timeout=10)
+
+            if response.status_code == 200:
+                watchlist = response.json().get('watchlist', [])
+                if not watchlist:
+                    await update.message.reply_text(
+                        "📭 Watchlist Anda kosong. Tambah dengan /watch <symbol>")
+                    return
+
+                text = f"📋 *Watchlist Anda ({len(watchlist)} symbol):*\n\n"
+                for item in watchlist:
+                    text += (f"• {item['symbol']} ({item['timeframe']}) - "
+                             f"tiap {item['interval_hours']}h\n")
+                await update.message.reply_text(text, parse_mode='Markdown')
+            else:
+                await update.message.reply_text("❌ Gagal mengambil watchlist")
+
+        except Exception as e:
+            await update.message.reply_text(f"❌ Error: {str(e)}")
+
     async def volume_command(self, update: Update,
                              context: ContextTypes.DEFAULT_TYPE):
         """Handler untuk command /volume"""
@@ -444,19 +756,20 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
             symbol = context.args[0].upper()
 
         try:
-            response = requests.get(
-                f"{API_BASE_URL}/analyze?symbol={symbol}&timeframe=1d",
-                timeout=15)
+            response = await self.api_get(update, f"/volume/{symbol}",
+                                          timeout=15)
 
             if response.status_code == 200:
-                data = response.json()
-                volume_data = data.get('market_sentiment',
-                                       {}).get('volume_analysis', {})
+                volume_data = response.json()
 
                 text = f"📊 *Volume Analysis - {symbol}*\n\n"
                 text += f"💰 Current 24h Volume: ${volume_data.get('current_24h_volume', 0):,.0f}\n"
-                text += f"📈 Average 7d Volume: ${volume_data.get('average_7d_volume', 0):,.0f}\n"
+                text += (f"📈 Average {volume_data.get('average_window_days', 7)}d Volume: "
+                         f"${volume_data.get('average_volume', 0):,.0f}\n")
                 text += f"🔢 Volume Ratio: {volume_data.get('volume_ratio', 0):.2f}x\n"
+                for window in volume_data.get('baseline', []):
+                    if window.get('zscore') is not None:
+                        text += f"📐 Z-score {window['window']}d: {window['zscore']:+.2f}\n"
                 text += f"📊 Status: {volume_data.get('volume_status', 'N/A')}\n"
 
                 await update.message.reply_text(text, parse_mode='Markdown')
@@ -476,8 +789,8 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
             symbol = context.args[0].upper()
 
         try:
-            response = requests.get(
-                f"{API_BASE_URL}/analyze?symbol={symbol}&timeframe=1d",
+            response = await self.api_get(
+                update, "/analyze", params={"symbol": symbol, "timeframe": "1d"},
                 timeout=20)
 
             if response.status_code == 200:
@@ -524,8 +837,8 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
             symbol = context.args[0].upper()
 
         try:
-            response = requests.get(
-                f"{API_BASE_URL}/analyze?symbol={symbol}&timeframe=1d",
+            response = await self.api_get(
+                update, "/analyze", params={"symbol": symbol, "timeframe": "1d"},
                 timeout=20)
 
             if response.status_code == 200:
@@ -592,8 +905,8 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
                                  context: ContextTypes.DEFAULT_TYPE):
         """Handler untuk command /feargreed"""
         try:
-            response = requests.get(
-                f"{API_BASE_URL}/analyze?symbol=BTC/USDT&timeframe=1d",
+            response = await self.api_get(
+                update, "/analyze", params={"symbol": "BTC/USDT", "timeframe": "1d"},
                 timeout=15)
 
             if response.status_code == 200:
@@ -642,27 +955,30 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
 
         if data.startswith("analyze_"):
             symbol = data.replace("analyze_", "")
-            await query.message.reply_text(f"🔄 Menganalisis {symbol}...")
+            placeholder = await query.message.reply_text(f"🔄 Menganalisis {symbol}...")
 
             try:
-                response = requests.get(f"{API_BASE_URL}/analyze",
-                                        params={
-                                            "symbol": symbol,
-                                            "timeframe": "1d"
-                                        },
-                                        timeout=30)
-
-                if response.status_code == 200:
-                    analysis_data = response.json()
-                    analysis_text = self.format_analysis(analysis_data)
-                    await query.message.reply_text(analysis_text,
-                                                   parse_mode='Markdown')
+                # Key sama dengan /analyze <symbol> 1d: cache dipakai bersama
+                response, message = await self.fetch_rendered(
+                    update, ('analyze', symbol, '1d'), "/analyze",
+                    self.format_analysis,
+                    params={
+                        "symbol": symbol,
+                        "timeframe": "1d"
+                    },
+                    timeout=30)
+
+                if message:
+                    await placeholder.edit_text(message.text,
+                                                parse_mode='Markdown')
                 else:
-                    await query.message.reply_text(
+                    await placeholder.edit_text(
                         "❌ Gagal mengambil data analisis")
 
+            except QueueFull as busy:
+                await placeholder.edit_text(str(busy))
             except Exception as e:
-                await query.message.reply_text(f"❌ Error: {str(e)}")
+                await placeholder.edit_text(f"❌ Error: {str(e)}")
 
         elif data == "price_menu":
             keyboard = [
@@ -686,12 +1002,11 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
         elif data.startswith("price_"):
             symbol = data.replace("price_", "")
             try:
-                response = requests.get(f"{API_BASE_URL}/realtime/{symbol}",
-                                        timeout=10)
-                if response.status_code == 200:
-                    price_data = response.json()
-                    price_text = self.format_price_data(price_data)
-                    await query.message.reply_text(price_text,
+                response, message = await self.fetch_rendered(
+                    update, ('price', symbol), f"/realtime/{symbol}",
+                    self.format_price_data, timeout=10)
+                if message:
+                    await query.message.reply_text(message.text,
                                                    parse_mode='Markdown')
                 else:
                     await query.message.reply_text(
@@ -702,46 +1017,64 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
         elif data == "help":
             await self.help_command(update, context)
 
+    async def get_symbol_index(self, update: Update) -> SymbolIndex:
+        """Index symbol dari daftar market exchange; index lama dipakai bila gagal"""
+        now = time.monotonic()
+        if (self.symbol_index_loaded is None or
+                now - self.symbol_index_loaded >= MARKET_INDEX_REFRESH):
+            # Tandai dulu supaya pesan lain tidak ikut memuat ulang bersamaan
+            self.symbol_index_loaded = now
+            markets = None
+            try:
+                response = await self.api_get(update, "/markets", timeout=30)
+                if response.status_code == 200:
+                    markets = response.json().get('markets')
+            except Exception as e:
+                logger.error(f"Error loading market index: {e}")
+
+            if markets:
+                self.symbol_index = await asyncio.to_thread(SymbolIndex, markets)
+                logger.info(f"Symbol index loaded: {len(self.symbol_index)} markets")
+            else:
+                # Coba lagi sekitar semenit lagi, bukan menunggu interval penuh
+                self.symbol_index_loaded = now - MARKET_INDEX_REFRESH + 60
+        return self.symbol_index
+
     async def handle_message(self, update: Update,
                              context: ContextTypes.DEFAULT_TYPE):
         """Handler untuk pesan text biasa"""
-        text = update.message.text.upper()
-
         # Auto-detect symbol dan berikan analisis singkat
-        crypto_symbols = [
-            'BTC', 'ETH', 'BNB', 'ADA', 'DOT', 'LINK', 'UNI', 'DOGE'
-        ]
+        symbol_index = await self.get_symbol_index(update)
+        symbols = symbol_index.find(update.message.text, limit=MAX_DETECTED_SYMBOLS)
+
+        if symbols:
+            placeholder = await update.message.reply_text(
+                f"🔍 Terdeteksi {', '.join(symbols)}! Mengambil data harga...")
+
+            # Lookup semua symbol berjalan bersamaan (dibatasi antrian adil per user)
+            results = await asyncio.gather(*(
+                self.fetch_rendered(
+                    update, ('price_detected', symbol), f"/realtime/{symbol}",
+                    lambda price_data, symbol=symbol: self.render_detected_price(
+                        symbol, price_data),
+                    timeout=10) for symbol in symbols), return_exceptions=True)
+
+            messages = [result[1] for result in results
+                        if not isinstance(result, BaseException) and result[1]]
+            if not messages:
+                busy = next((result for result in results
+                             if isinstance(result, QueueFull)), None)
+                await placeholder.edit_text(
+                    str(busy) if busy else
+                    f"❌ Gagal mengambil data harga {', '.join(symbols)}")
+                return
 
-        for symbol in crypto_symbols:
-            if symbol in text:
-                await update.message.reply_text(
-                    f"🔍 Terdeteksi {symbol}! Mengambil data harga...")
-                try:
-                    response = requests.get(
-                        f"{API_BASE_URL}/realtime/{symbol}/USDT", timeout=10)
-                    if response.status_code == 200:
-                        price_data = response.json()
-                        price_text = self.format_price_data(price_data)
-
-                        keyboard = [[
-                            InlineKeyboardButton(
-                                f"📊 Analisis {symbol}",
-                                callback_data=f"analyze_{symbol}/USDT")
-                        ],
-                                    [
-                                        InlineKeyboardButton(
-                                            f"📈 Fibonacci {symbol}",
-                                            callback_data=f"fib_{symbol}/USDT")
-                                    ]]
-                        reply_markup = InlineKeyboardMarkup(keyboard)
-
-                        await update.message.reply_text(
-                            price_text,
-                            parse_mode='Markdown',
-                            reply_markup=reply_markup)
-                        return
-                except:
-                    pass
+            await placeholder.edit_text(messages[0].text, parse_mode='Markdown',
+                                        reply_markup=messages[0].reply_markup)
+            for message in messages[1:]:
+                await update.message.reply_text(message.text, parse_mode='Markdown',
+                                                reply_markup=message.reply_markup)
+            return
 
         # Jika tidak ada symbol terdeteksi
         await update.message.reply_text(
@@ -750,6 +1083,18 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
             "• /price ETH/USDT\n"
             "• /help untuk panduan lengkap")
 
+    def render_detected_price(self, symbol, price_data):
+        """Pesan harga untuk symbol (mis. BTC/USDT) yang terdeteksi di chat, plus tombol lanjutan"""
+        base = symbol.split('/')[0]
+        keyboard = [[
+            InlineKeyboardButton(f"📊 Analisis {base}",
+                                 callback_data=f"analyze_{symbol}")
+        ], [
+            InlineKeyboardButton(f"📈 Fibonacci {base}",
+                                 callback_data=f"fib_{symbol}")
+        ]]
+        return self.format_price_data(price_data), InlineKeyboardMarkup(keyboard)
+
     def format_analysis(self, data):
         """Format data analisis menjadi text yang mudah dibaca"""
         symbol = data.get('symbol', 'N/A')
@@ -871,11 +1216,11 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
         if alerts:
             text += "*🚨 Recent Alerts:*\n"
             for alert in alerts[-5:]:  # Show last 5 alerts
-                alert_type = alert.get('type', 'Unknown')
                 message = alert.get('message', 'No message')
                 timestamp = alert.get('timestamp', '')
+                timeframe = alert.get('timeframe')
 
-                text += f"• {message}\n"
+                text += f"• {message}" + (f" ({timeframe})" if timeframe else "") + "\n"
                 if timestamp:
                     text += f"  ⏰ {timestamp[:16]}\n"
                 text += "\n"
@@ -884,9 +1229,70 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
 
         return text
 
-    def run(self):
-        """Jalankan bot"""
-        logger.info("🤖 Starting Telegram Bot...")
+    async def start_update_workers(self, workers: int = BOT_UPDATE_WORKERS,
+                                   queue_size: int = BOT_UPDATE_QUEUE):
+        """Pool worker terbatas yang memproses update dari webhook"""
+        self.update_queue = asyncio.Queue(maxsize=queue_size)
+        self.update_workers = [asyncio.create_task(self._update_worker())
+                               for _ in range(workers)]
+
+    async def _update_worker(self):
+        while True:
+            update = await self.update_queue.get()
+            try:
+                await self.application.process_update(update)
+                self.updates_processed += 1
+            except Exception as e:
+                logger.error(f"Error processing update {update.update_id}: {e}")
+            finally:
+                self.update_queue.task_done()
+
+    async def _enqueue_update(self, update: Update) -> bool:
+        try:
+            self.update_queue.put_nowait(update)
+            return True
+        except asyncio.QueueFull:
+            self.updates_rejected += 1
+            return False
+
+    def submit_update(self, data: dict, timeout: float = 5) -> bool:
+        """Masukkan update webhook ke antrian (dipanggil dari thread HTTP).
+
+        Return False bila antrian penuh; endpoint menjawab non-2xx sehingga
+        Telegram mengirim ulang update tersebut nanti.
+        """
+        if self.update_queue is None or not self.ready.is_set():
+            raise RuntimeError("Bot webhook belum berjalan")
+        update = Update.de_json(data, self.application.bot)
+        return asyncio.run_coroutine_threadsafe(self._enqueue_update(update),
+                                                self.loop).result(timeout=timeout)
+
+    def update_stats(self):
+        return {
+            'queued': self.update_queue.qsize() if self.update_queue else 0,
+            'processed': self.updates_processed,
+            'rejected': self.updates_rejected
+        }
+
+    def run(self, mode: str = None):
+        """Jalankan bot.
+
+        mode 'polling' (long polling), 'webhook' (daftarkan BOT_WEBHOOK_URL lalu
+        proses update yang masuk lewat submit_update) atau 'webhook-worker'
+        (hanya memproses update; webhook didaftarkan proses lain). Default:
+        'webhook' bila BOT_WEBHOOK_URL di-set, selain itu 'polling'. Mode
+        webhook ditolak tanpa BOT_WEBHOOK_SECRET.
+        """
+        if mode is None:
+            mode = 'webhook' if BOT_WEBHOOK_URL else 'polling'
+            if BOT_WEBHOOK_URL and not BOT_WEBHOOK_SECRET:
+                logger.error("❌ BOT_WEBHOOK_URL di-set tanpa BOT_WEBHOOK_SECRET; "
+                             "memakai long polling")
+                mode = 'polling'
+        if mode != 'polling' and not BOT_WEBHOOK_SECRET:
+            logger.error(f"❌ Mode {mode} membutuhkan BOT_WEBHOOK_SECRET")
+            return
+        logger.info(f"🤖 Starting Telegram Bot ({mode})...")
 
         try:
             # Test bot token terlebih dahulu
@@ -895,7 +1301,7 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
             # Test koneksi ke Telegram API
             try:
                 import requests
-                test_url = f"https://api.telegram.org/bot{self.token}/getMe"
+                test_url = f"{TELEGRAM_API_BASE_URL}{self.token}/getMe"
                 response = requests.get(test_url, timeout=10)
                 if response.status_code == 200:
                     bot_info = response.json()
@@ -920,18 +1326,32 @@ BTC/USDT, ETH/USDT, BNB/USDT, SOL/USDT, ADA/USDT
                 loop = asyncio.new_event_loop()
                 asyncio.set_event_loop(loop)
 
-            # Run polling dengan error handling (tanpa signal handlers untuk thread)
-            logger.info("🚀 Starting polling...")
-
             # Gunakan async approach untuk menghindari signal handler issue
             async def run_bot():
                 async with self.application:
                     await self.application.start()
-                    await self.application.updater.start_polling(
-                        allowed_updates=Update.ALL_TYPES,
-                        drop_pending_updates=True,
-                        poll_interval=1.0,
-                        timeout=20)
+                    self.loop = asyncio.get_running_loop()
+
+                    if mode == 'polling':
+                        logger.info("🚀 Starting polling...")
+                        # getUpdates sudah long polling (menunggu sampai
+                        # `timeout`), jeda antar poll hanya menambah latency
+                        await self.application.updater.start_polling(
+                            allowed_updates=Update.ALL_TYPES,
+                            drop_pending_updates=True,
+                            poll_interval=0.0,
+                            timeout=20)
+                    else:
+                        await self.start_update_workers()
+                        if mode == 'webhook':
+                            logger.info(f"🚀 Registering webhook {BOT_WEBHOOK_URL}...")
+                            await self.application.bot.set_webhook(
+                                url=BOT_WEBHOOK_URL,
+                                secret_token=BOT_WEBHOOK_SECRET,
+                                allowed_updates=Update.ALL_TYPES,
+                                drop_pending_updates=True)
+
+                    self.ready.set()
                     # Keep running
                     await asyncio.sleep(float('inf'))
 
@@ -952,6 +1372,7 @@ def start_telegram_bot():
     """Function untuk memulai bot"""
     global bot_instance
 
+    configure_logging()
     logger.info("🔍 Mencari TELEGRAM_BOT_TOKEN...")
 
     # Ambil token dari environment variable
@@ -0,0 +1,247 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from alert_db import AlertDatabase
+
+logger = logging.getLogger(__name__)
+
+# Window rolling (jumlah candle timeframe baseline, 1d = hari). Satu konfigurasi
+# untuk semua instance (loop baseline di app dan alert engine yang hanya
+# membaca), supaya window alert VOLUME ZSCORE selalu tersedia di state
+DEFAULT_WINDOWS = tuple(sorted({
+    int(window) for window in os.getenv('VOLUME_BASELINE_WINDOWS', '7,30').split(',')}))
+# Window alert VOLUME ZSCORE (default: window terpanjang)
+ALERT_WINDOW = int(os.getenv('VOLUME_ALERT_WINDOW') or DEFAULT_WINDOWS[-1])
+
+
+class RollingVolumeStats:
+    """Mean/stddev rolling volume (quote) untuk beberapa window sekaligus.
+
+    Tiap window memegang deque nilai terakhir plus jumlah dan jumlah kuadrat
+    berjalan, jadi satu candle baru O(jumlah window). Jumlah dihitung ulang
+    dari deque setiap window penuh sekali putar supaya error floating point
+    tidak menumpuk. State bisa diserialisasi ke JSON.
+    """
+
+    def __init__(self, windows: Iterable[int] = DEFAULT_WINDOWS,
+                 state: Optional[Dict] = None):
+        state = state or {}
+        self.windows = tuple(sorted(set(windows)))
+        self.last_ts = state.get('last_ts')
+        self.bars = state.get('bars', 0)
+        saved = state.get('values', [])
+        self.values = deque(saved, maxlen=max(self.windows))
+        self.sums = {}
+        for window in self.windows:
+            self.resum(window)
+
+    def to_dict(self) -> Dict:
+        return {'last_ts': self.last_ts, 'bars': self.bars,
+                'values': list(self.values)}
+
+    def tail(self, window: int) -> List[float]:
+        return list(self.values)[-window:]
+
+    def resum(self, window: int):
+        values = self.tail(window)
+        self.sums[window] = [math.fsum(values), math.fsum(v * v for v in values)]
+
+    def update(self, candle: List[float]):
+        """Proses satu candle closed [ts, open, high, low, close, volume]"""
+        ts, close, volume = candle[0], candle[4], candle[5]
+        quote_volume = (volume or 0.0) * (close or 0.0)
+
+        for window in self.windows:
+            sums = self.sums[window]
+            if len(self.values) >= window:
+                dropped = self.values[-window]
+                sums[0] -= dropped
+                sums[1] -= dropped * dropped
+            sums[0] += quote_volume
+            sums[1] += quote_volume * quote_volume
+
+        self.values.append(quote_volume)
+        self.bars += 1
+        self.last_ts = ts
+
+        for window in self.windows:
+            if self.bars % window == 0:
+                self.resum(window)
+
+    def mean_std(self, window: int) -> Optional[Tuple[float, float]]:
+        """(mean, stddev populasi) window; None bila candle belum cukup"""
+        if len(self.values) < window:
+            return None
+        total, squares = self.sums[window]
+        mean = total / window
+        return mean, math.sqrt(max(squares / window - mean * mean, 0.0))
+
+
+class VolumeBaseline:
+    """Baseline volume rolling per symbol (mean, stddev, z-score).
+
+    State per symbol disimpan di tabel volume_baseline dan di-update
+    incremental dari candle closed (`advance()` hanya mengambil candle
+    setelah candle terakhir yang sudah diproses, seperti state indikator),
+    jadi pembacaan `stats()`/`zscore()`/`level()` cukup dari memori. Proses
+    yang hanya membaca (alert engine, shard) memanggil `reload()` untuk
+    mengambil baris yang di-update proses lain.
+    """
+
+    def __init__(self, db: AlertDatabase,
+                 fetch_ohlcv: Optional[Callable[..., List[List[float]]]] = None,
+                 last_closed_candle: Optional[Callable[[str], datetime]] = None,
+                 timeframe: str = '1d', windows: Iterable[int] = DEFAULT_WINDOWS,
+                 alert_window: Optional[int] = ALERT_WINDOW):
+        self.db = db
+        self.fetch_ohlcv = fetch_ohlcv
+        self.last_closed_candle = last_closed_candle
+        self.timeframe = timeframe
+        # Window yang dipakai alert VOLUME ZSCORE (default: window terpanjang),
+        # selalu ikut dihitung
+        self.alert_window = alert_window or max(windows)
+        self.windows = tuple(sorted(set(windows) | {self.alert_window}))
+        self.states: Dict[str, RollingVolumeStats] = {}
+        # Batas candle closed terakhir yang sudah dicek per symbol
+        self.checked: Dict[str, int] = {}
+        self.last_reload = 0.0
+        self.lock = threading.RLock()
+
+    def state(self, symbol: str) -> RollingVolumeStats:
+        """State symbol dari memori, atau dari database saat pertama kali dibaca"""
+        with self.lock:
+            state = self.states.get(symbol)
+            if state is None:
+                row = self.db.execute('''
+                    SELECT state FROM volume_baseline WHERE symbol = ? AND timeframe = ?
+                ''', (symbol, self.timeframe)).fetchone()
+                state = RollingVolumeStats(self.windows, json.loads(row[0]) if row else None)
+                self.states[symbol] = state
+            return state
+
+    def save(self, symbol: str, state: RollingVolumeStats):
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO volume_baseline (symbol, timeframe, state, last_candle_ts, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(symbol, timeframe) DO UPDATE SET
+                    state = excluded.state,
+                    last_candle_ts = excluded.last_candle_ts,
+                    updated_at = excluded.updated_at
+            ''', (symbol, self.timeframe, json.dumps(state.to_dict()), state.last_ts,
+                  time.time()))
+
+    def advance(self, symbol: str) -> bool:
+        """Proses candle closed baru symbol; return True bila baseline berubah.
+
+        Tanpa candle baru tidak ada request ke exchange. State yang
+        tertinggal lebih dari window terpanjang dibangun ulang dari nol.
+        """
+        if self.fetch_ohlcv is None or self.last_closed_candle is None:
+            raise RuntimeError("VolumeBaseline.advance needs fetch_ohlcv and last_closed_candle")
+
+        closed_at = int(self.last_closed_candle(self.timeframe).timestamp() * 1000)
+        seed = self.windows[-1] + 1
+
+        with self.lock:
+            if self.checked.get(symbol) == closed_at:
+                return False
+
+            state = self.state(symbol)
+
+            candles = []
+            if state.last_ts is not None:
+                candles = self.fetch_ohlcv(symbol, self.timeframe,
+                                           since=state.last_ts + 1, limit=seed)
+                if len(candles) >= seed:
+                    state = RollingVolumeStats(self.windows)
+            if state.last_ts is None:
+                candles = self.fetch_ohlcv(symbol, self.timeframe, limit=seed)
+
+            updated = False
+            for candle in candles:
+                # Hanya candle yang sudah close dan belum diproses
+                if candle[0] >= closed_at or (state.last_ts is not None and
+                                              candle[0] <= state.last_ts):
+                    continue
+                state.update(candle)
+                updated = True
+
+            self.checked[symbol] = closed_at
+            if not updated:
+                return False
+            self.states[symbol] = state
+            self.save(symbol, state)
+            return True
+
+    def reload(self) -> List[str]:
+        """Ambil baseline yang di-update proses lain; return symbol yang berubah"""
+        rows = self.db.execute('''
+            SELECT symbol, state, updated_at FROM volume_baseline
+            WHERE timeframe = ? AND updated_at > ?
+        ''', (self.timeframe, self.last_reload)).fetchall()
+
+        with self.lock:
+            for symbol, state, updated_at in rows:
+                self.states[symbol] = RollingVolumeStats(self.windows, json.loads(state))
+                self.last_reload = max(self.last_reload, updated_at)
+        return [row[0] for row in rows]
+
+    def zscore(self, symbol: str, volume: Optional[float],
+               window: Optional[int] = None) -> Optional[float]:
+        if volume is None:
+            return None
+        baseline = self.state(symbol).mean_std(window or self.alert_window)
+        if baseline is None or baseline[1] <= 0:
+            return None
+        mean, std = baseline
+        return (volume - mean) / std
+
+    def level(self, symbol: str, zscore: float,
+              window: Optional[int] = None) -> Optional[float]:
+        """Volume (quote) yang setara dengan z-score tertentu; None tanpa baseline"""
+        baseline = self.state(symbol).mean_std(window or self.alert_window)
+        if baseline is None or baseline[1] <= 0:
+            return None
+        mean, std = baseline
+        return mean + zscore * std
+
+    def stats(self, symbol: str, volume: Optional[float] = None) -> Dict:
+        """Mean, stddev dan z-score `volume` untuk semua window"""
+        state = self.state(symbol)
+        windows = []
+        for window in self.windows:
+            baseline = state.mean_std(window)
+            mean, std = baseline if baseline else (None, None)
+            windows.append({
+                'window': window,
+                'mean': mean,
+                'std': std,
+                'zscore': (volume - mean) / std
+                if volume is not None and std else None
+            })
+        return {
+            'symbol': symbol,
+            'timeframe': self.timeframe,
+            'last_candle_ts': state.last_ts,
+            'windows': windows
+        }
+
+
+def run_volume_baseline(baseline: VolumeBaseline, symbols: Callable[[], List[str]],
+                        interval: float = 300):
+    """Loop background: majukan baseline symbol yang punya alert volume"""
+    while True:
+        for symbol in symbols():
+            try:
+                baseline.advance(symbol)
+            except Exception as e:
+                logger.error(f"Error updating volume baseline {symbol}: {e}")
+        time.sleep(interval)
@@ -0,0 +1,254 @@
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from alert_db import AlertDatabase
+from notification_queue import MAX_MESSAGE_LENGTH
+
+logger = logging.getLogger(__name__)
+
+# Interval digest yang didukung (jam); selalu sejajar jam UTC sehingga semua
+# subscriber interval yang sama jatuh tempo bersamaan
+DIGEST_INTERVALS = (1, 2, 4, 6, 8, 12, 24)
+MAX_WATCHLIST_SYMBOLS = 20
+
+
+def next_boundary(now: float, interval_hours: int) -> float:
+    """Batas interval berikutnya setelah `now` (epoch detik, sejajar UTC)"""
+    period = interval_hours * 3600
+    return (math.floor(now / period) + 1) * period
+
+
+def format_digest_section(symbol: str, timeframe: str, analysis: Optional[Dict]) -> str:
+    """Satu bagian digest per (symbol, timeframe); sama untuk semua subscriber"""
+    if not analysis:
+        return f"⚠️ *{symbol}* ({timeframe}): data tidak tersedia"
+
+    momentum = analysis.get('technical_indicators', {}).get('momentum', {})
+    signals = analysis.get('signals', {})
+    sentiment = signals.get('market_sentiment_score', {})
+    levels = analysis.get('support_resistance', {})
+
+    text = f"*{symbol}* ({timeframe}) — ${analysis.get('close_price', 0):,.2f}\n"
+    if momentum.get('rsi_14') is not None:
+        text += f"• RSI: {momentum['rsi_14']:.1f}\n"
+    macd_trend = signals.get('trend_analysis', {}).get('macd_trend')
+    if macd_trend:
+        text += f"• MACD: {macd_trend}\n"
+    if sentiment:
+        text += f"• Sentimen: {sentiment.get('label', 'N/A')} ({sentiment.get('score', 'N/A')})\n"
+    if levels and not levels.get('error'):
+        if levels.get('nearest_support'):
+            text += f"🟢 S: ${levels['nearest_support']:,.2f}  "
+        if levels.get('nearest_resistance'):
+            text += f"🔴 R: ${levels['nearest_resistance']:,.2f}"
+    return text.rstrip()
+
+
+def split_message(header: str, sections: List[str],
+                  limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Gabungkan section menjadi pesan-pesan di bawah batas panjang Telegram"""
+    messages, current = [], header
+    for section in sections:
+        if current and len(current) + len(section) + 2 > limit:
+            messages.append(current.rstrip())
+            current = ""
+        current += section[:limit] + "\n\n"
+    if current.strip():
+        messages.append(current.rstrip())
+    return messages
+
+
+class WatchlistStore:
+    """Watchlist user (tabel watchlist) beserta jadwal digest-nya"""
+
+    def __init__(self, db: AlertDatabase, max_symbols: int = MAX_WATCHLIST_SYMBOLS):
+        self.db = db
+        self.max_symbols = max_symbols
+
+    def subscribe(self, user_id: str, symbol: str, timeframe: str = '1d',
+                  interval_hours: int = 4) -> Dict:
+        if interval_hours not in DIGEST_INTERVALS:
+            raise ValueError(f"Interval digest harus salah satu dari "
+                             f"{', '.join(f'{hours}h' for hours in DIGEST_INTERVALS)}")
+
+        now = time.time()
+        with self.db.transaction() as cursor:
+            count = cursor.execute('''
+                SELECT COUNT(*) FROM watchlist
+                WHERE user_id = ? AND NOT (symbol = ? AND timeframe = ?)
+            ''', (user_id, symbol, timeframe)).fetchone()[0]
+            if count >= self.max_symbols:
+                raise ValueError(f"Watchlist maksimal {self.max_symbols} symbol")
+
+            cursor.execute('''
+                INSERT INTO watchlist (user_id, symbol, timeframe, interval_hours,
+                                       created_at, next_due_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, symbol, timeframe) DO UPDATE SET
+                    interval_hours = excluded.interval_hours,
+                    next_due_at = excluded.next_due_at
+            ''', (user_id, symbol, timeframe, interval_hours, now,
+                  next_boundary(now, interval_hours)))
+
+        return {'symbol': symbol, 'timeframe': timeframe,
+                'interval_hours': interval_hours,
+                'next_due_at': next_boundary(now, interval_hours)}
+
+    def unsubscribe(self, user_id: str, symbol: str,
+                    timeframe: Optional[str] = None) -> int:
+        """Hapus symbol dari watchlist (semua timeframe bila tidak disebut)"""
+        with self.db.transaction() as cursor:
+            if timeframe:
+                cursor.execute('''
+                    DELETE FROM watchlist WHERE user_id = ? AND symbol = ? AND timeframe = ?
+                ''', (user_id, symbol, timeframe))
+            else:
+                cursor.execute('DELETE FROM watchlist WHERE user_id = ? AND symbol = ?',
+                               (user_id, symbol))
+            return cursor.rowcount
+
+    def user_watchlist(self, user_id: str) -> List[Dict]:
+        rows = self.db.execute('''
+            SELECT symbol, timeframe, interval_hours, last_sent_at, next_due_at
+            FROM watchlist WHERE user_id = ? ORDER BY symbol, timeframe
+        ''', (user_id, )).fetchall()
+        return [{'symbol': row[0], 'timeframe': row[1], 'interval_hours': row[2],
+                 'last_sent_at': row[3], 'next_due_at': row[4]} for row in rows]
+
+    def due(self, now: float) -> List[tuple]:
+        """(user_id, symbol, timeframe, interval_hours) yang jatuh tempo"""
+        return self.db.execute('''
+            SELECT user_id, symbol, timeframe, interval_hours FROM watchlist
+            WHERE next_due_at <= ? ORDER BY user_id
+        ''', (now, )).fetchall()
+
+    def mark_sent(self, rows: List[tuple], now: float, cursor=None):
+        """Jadwalkan batas interval berikutnya untuk baris yang sudah diproses.
+
+        Digest yang terlewat (mis. leader mati beberapa jam) tidak dikirim
+        berkali-kali; jadwal langsung melompat ke batas setelah `now`.
+        Dengan `cursor`, update ikut transaksi pemanggil.
+        """
+        if cursor is None:
+            with self.db.transaction() as cursor:
+                return self.mark_sent(rows, now, cursor)
+        cursor.executemany('''
+            UPDATE watchlist SET last_sent_at = ?, next_due_at = ?
+            WHERE user_id = ? AND symbol = ? AND timeframe = ?
+        ''', [(now, next_boundary(now, interval_hours), user_id, symbol, timeframe)
+              for user_id, symbol, timeframe, interval_hours in rows])
+
+    def stats(self) -> Dict:
+        row = self.db.execute('''
+            SELECT COUNT(*), COUNT(DISTINCT user_id),
+                   COUNT(DISTINCT symbol || ':' || timeframe)
+            FROM watchlist
+        ''').fetchone()
+        return {'subscriptions': row[0], 'users': row[1], 'symbols': row[2]}
+
+
+class DigestScheduler:
+    """Digest watchlist berkala yang di-broadcast ke semua subscriber.
+
+    Setiap putaran mengambil semua subscription yang jatuh tempo, lalu:
+    - analisis dihitung sekali per (symbol, timeframe) berbeda, berapa pun
+      jumlah subscriber-nya (beban ke exchange sebanding jumlah symbol,
+      bukan jumlah user),
+    - section teks di-render sekali per (symbol, timeframe), dan pesan utuh
+      sekali per kombinasi watchlist yang sama,
+    - pesan per user masuk outbox NotificationDispatcher dalam transaksi
+      yang sama dengan update jadwal watchlist (tidak ada digest ganda atau
+      hilang bila proses mati di tengah); dispatcher yang mengatur rate
+      global/per chat dan retry.
+    """
+
+    def __init__(self, store: WatchlistStore, analyze: Callable[[str, str], Optional[Dict]],
+                 enqueue: Callable[..., None],
+                 render_section: Callable[[str, str, Optional[Dict]], str] = format_digest_section,
+                 check_interval: float = 60, wake: Optional[Callable[[], None]] = None):
+        self.store = store
+        self.analyze = analyze
+        # enqueue(notifications, cursor) menulis ke outbox lewat cursor transaksi
+        self.enqueue = enqueue
+        self.wake = wake
+        self.render_section = render_section
+        self.check_interval = check_interval
+        self.running = False
+        self.last_run: Optional[Dict] = None
+
+    def compute_sections(self, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        sections = {}
+        for symbol, timeframe in pairs:
+            try:
+                analysis = self.analyze(symbol, timeframe)
+            except Exception as e:
+                logger.error(f"Digest analysis failed for {symbol} {timeframe}: {e}")
+                analysis = None
+            sections[(symbol, timeframe)] = self.render_section(symbol, timeframe, analysis)
+        return sections
+
+    def run_once(self, now: Optional[float] = None) -> Dict:
+        now = now if now is not None else time.time()
+        started = time.monotonic()
+        rows = self.store.due(now)
+        if not rows:
+            return {'subscriptions': 0}
+
+        pairs = sorted({(row[1], row[2]) for row in rows})
+        sections = self.compute_sections(pairs)
+
+        users: Dict[str, List[Tuple[str, str]]] = {}
+        for user_id, symbol, timeframe, _ in rows:
+            users.setdefault(user_id, []).append((symbol, timeframe))
+
+        header = (f"📋 *Watchlist Digest* — "
+                  f"{datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m-%d %H:%M')} UTC\n\n")
+        # Banyak user punya watchlist yang sama (mis. BTC + ETH): pesan dirakit sekali
+        rendered: Dict[tuple, List[str]] = {}
+        notifications = []
+        for user_id, keys in users.items():
+            keys = tuple(sorted(keys))
+            messages = rendered.get(keys)
+            if messages is None:
+                messages = split_message(header, [sections[key] for key in keys])
+                rendered[keys] = messages
+            notifications.extend((user_id, text) for text in messages)
+
+        with self.store.db.transaction() as cursor:
+            self.enqueue(notifications, cursor)
+            self.store.mark_sent(rows, now, cursor)
+        if self.wake:
+            self.wake()
+
+        self.last_run = {
+            'subscriptions': len(rows),
+            'users': len(users),
+            'symbols': len(pairs),
+            'distinct_messages': len(rendered),
+            'notifications': len(notifications),
+            'seconds': round(time.monotonic() - started, 3),
+            'finished_at': datetime.now().isoformat()
+        }
+        logger.info(f"Watchlist digest: {self.last_run}")
+        return self.last_run
+
+    def start(self) -> threading.Thread:
+        self.running = True
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        while self.running:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error sending watchlist digest: {e}")
+            time.sleep(self.check_interval)